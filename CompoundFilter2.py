@@ -43,6 +43,33 @@ except Exception:
 
 # -------------------------- common stuff --------------------------------------------------
 
+def measure(shape, kind, stencil = None):
+    '''measure(shape, kind, stencil = None): returns shape.Volume, .Area or .Length (kind is the 
+    attribute name), or distance to stencil if kind is 'distance'.'''
+    if kind == 'distance':
+        return shape.distToShape(stencil)[0]
+    return getattr(shape, kind)
+
+def _measureJob(breps, kind, stencil_brep):
+    # lattice2Parallel job for measureAll
+    import lattice2Parallel
+    stencil = None if stencil_brep is None else lattice2Parallel.sharedShape(stencil_brep)
+    return [measure(lattice2Parallel.shapeFromBrep(brep), kind, stencil) for brep in breps]
+
+def measureAll(shapes, kind, stencil = None, parallel = False):
+    '''measureAll(shapes, kind, stencil = None, parallel = False): measure() for a list of shapes. 
+    If parallel, the shapes are measured by worker processes (see lattice2Parallel), if there 
+    are enough of them for it to pay off.'''
+    if parallel:
+        try:
+            import lattice2Parallel
+        except ImportError:
+            parallel = False
+    if not parallel or lattice2Parallel.chunkCount(len(shapes)) <= 1:
+        return [measure(sh, kind, stencil) for sh in shapes]
+    return lattice2Parallel.mapChunks(_measureJob, [lattice2Parallel.shapeToBrep(sh) for sh in shapes], 
+        shared= (kind, None if stencil is None else lattice2Parallel.shapeToBrep(stencil)))
+
 def makeCompoundFilter(name):
     '''makeCompoundFilter(name): makes a CompoundFilter object.'''
     obj = App.ActiveDocument.addObject("Part::FeaturePython",name)
@@ -77,10 +104,18 @@ class _CompoundFilter:
         obj.addProperty("App::PropertyBool","Invert","CompoundFilter","Output shapes that are rejected by filter, instead")
         obj.Invert = False
         
+        self.assureProperties(obj)
+        
         obj.Proxy = self
         
+    def assureProperties(self, obj):
+        '''Adds properties that can be missing on objects made with earlier version of Lattice2.'''
+        if not hasattr(obj, "Parallel"):
+            obj.addProperty("App::PropertyBool","Parallel","CompoundFilter","Measure children in worker processes (collision-pass and window modes). Pays off for many children only. Number of workers is set in preferences.")
+            obj.Parallel = False
 
     def execute(self,obj):
+        self.assureProperties(obj)
         #validity check
         if isObjectLattice(screen(obj.Base)):
             import lattice2Executer
@@ -118,21 +153,19 @@ class _CompoundFilter:
                         rst.append(shps[i])
         elif obj.FilterType == 'collision-pass':
             stencil = screen(obj.Stencil).Shape
-            for s in shps:
-                d = s.distToShape(stencil)
-                if bool(d[0] < DistConfusion) ^ bool(obj.Invert):
+            dists = measureAll(shps, 'distance', stencil, obj.Parallel)
+            for s, d in zip(shps, dists):
+                if bool(d < DistConfusion) ^ bool(obj.Invert):
                     rst.append(s)
         elif obj.FilterType == 'window-volume' or obj.FilterType == 'window-area' or obj.FilterType == 'window-length' or obj.FilterType == 'window-distance':
-            vals = [0.0] * len(shps)
-            for i in range(0,len(shps)):
-                if obj.FilterType == 'window-volume':
-                    vals[i] = shps[i].Volume
-                elif obj.FilterType == 'window-area':
-                    vals[i] = shps[i].Area
-                elif obj.FilterType == 'window-length':
-                    vals[i] = shps[i].Length
-                elif obj.FilterType == 'window-distance':
-                    vals[i] = shps[i].distToShape(obj.Stencil.Shape)[0]
+            if obj.FilterType == 'window-volume':
+                vals = measureAll(shps, 'Volume', parallel= obj.Parallel)
+            elif obj.FilterType == 'window-area':
+                vals = measureAll(shps, 'Area', parallel= obj.Parallel)
+            elif obj.FilterType == 'window-length':
+                vals = measureAll(shps, 'Length', parallel= obj.Parallel)
+            elif obj.FilterType == 'window-distance':
+                vals = measureAll(shps, 'distance', obj.Stencil.Shape, obj.Parallel)
             
             maxval = max(vals)
             if obj.Stencil:
@@ -22,6 +22,8 @@
 #***************************************************************************
 
 from lattice2Common import *
+import lattice2BaseFeature
+import lattice2Parallel
 
 
 __title__="FuseCompound module for FreeCAD"
@@ -39,6 +41,42 @@ def makeFuseCompound(name):
         _ViewProviderFuseCompound(obj.ViewObject)
     return obj
 
+def fuseShapes(shapes):
+    '''fuseShapes(shapes): fuses a list of shapes in one boolean.'''
+    if len(shapes) == 1:
+        return shapes[0]
+    return shapes[0].multiFuse(shapes[1:])
+
+def _fuseGroupsJob(groups):
+    # lattice2Parallel job: fuses each group of BREP strings, returns BREP strings
+    return [lattice2Parallel.shapeToBrep(fuseShapes([lattice2Parallel.shapeFromBrep(brep) for brep in group])) for group in groups]
+
+def treeFuse(shapes, group_size = 8, parallel = False, progress = None):
+    '''treeFuse(shapes, group_size = 8, parallel = False, progress = None): fuses shapes by tree 
+    reduction. Shapes are sorted along Morton curve of their bounding box centers, fused in 
+    groups of group_size neighbors, and then the results are fused pairwise, level by level. 
+    If parallel, groups of each level are fused by worker processes. progress(level, n_groups) 
+    is called before each level.'''
+    import lattice2ShapeIndex as ShapeIndex
+    if len(shapes) == 0:
+        raise ValueError("Nothing to fuse")
+    centers = [tuple(sh.BoundBox.Center) for sh in shapes]
+    shapes = [shapes[i] for i in ShapeIndex.mortonOrder(centers)]
+    group_size = max(group_size, 2)
+    level = 0
+    while len(shapes) > 1:
+        groups = [shapes[i:i+group_size] for i in range(0, len(shapes), group_size)]
+        if progress:
+            progress(level, len(groups))
+        if parallel and len(groups) > 1:
+            breps = lattice2Parallel.mapChunks(_fuseGroupsJob, [[lattice2Parallel.shapeToBrep(sh) for sh in group] for group in groups], min_chunk= 1)
+            shapes = [lattice2Parallel.shapeFromBrep(brep) for brep in breps]
+        else:
+            shapes = [fuseShapes(group) for group in groups]
+        group_size = 2
+        level += 1
+    return shapes[0]
+
 class _FuseCompound:
     "The FuseCompound object"
     def __init__(self,obj):
@@ -47,14 +85,25 @@ class _FuseCompound:
         obj.addProperty("App::PropertyBool","Refine","FuseCompound","True = refine resulting shape. False = output as is.")
         obj.addProperty("App::PropertyInteger","recomputeQuota","FuseCompound","recompute limiter. Will decrease by one each time it recomputes. Setting to zero disables recomputes. Setting negative makes recomputes unlimited.")
         obj.recomputeQuota = -1
+        self.assureProperties(obj)
         obj.Proxy = self
         
+    def assureProperties(self, obj):
+        lattice2BaseFeature.assureProperty(obj, "App::PropertyEnumeration", "Mode", ["All at once", "Tree"], "FuseCompound", "All at once: one multiFuse of all children. Tree: fuse small groups of spatially close children, then fuse the results pairwise (for thousands of children).")
+        lattice2BaseFeature.assureProperty(obj, "App::PropertyInteger", "GroupSize", 8, "FuseCompound", "Tree mode: number of children fused together on the first level.")
+        lattice2BaseFeature.assureProperty(obj, "App::PropertyBool", "Parallel", False, "FuseCompound", "Tree mode: fuse groups of each level in worker processes.")
 
     def execute(self,obj):
+        self.assureProperties(obj)
         rst = None
         shps = screen(obj.Base).Shape.childShapes()
         if len(shps) > 1:
-            rst = shps[0].multiFuse(shps[1:])
+            if obj.Mode == "Tree":
+                def progress(level, n_groups):
+                    FreeCAD.Console.PrintLog("{name}: fusing {n} groups, level {level}\n".format(name= obj.Name, n= n_groups, level= level))
+                rst = treeFuse(shps, obj.GroupSize, obj.Parallel, progress)
+            else:
+                rst = shps[0].multiFuse(shps[1:])
             if obj.Refine:
                 rst = rst.removeSplitter()
             obj.Shape = rst
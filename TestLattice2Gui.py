@@ -15,4 +15,7 @@ Alternatively, run "FreeCAD -t TestLattice2Gui" or "/path/to/FreeCAD/binary -t T
 from test.gui.TestLatticePlacement import TestLatticePlacement
 from test.gui.TestLatticeAttachment import TestLatticeAttachment
 from test.gui.TestLinearArray import TestLinearArray
-from test.gui.TestPolarArray import TestPolarArray
\ No newline at end of file
+from test.gui.TestPolarArray import TestPolarArray
+from test.gui.TestPlacementArray import TestPlacementArray
+from test.gui.TestShapeIndex import TestShapeIndex
+from test.gui.TestPDPattern import TestPDPattern
@@ -28,6 +28,7 @@ from lattice2Common import *
 import lattice2BaseFeature
 import lattice2CompoundExplorer as LCE
 import lattice2Executer
+import lattice2ShapeIndex as ShapeIndex
 
 
 __title__="Lattice ArrayFilter module for FreeCAD"
@@ -44,7 +45,7 @@ def makeArrayFilter(name):
 class LatticeArrayFilter(lattice2BaseFeature.LatticeFeature):
     "The Lattice ArrayFilter object"
     
-    stencilModeList = ['collision-pass','window-distance', 'pointing-at']
+    stencilModeList = ['collision-pass','window-distance', 'pointing-at', 'inside', 'outside']
     
     def derivedInit(self,obj):
         self.Type = "LatticeArrayFilter"
@@ -68,17 +69,33 @@ class LatticeArrayFilter(lattice2BaseFeature.LatticeFeature):
         obj.addProperty("App::PropertyBool","Invert","Lattice ArrayFilter","Output elements that are rejected by filter, instead")
         obj.Invert = False
         
+        self.assureProperties(obj)
+        
         obj.Proxy = self
         
+    def assureProperties(self, obj):
+        '''Adds properties that can be missing on objects made with earlier version of Lattice2.'''
+        modes = ['bypass','specific items']+LatticeArrayFilter.stencilModeList
+        if obj.getEnumerationsOfProperty("FilterType") != modes:
+            mode = obj.FilterType
+            obj.FilterType = modes
+            obj.FilterType = mode
+        self.assureProperty(obj, "App::PropertyBool", "Parallel", False, "Lattice ArrayFilter", 
+            "Split the work among worker processes. Pays off for large arrays only. Number of workers is set in preferences.")
+        
+    def onDocumentRestored(self, obj):
+        lattice2BaseFeature.LatticeFeature.onDocumentRestored(self, obj)
+        self.assureProperties(obj)
 
     def derivedExecute(self,obj):
+        self.assureProperties(obj)
+        
         #validity check
         if not lattice2BaseFeature.isObjectLattice(screen(obj.Base)):
             lattice2Executer.warning(obj,"A lattice object is expected as Base, but a generic shape was provided. It will be treated as a lattice object; results may be unexpected.")
 
         output = [] #variable to receive the final list of placements
-        leaves = LCE.AllLeaves(screen(obj.Base).Shape)
-        input = [leaf.Placement for leaf in leaves]
+        input = lattice2BaseFeature.getPlacementsList(screen(obj.Base), obj, suppressWarning= True)
         if obj.FilterType == 'bypass':
             output = input
         elif obj.FilterType == 'specific items':
@@ -107,30 +124,32 @@ class LatticeArrayFilter(lattice2BaseFeature.LatticeFeature):
                     if not flags[i]:
                         output.append(input[i])
         elif obj.FilterType == 'collision-pass':
-            stencil = screen(obj.Stencil).Shape
-            for plm in input:
-                pnt = Part.Vertex(plm.Base)
-                d = pnt.distToShape(stencil)
-                if bool(d[0] < DistConfusion) ^ bool(obj.Invert):
-                    output.append(plm)
+            dists = self.stencilDistances(obj, DistConfusion)
+            output = [plm for plm, d in zip(input, dists) if bool(d < DistConfusion) ^ bool(obj.Invert)]
         elif obj.FilterType == 'window-distance':
-            vals = [0.0] * len(input)
-            for i in range(0,len(input)):
-                if obj.FilterType == 'window-distance':
-                    pnt = Part.Vertex(input[i].Base)
-                    vals[i] = pnt.distToShape(screen(obj.Stencil).Shape)[0]
-            
-            valFrom = obj.WindowFrom
-            valTo = obj.WindowTo
-            
-            for i in range(0,len(input)):
-                if bool(vals[i] >= valFrom and vals[i] <= valTo) ^ obj.Invert:
-                    output.append(input[i])
+            valFrom = float(obj.WindowFrom)
+            valTo = float(obj.WindowTo)
+            # distances beyond WindowTo come out as inf, which is rejected just as well
+            dists = self.stencilDistances(obj, valTo)
+            output = [plm for plm, d in zip(input, dists) if bool(d >= valFrom and d <= valTo) ^ bool(obj.Invert)]
+        elif obj.FilterType == 'inside' or obj.FilterType == 'outside':
+            points = lattice2BaseFeature.getPlacementsArray(screen(obj.Base), obj, suppressWarning= True)[:, 0:3]
+            flags = ShapeIndex.insideFlagsParallel(lattice2BaseFeature.getCompleteShape(screen(obj.Stencil)), points, parallel= obj.Parallel)
+            keep = (obj.FilterType == 'inside') ^ bool(obj.Invert)
+            output = [plm for plm, flag in zip(input, flags) if flag == keep]
         else:
             raise ValueError('Filter mode not implemented:'+obj.FilterType)
                             
         return output
         
+    def stencilDistances(self, obj, limit):
+        '''stencilDistances(obj, limit): returns distances from array elements to stencil (numpy array). 
+        Distances greater than limit are not computed exactly, inf is returned for them instead.'''
+        points = lattice2BaseFeature.getPlacementsArray(screen(obj.Base), obj, suppressWarning= True)[:, 0:3]
+        stencil = screen(obj.Stencil)
+        index = lattice2BaseFeature.getShapeIndex(stencil)
+        return ShapeIndex.distancesParallel(index, points, limit, parallel= obj.Parallel)
+        
         
 class ViewProviderArrayFilter(lattice2BaseFeature.ViewProviderLatticeFeature):
     "A View Provider for the Lattice ArrayFilter object"
@@ -173,6 +192,8 @@ def makeItemListFromSelection(sel, bMakeString = True):
             i_face = int(  sub[len("Face"):]  )  -  1
             i = int(i_face/faces_per_marker)
         
+        i *= lattice2BaseFeature.getMarkerStride(sel.Object)
+        
         # add the index to index list, avoiding duplicates
         if len(indexes) > 0 and i == indexes[-1]:
             pass
@@ -262,11 +283,15 @@ class _CommandArrayFilterStencilBased:
         return {'Pixmap'  : getIconPath("Lattice2_ArrayFilter.svg"),
                 'MenuText': "Array Filter: " + {"collision-pass":"touching",
                                                 "window-distance":"within distance window",
-                                                "pointing-at":"pointing at shape"}[mode],
+                                                "pointing-at":"pointing at shape",
+                                                "inside":"inside solid",
+                                                "outside":"outside solid"}[self.mode],
                 'Accel': "",
                 'ToolTip': {"collision-pass":"keep only placements that are on and/or in a stencil shape",
                             "window-distance":"keep only placements that are within distance window to stencil shape",
-                            "pointing-at":"keep only placements whose X axis ray touches stencil object"}[mode]}
+                            "pointing-at":"keep only placements whose X axis ray touches stencil object",
+                            "inside":"keep only placements whose origin is inside (or on the surface of) stencil solid",
+                            "outside":"keep only placements whose origin is outside of stencil solid"}[self.mode]}
         
     def Activated(self):
         sel = FreeCADGui.Selection.getSelectionEx()
@@ -35,6 +35,57 @@ import lattice2BaseFeature
 import lattice2CompoundExplorer as LCE
 import lattice2GeomUtils as Utils
 import lattice2Executer
+import lattice2Parallel
+
+# -------------------------- common stuff --------------------------------------------------
+
+def centerOfMass(shape):
+    '''centerOfMass(shape): center of mass of a shape, compounds of mixed dimensions are weighted by measure of the type of first leaf.'''
+    pos = App.Vector()
+    leaves = LCE.AllLeaves(shape)
+    totalW = 0
+    weightAttrib = {"Vertex":"",
+                 "Edge":"Length",
+                 "Wire":"Length",
+                 "Face":"Area",
+                 "Shell":"Area",
+                 "Solid":"Volume",
+                 "CompSolid":""}[leaves[0].ShapeType]
+    #Center of mass of a compound is a weghted average of centers
+    # of mass of individual objects.
+    for leaf in leaves:
+        w = 1.0 if not weightAttrib else (getattr(leaf, weightAttrib))
+        if leaf.ShapeType == 'Vertex':
+            leafCM = leaf.Point
+        #elif child.ShapeType == 'CompSolid':
+            #todo
+        else: 
+            leafCM = leaf.CenterOfMass
+        pos += leafCM * w
+        totalW += w
+    return pos * (1.0/totalW)
+
+def inertiaOrientation(shape):
+    '''inertiaOrientation(shape): rotation with X along first, and Z along third principal axis of inertia of the shape.'''
+    leaves = LCE.AllLeaves(shape)
+    if len(leaves)>1:
+        raise ValueError("calculation of principal axes of compounds is not supported yet")
+    props = leaves[0].PrincipalProperties
+    XAx = props['FirstAxisOfInertia']
+    ZAx = props['ThirdAxisOfInertia']
+    return Utils.makeOrientationFromLocalAxes(ZAx, XAx)
+
+def _massPropertiesJob(breps, want_center, want_axes):
+    # lattice2Parallel job: centerOfMass and inertiaOrientation of children sent as BREP strings. 
+    # Returns (center tuple or None, quaternion tuple or None) per child.
+    result = []
+    for brep in breps:
+        child = lattice2Parallel.shapeFromBrep(brep)
+        result.append((
+            tuple(centerOfMass(child)) if want_center else None,
+            tuple(inertiaOrientation(child).Q) if want_axes else None
+        ))
+    return result
 
 # -------------------------- document object --------------------------------------------------
 
@@ -65,8 +116,21 @@ class LatticeArrayFromShape(lattice2BaseFeature.LatticeFeature):
         obj.OrientMode = 'child'
 
         obj.addProperty("App::PropertyInteger","OrientElementIndex","Lattice ArrayFromShape","Index of vertex or face used for orientation calculation. Vertex or face - depends on selected OrientMode")
+        
+        self.assureProperties(obj)
+
+    def assureProperties(self, obj):
+        '''Adds properties that can be missing on objects made with earlier version of Lattice2.'''
+        self.assureProperty(obj, "App::PropertyBool", "Parallel", False, "Lattice ArrayFromShape", 
+            "Compute centers of mass and inertia axes of children in worker processes. Pays off for many children only. Number of workers is set in preferences.")
+        
+    def onDocumentRestored(self, obj):
+        lattice2BaseFeature.LatticeFeature.onDocumentRestored(self, obj)
+        self.assureProperties(obj)
 
     def derivedExecute(self,obj):
+        self.assureProperties(obj)
+        
         # cache stuff
         if lattice2BaseFeature.isObjectLattice(screen(obj.ShapeLink)):
             lattice2Executer.warning(obj,"ShapeLink points to a placement/array of placements. The placement/array will be reinterpreted as a generic shape; the results may be unexpected.")
@@ -101,8 +165,17 @@ class LatticeArrayFromShape(lattice2BaseFeature.LatticeFeature):
         # initialize output containers and loop variables
         outputPlms = [] #list of placements
         
+        # mass properties are the heavy part; compute them in workers, if asked
+        massProps = None
+        if (posIsCenterM or oriIsInertial) and lattice2Parallel.chunkCount(len(baseChildren), obj.Parallel) > 1:
+            try:
+                massProps = lattice2Parallel.mapChunks(_massPropertiesJob, [lattice2Parallel.shapeToBrep(child) for child in baseChildren], 
+                    shared= (posIsCenterM, oriIsInertial))
+            except ValueError as err:
+                raise ValueError(obj.Name + ": " + str(err))
+        
         # the essence
-        for child in baseChildren:
+        for iChild, child in enumerate(baseChildren):
             pos = App.Vector()
             ori = App.Rotation()
             if posIsNone:
@@ -112,28 +185,10 @@ class LatticeArrayFromShape(lattice2BaseFeature.LatticeFeature):
             elif posIsChild:
                 pos = child.Placement.Base
             elif posIsCenterM:
-                leaves = LCE.AllLeaves(child)
-                totalW = 0
-                weightAttrib = {"Vertex":"",
-                             "Edge":"Length",
-                             "Wire":"Length",
-                             "Face":"Area",
-                             "Shell":"Area",
-                             "Solid":"Volume",
-                             "CompSolid":""}[leaves[0].ShapeType]
-                #Center of mass of a compound is a weghted average of centers
-                # of mass of individual objects.
-                for leaf in leaves:
-                    w = 1.0 if not weightAttrib else (getattr(leaf, weightAttrib))
-                    if leaf.ShapeType == 'Vertex':
-                        leafCM = leaf.Point
-                    #elif child.ShapeType == 'CompSolid':
-                        #todo
-                    else: 
-                        leafCM = leaf.CenterOfMass
-                    pos += leafCM * w
-                    totalW += w
-                pos = pos * (1.0/totalW)
+                if massProps is not None:
+                    pos = App.Vector(*massProps[iChild][0])
+                else:
+                    pos = centerOfMass(child)
             elif posIsCenterBB:
                 import lattice2BoundBox
                 bb = lattice2BoundBox.getPrecisionBoundBox(child)
@@ -151,13 +206,13 @@ class LatticeArrayFromShape(lattice2BaseFeature.LatticeFeature):
             elif oriIsChild:
                 ori = child.Placement.Rotation
             elif oriIsInertial:
-                leaves = LCE.AllLeaves(child)
-                if len(leaves)>1:
-                    raise ValueError(obj.Name + ": calculation of principal axes of compounds is not supported yet")
-                props = leaves[0].PrincipalProperties
-                XAx = props['FirstAxisOfInertia']
-                ZAx = props['ThirdAxisOfInertia']
-                ori = Utils.makeOrientationFromLocalAxes(ZAx, XAx)
+                if massProps is not None:
+                    ori = App.Rotation(*massProps[iChild][1])
+                else:
+                    try:
+                        ori = inertiaOrientation(child)
+                    except ValueError as err:
+                        raise ValueError(obj.Name + ": " + str(err))
             elif oriIsEdge:
                 edge = child.Edges[obj.OrientElementIndex - 1]
                 XAx = edge.Curve.tangent(edge.Curve.FirstParameter)[0]
@@ -25,6 +25,8 @@ __title__="Base feature module for lattice object of lattice workbench for FreeC
 __author__ = "DeepSOIC"
 __url__ = ""
 
+import numpy
+
 import FreeCAD as App
 import Part
 
@@ -32,6 +34,9 @@ from lattice2Common import *
 import lattice2CompoundExplorer as LCE
 import lattice2Markers
 import lattice2Executer
+import lattice2Memo as Memo
+import lattice2PlacementArray as PlacementArray
+import lattice2ShapeIndex as ShapeIndex
 from lattice2ShapeCopy import shallowCopy
 
 
@@ -93,12 +98,12 @@ def isObjectLattice(documentObject):
 
 def getMarkerSizeEstimate(ListOfPlacements, feature = None):
     '''getMarkerSizeEstimate(ListOfPlacements, feature = None): computes the default marker size for the array of placements.
+    ListOfPlacements can also be a placement array (see lattice2PlacementArray).
     If feature is provided, marker size property will be assigned to viewer-based autosize if size based on array content is zero.'''
     if len(ListOfPlacements) == 0:
         return 1.0
-    pathLength = 0
-    for i in range(1, len(ListOfPlacements)):
-        pathLength += (ListOfPlacements[i].Base - ListOfPlacements[i-1].Base).Length
+    positions = PlacementArray.asArray(ListOfPlacements)[:, 0:3]
+    pathLength = float(numpy.sum(numpy.linalg.norm(numpy.diff(positions, axis= 0), axis= 1)))
     sz = pathLength/len(ListOfPlacements)/2.0
     #FIXME: make hierarchy-aware
     if sz < DistConfusion*10:
@@ -135,6 +140,8 @@ class LatticeFeature(object):
         
         prop = "ExposePlacement"
         obj.addProperty("App::PropertyBool",prop,"Lattice","Makes the placement synchronized to Placement property. This will often make this object unmovable. Not applicable to arrays.")
+        
+        self.assureMarkerProperties(obj)
 
         self.derivedInit(obj)
         
@@ -151,45 +158,65 @@ class LatticeFeature(object):
         '''for overriding by derived classes'''
         pass
         
+    def assureMarkerProperties(self, obj):
+        '''Adds marker display properties, which can be missing on objects made with earlier version of Lattice2.'''
+        self.assureProperty(obj, "App::PropertyEnumeration", "Markers", ["All", "Decimated", "When visible", "Instanced"], "Lattice", 
+            "Sets which placement markers go into the shape. 'All': one marker per placement. 'Decimated': no more than "
+            "MarkersLimit markers, evenly picked. 'When visible': markers are only made when the object is shown. "
+            "'Instanced': the shape has no markers; the view draws one shared marker at every placement (fast, but not selectable). "
+            "Placements are available to Lattice2 array tools in full regardless. If other objects (e.g. Part booleans, or "
+            "anything attached to a marker) use this one, markers are made for all placements in any mode, as they read the shape.")
+        self.assureProperty(obj, "App::PropertyInteger", "MarkersLimit", 1000, "Lattice", "Maximum number of markers to show, if Markers is 'Decimated'.")
+        if not hasattr(obj, "PlacementData"):
+            obj.addProperty("App::PropertyFloatList", "PlacementData", "Lattice", "Placements of the array (x, y, z, qx, qy, qz, qw for each), kept if marker shape doesn't have all of them", 0, True, True)
+        
     def execute(self,obj):
         # please, don't override. Override derivedExecute instead.
+        
+        self._placementStore = None
+        self.assureMarkerProperties(obj)
 
         plms = self.derivedExecute(obj)
 
         if plms is not None:
-            if plms == "suppress":
+            if isinstance(plms, str) and plms == "suppress":
                 return
-            obj.NumElements = len(plms)
-            shapes = []
-            markerSize = obj.MarkerSize
-            if markerSize < DistConfusion:
-                markerSize = getMarkerSizeEstimate(plms, obj)
-            marker = lattice2Markers.getPlacementMarker(scale= markerSize, markerID= obj.MarkerShape)
+            plmArray = PlacementArray.asArray(plms)
+            obj.NumElements = len(plmArray)
             
             bExposing = False
             if obj.ExposePlacement:
-                if len(plms) == 1:
+                if len(plmArray) == 1:
                     bExposing = True
                 else:
                     lattice2Executer.warning(obj,"Multiple placements are being fed, can't expose placements. Placement property will be forced to zero.")
                     obj.Placement = App.Placement()
             
             if bExposing:
-                obj.Shape = shallowCopy(marker)
-                obj.Placement = plms[0]
+                self._setPlacementData(obj, None)
+                obj.Shape = shallowCopy(lattice2Markers.getPlacementMarker(scale= self.getMarkerSize(obj, plmArray), markerID= obj.MarkerShape))
+                obj.Placement = PlacementArray.toPlacement(plmArray[0])
             else:
-                for plm in plms:
-                    sh = shallowCopy(marker)
-                    sh.Placement = plm
-                    shapes.append(sh)
-                    
-                if len(shapes) == 0:
-                    obj.Shape = lattice2Markers.getNullShapeShape(markerSize)
+                if len(plmArray) == 0:
+                    self._setPlacementData(obj, None)
+                    obj.Shape = lattice2Markers.getNullShapeShape(self.getMarkerSize(obj, plmArray))
                     raise ValueError('Lattice object is null') 
                 
-                sh = Part.makeCompound(shapes)
+                # objects that read markers off the shape need them all; Lattice2 tools read placements instead
+                bUsed = _needsCompleteMarkers(obj)
+                bComplete = bUsed or obj.Markers == "All" or obj.Markers == "When visible" and _isShown(obj)
+                if obj.Markers == "Decimated" and len(plmArray) <= obj.MarkersLimit:
+                    bComplete = True
+                # if markers don't represent all placements, keep the placements in a property, for they are to survive save-load
+                self._setPlacementData(obj, None if bComplete else plmArray)
+                if obj.Markers in ("When visible", "Instanced") and not bComplete:
+                    sh = Part.makeCompound([])
+                else:
+                    sh = self.makeMarkerCompound(obj, plmArray)
                 sh.Placement = obj.Placement
                 obj.Shape = sh
+                # remember the placements, so that getPlacementsList doesn't have to dig them out of the marker compound
+                self._placementStore = (sh, plmArray)
 
             if obj.isLattice == 'Auto-Off':
                 obj.isLattice = 'Auto-On'
@@ -200,6 +227,7 @@ class LatticeFeature(object):
             # Moreover, we assume that it is no longer a lattice object, so:
             if obj.isLattice == 'Auto-On':
                 obj.isLattice = 'Auto-Off'
+            self._setPlacementData(obj, None)
                 
             if obj.ExposePlacement:
                 if obj.Shape.ShapeType == "Compound":
@@ -214,9 +242,40 @@ class LatticeFeature(object):
                     pass
         return
     
+    def getMarkerSize(self, obj, plmArray):
+        '''getMarkerSize(obj, plmArray): returns MarkerSize, or automatic size if it is zero.'''
+        markerSize = obj.MarkerSize
+        if markerSize < DistConfusion:
+            markerSize = getMarkerSizeEstimate(plmArray, obj)
+        return markerSize
+        
+    def getMarkerStride(self, obj):
+        '''getMarkerStride(obj): returns how many placements there are per marker in the shape (1 unless decimated).'''
+        if getattr(obj, "Markers", "All") != "Decimated" or len(obj.PlacementData) == 0:
+            return 1
+        return -(-obj.NumElements // max(obj.MarkersLimit, 1))
+        
+    def makeMarkerCompound(self, obj, plmArray, complete = False):
+        '''makeMarkerCompound(obj, plmArray, complete = False): makes a compound of placement markers for 
+        the array, with decimation applied according to Markers property, unless complete is True.'''
+        marker = lattice2Markers.getPlacementMarker(scale= self.getMarkerSize(obj, plmArray), markerID= obj.MarkerShape)
+        shapes = []
+        for plm in PlacementArray.toPlacements(plmArray if complete else plmArray[::self.getMarkerStride(obj)]):
+            sh = shallowCopy(marker)
+            sh.Placement = plm
+            shapes.append(sh)
+        return Part.makeCompound(shapes)
+        
+    def _setPlacementData(self, obj, plmArray):
+        if plmArray is None:
+            if len(obj.PlacementData) > 0:
+                obj.PlacementData = []
+        else:
+            obj.PlacementData = plmArray.ravel().tolist()
+        
     def derivedExecute(self,obj):
-        '''For overriding by derived class. If this returns a list of placements,
-            it's going to be used to build the shape. If returns None, it is assumed that 
+        '''For overriding by derived class. If this returns a list of placements (or 
+            a placement array, see lattice2PlacementArray), it's going to be used to build the shape. If returns None, it is assumed that 
             derivedExecute has already assigned the shape, and no further actions are needed. 
             Moreover, None is a signal that the object is not a lattice array, and it will 
             morph into a non-lattice if isLattice is set to auto'''
@@ -232,6 +291,9 @@ class LatticeFeature(object):
             pass # quick-n-dirty fix for Py3. TODO: restore the functionality in Py3, or remove this routine altogether.
             
     def onChanged(self, obj, prop): #prop is a string - name of the property
+        if prop == 'Markers' and obj.ViewObject is not None and 'Restore' not in obj.State:
+            if hasattr(obj.ViewObject.Proxy, 'updateDisplayMode'):
+                obj.ViewObject.Proxy.updateDisplayMode(obj.ViewObject)
         if prop == 'isLattice':
             if obj.ViewObject is not None:
                 try:
@@ -320,6 +382,81 @@ class ViewProviderLatticeFeature(object):
     def attach(self, vobj):
         self.ViewObject = vobj
         self.Object = vobj.Object
+        self.assureInstancedNode(vobj)
+        self.assureDisplayModeProperty(vobj)
+
+    def getDisplayModes(self, vobj):
+        return ["Instanced"]
+
+    def assureInstancedNode(self, vobj):
+        '''assureInstancedNode(vobj): adds the scenegraph for 'Instanced' display mode, if not yet there.
+        View providers that override attach() get it on first update.'''
+        if getattr(self, "_instancedCopies", None) is not None:
+            return
+        from pivy import coin
+        root = coin.SoSeparator()
+        self._instancedCopies = coin.SoMultipleCopy()
+        self._instancedMarker = coin.SoSeparator()
+        self._instancedCopies.addChild(self._instancedMarker)
+        root.addChild(self._instancedCopies)
+        vobj.addDisplayMode(root, "Instanced")
+        
+    def updateData(self, obj, prop):
+        if prop in ("Markers", "Shape", "PlacementData"):
+            try:
+                self.updateInstancedMarkers(obj)
+            except Exception as err:
+                App.Console.PrintError("Lattice2: failed to make instanced markers: {err}\n".format(err= str(err)))
+        
+    def updateInstancedMarkers(self, obj):
+        '''updateInstancedMarkers(obj): fills 'Instanced' display mode with one marker tessellation and 
+        a transform per placement. Doesn't change view properties; see updateDisplayMode for that.'''
+        vobj = obj.ViewObject
+        if vobj is None:
+            return
+        plmArray = self._instancedPlacements(obj)
+        if plmArray is None:
+            return
+        self.assureInstancedNode(vobj)
+        
+        from pivy import coin
+        # Coin multiplies row vectors, so its matrices are transposed relative to FreeCAD's
+        mats = numpy.swapaxes(PlacementArray.toMatrices(plmArray), -1, -2).reshape(-1, 16).tolist()
+        self._instancedCopies.matrix.setNum(len(mats))
+        self._instancedCopies.matrix.setValues(0, len(mats), [coin.SbMatrix(*m) for m in mats])
+        
+        self._instancedMarker.removeAllChildren()
+        if len(plmArray) > 0:
+            marker = lattice2Markers.getPlacementMarker(scale= obj.Proxy.getMarkerSize(obj, plmArray), markerID= obj.MarkerShape)
+            self._instancedMarker.addChild(_makeMarkerNode(marker, vobj))
+        
+    def _instancedPlacements(self, obj):
+        # local placements to draw in 'Instanced' display mode, or None if not instanced (or not a lattice at the moment)
+        if getattr(obj, "Markers", None) != "Instanced":
+            return None
+        plmArray = _getStoredPlacements(obj, local= True)
+        if plmArray is None and isObjectLattice(obj):
+            # markers are complete, and the project was just opened
+            plmArray = PlacementArray.compose(PlacementArray.fromPlacement(obj.Shape.Placement.inverse()), _getPlacementsArray(obj))
+        return plmArray
+        
+    def updateDisplayMode(self, vobj):
+        '''updateDisplayMode(vobj): switches to 'Instanced' display mode, or back to the mode the user had 
+        before, according to Markers property. Called when Markers is changed.'''
+        obj = vobj.Object
+        self.assureDisplayModeProperty(vobj)
+        if getattr(obj, "Markers", None) == "Instanced":
+            self.updateInstancedMarkers(obj)
+            if vobj.DisplayMode != "Instanced":
+                vobj.DisplayModeBeforeInstanced = vobj.DisplayMode
+                vobj.DisplayMode = "Instanced"
+        elif vobj.DisplayMode == "Instanced":
+            vobj.DisplayMode = vobj.DisplayModeBeforeInstanced or "Flat Lines"
+        
+    def assureDisplayModeProperty(self, vobj):
+        '''assureDisplayModeProperty(vobj): adds the property that remembers user's display mode while in 'Instanced' mode.'''
+        if not hasattr(vobj, "DisplayModeBeforeInstanced"):
+            vobj.addProperty("App::PropertyString", "DisplayModeBeforeInstanced", "Lattice", "Display mode to restore when Markers is no longer 'Instanced'", 0, True, True)
 
     def __getstate__(self):
         return None
@@ -337,6 +474,13 @@ class ViewProviderLatticeFeature(object):
         self.Object.Proxy.verifyIntegrity()
         self.verifyIntegrity()
         return []
+        
+    def onChanged(self, vobj, prop):
+        if prop == 'Visibility' and vobj.Visibility:
+            # markers were postponed by 'When visible' mode; have them made by the next recompute
+            obj = vobj.Object
+            if getattr(obj, 'Markers', None) == 'When visible' and not hasCompleteMarkers(obj):
+                obj.touch()
 
     def onDelete(self, feature, subelements): # subelements is a tuple of strings
         try:
@@ -354,6 +498,40 @@ class ViewProviderLatticeFeature(object):
         return True
 
 
+def _makeMarkerNode(marker, vobj):
+    '''_makeMarkerNode(marker, vobj): tessellates marker shape into a coin node, colored per view provider.'''
+    from pivy import coin
+    node = coin.SoSeparator()
+    bb = marker.BoundBox
+    points, triangles = marker.tessellate(max(bb.DiagonalLength, DistConfusion) * 0.01)
+    
+    mat = coin.SoMaterial()
+    mat.diffuseColor.setValue(vobj.ShapeColor[0:3])
+    node.addChild(mat)
+    coords = coin.SoCoordinate3()
+    coords.point.setValues(0, len(points), [tuple(v) for v in points])
+    node.addChild(coords)
+    faces = coin.SoIndexedFaceSet()
+    indexes = []
+    for tri in triangles:
+        indexes.extend(tri)
+        indexes.append(-1)
+    faces.coordIndex.setValues(0, len(indexes), indexes)
+    node.addChild(faces)
+    
+    lineColor = coin.SoBaseColor()
+    lineColor.rgb.setValue(vobj.LineColor[0:3])
+    node.addChild(lineColor)
+    for edge in marker.Edges:
+        pts = edge.discretize(Deflection= bb.DiagonalLength * 0.01 + DistConfusion)
+        edgeCoords = coin.SoCoordinate3()
+        edgeCoords.point.setValues(0, len(pts), [tuple(v) for v in pts])
+        node.addChild(edgeCoords)
+        line = coin.SoLineSet()
+        line.numVertices.setValue(len(pts))
+        node.addChild(line)
+    return node
+    
 def assureProperty(docobj, proptype, propname, defvalue, group, tooltip):
     """assureProperty(docobj, proptype, propname, defvalue, group, tooltip): adds
     a property if one is missing, and sets its value to default. Does nothing if property 
@@ -380,13 +558,130 @@ def getPlacementsList(documentObject, context = None, suppressWarning = False):
     '''getPlacementsList(documentObject, context = None): extract list of placements 
     from an array object. Context is an object to report as context, when displaying 
     a warning if the documentObject happens to be a non-lattice.'''
+    _checkIsLattice(documentObject, context, suppressWarning)
+    if documentObject.isDerivedFrom('App::Placement') or documentObject.isDerivedFrom('PartDesign::CoordinateSystem'):
+        return [documentObject.Placement]
+    return PlacementArray.toPlacements(_getPlacementsArray(documentObject))
+
+def getPlacementsArray(documentObject, context = None, suppressWarning = False):
+    '''getPlacementsArray(documentObject, context = None, suppressWarning = False): same 
+    as getPlacementsList, but returns an (N,7) placement array (see lattice2PlacementArray), 
+    which is much faster for large arrays, if the rest of the job is done with numpy too. 
+    The returned array can be shared with the object; don't modify it in place.'''
+    _checkIsLattice(documentObject, context, suppressWarning)
+    if documentObject.isDerivedFrom('App::Placement') or documentObject.isDerivedFrom('PartDesign::CoordinateSystem'):
+        return PlacementArray.asArray(documentObject.Placement)
+    return _getPlacementsArray(documentObject)
+
+def _getPlacementsArray(documentObject):
+    # placements are extracted once per shape of the object; see lattice2Memo
+    def extract():
+        array = _getStoredPlacements(documentObject)
+        if array is None:
+            array = LCE.AllLeafPlacements(documentObject.Shape)
+        return array
+    return Memo.memoize(documentObject, 'placements', extract)
+
+def getLeaves(documentObject):
+    '''getLeaves(documentObject): returns LCE.AllLeaves of the shape of the object (see 
+    getCompleteShape), cached until the shape changes. The list is yours, but the leaf 
+    shapes are shared; don't modify them in place.'''
+    return list(Memo.memoize(documentObject, 'leaves', lambda: LCE.AllLeaves(getCompleteShape(documentObject))))
+
+def getCompleteShape(documentObject):
+    '''getCompleteShape(documentObject): returns the shape of the object. For a lattice 
+    whose markers are decimated or postponed (see Markers property), returns a compound 
+    with a marker for every placement instead, cached until the shape changes.'''
+    if hasCompleteMarkers(documentObject):
+        return documentObject.Shape
+    def make():
+        sh = documentObject.Proxy.makeMarkerCompound(documentObject, _getStoredPlacements(documentObject, local= True), complete= True)
+        sh.Placement = documentObject.Shape.Placement
+        return sh
+    return Memo.memoize(documentObject, 'complete shape', make)
+
+# modules of Lattice2 features that read the lattices they use only through getPlacementsArray, 
+# getPlacementsList, getLeaves, getCompleteShape or getShapeIndex, so markers in the shape don't matter to them
+_placementReaders = set([
+    'lattice2ArrayFilter',
+    'lattice2BoundBox',
+    'lattice2Invert',
+    'lattice2JoinArrays',
+    'lattice2Mirror',
+    'lattice2PDPattern',
+    'lattice2PopulateChildren',
+    'lattice2PopulateCopies',
+    'lattice2ProjectArray',
+    'lattice2Resample',
+    'lattice2ScLERP',
+    'lattice2ShapeInfoFeature',
+    'lattice2ShapeString',
+    'lattice2Slice',
+])
+
+def _needsCompleteMarkers(documentObject):
+    '''_needsCompleteMarkers(documentObject): True if an object that uses this one may read markers 
+    off its shape: anything but the features listed in _placementReaders, or one attached to a marker.'''
+    for consumer in documentObject.InList:
+        if type(getattr(consumer, 'Proxy', None)).__module__ not in _placementReaders:
+            return True
+        for prop in ('AttachmentSupport', 'Support'):
+            try:
+                links = getattr(consumer, prop, None) or []
+                if any(link[0] is documentObject and any(sub != '' for sub in link[1]) for link in links):
+                    return True
+            except (TypeError, IndexError):
+                pass
+    return False
+
+def hasCompleteMarkers(documentObject):
+    '''hasCompleteMarkers(documentObject): returns False if the object is a lattice whose 
+    shape doesn't have a marker for every placement (see Markers property).'''
+    return len(getattr(documentObject, 'PlacementData', [])) == 0
+
+def getShapeIndex(documentObject):
+    '''getShapeIndex(documentObject): returns lattice2ShapeIndex.ShapeIndex of the shape of the 
+    object (see getCompleteShape), cached until the shape changes.'''
+    return Memo.memoize(documentObject, 'shape index', lambda: ShapeIndex.ShapeIndex(getCompleteShape(documentObject)))
+
+def _checkIsLattice(documentObject, context, suppressWarning):
     if not isObjectLattice(documentObject):
         if not suppressWarning:
             lattice2Executer.warning(context, documentObject.Name + " is not a placement or an array of placements. Results may be unexpected.")
-    if documentObject.isDerivedFrom('App::Placement') or documentObject.isDerivedFrom('PartDesign::CoordinateSystem'):
-        return [documentObject.Placement]
-    leaves = LCE.AllLeaves(documentObject.Shape)
-    return [leaf.Placement for leaf in leaves]
+
+def getMarkerStride(documentObject):
+    '''getMarkerStride(documentObject): returns how many placements of the array 
+    there are per marker in the shape. It is 1 unless markers are decimated, then 
+    marker number i corresponds to placement number i*stride.'''
+    if hasattr(documentObject, 'Proxy') and hasattr(documentObject.Proxy, 'getMarkerStride'):
+        return documentObject.Proxy.getMarkerStride(documentObject)
+    return 1
+
+def _isShown(documentObject):
+    return App.GuiUp and documentObject.ViewObject is not None and documentObject.ViewObject.Visibility
+
+def _getStoredPlacements(documentObject, local = False):
+    '''_getStoredPlacements(documentObject, local = False): returns the placement array remembered by 
+    LatticeFeature.execute, or None if there is no up-to-date record (e.g. the project was 
+    just opened, or the shape was replaced since). If local, object's Placement is not applied.'''
+    proxy = getattr(documentObject, 'Proxy', None)
+    store = getattr(proxy, '_placementStore', None)
+    cur_shape = documentObject.Shape
+    if store is not None and cur_shape.isPartner(store[0]):
+        array = store[1]
+    elif len(getattr(documentObject, 'PlacementData', [])) > 0:
+        # the marker shape doesn't have all the placements, so they were saved into the property
+        array = numpy.array(documentObject.PlacementData).reshape(-1, 7)
+        if proxy is not None:
+            proxy._placementStore = (cur_shape, array)
+    else:
+        return None
+    if local:
+        return array
+    plm_shape = cur_shape.Placement # the marker compound follows Placement of the object, so the stored placements need to follow as well
+    if not plm_shape.isIdentity():
+        array = PlacementArray.compose(PlacementArray.fromPlacement(plm_shape), array)
+    return array
 
 def splitSelection(sel):
     '''splitSelection(sel): splits sel (use getSelectionEx()) into lattices and non-lattices.
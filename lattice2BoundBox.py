@@ -155,7 +155,7 @@ class _BoundBox:
         
 
     def execute(self,obj):
-        base = screen(obj.ShapeLink).Shape
+        base = LBF.getCompleteShape(screen(obj.ShapeLink))
         if obj.CompoundTraversal == "Use as a whole":
             baseChildren = [base]
         else:
@@ -23,6 +23,8 @@
 
 import Part
 
+import lattice2PlacementArray as PlacementArray
+
 class CompoundExplorer:
     """
     CompoundExplorer: Iterator class to traverse compound hierarchy.
@@ -134,20 +136,38 @@ class CompoundExplorer:
 
 
 def CalculateNumberOfLeaves(compound):
-    '''CalculateNumberOfLeaves(compound): calculates the number of non-compound shapes (leaves) in the compound tree. Slow; good candidate for transferring into C++.'''
+    '''CalculateNumberOfLeaves(compound): calculates the number of non-compound shapes (leaves) in the compound tree.'''
     if compound.ShapeType != 'Compound':
         return 1
-    else:
-        children = compound.childShapes(False,False)
-        cnt = 0
-        for ch in children:
-            cnt += CalculateNumberOfLeaves(ch)
-        return cnt
+    cnt = 0
+    stack = [compound.childShapes(False,False)]
+    while stack:
+        for ch in stack.pop():
+            if ch.ShapeType == 'Compound':
+                stack.append(ch.childShapes(False,False))
+            else:
+                cnt += 1
+    return cnt
         
 def AllLeaves(compound):
-    'AllLeaves(compound): Traverses the compound and collects all the leaves into a single list. Returns list of shapes.'
+    '''AllLeaves(compound): Traverses the compound and collects all the leaves into a single list. Returns list of shapes.
+    Same as collecting MSG_LEAF items from CompoundExplorer, but much faster.'''
+    if compound.ShapeType != 'Compound':
+        return [compound]
     output = []
-    for (child, msg, it) in CompoundExplorer(compound):
-        if msg == it.MSG_LEAF:
+    # stack of iterators over childShapes of compounds being traversed (like a stack of TopoDS_Iterator)
+    stack = [iter(compound.childShapes())]
+    while stack:
+        for child in stack[-1]:
+            if child.ShapeType == 'Compound':
+                stack.append(iter(child.childShapes()))
+                break
             output.append(child)
+        else:
+            stack.pop()
     return output
+
+def AllLeafPlacements(compound):
+    '''AllLeafPlacements(compound): returns placements of all leaves of the compound, as an 
+    (N,7) placement array (see lattice2PlacementArray), in the order of AllLeaves.'''
+    return PlacementArray.fromPlacements([leaf.Placement for leaf in AllLeaves(compound)])
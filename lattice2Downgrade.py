@@ -36,14 +36,29 @@ def getAllSeams(shape):
     # this is a hack.
     # Seam edges were found to be in wires that contain the seam edge twice.
     # See http://forum.freecadweb.org/viewtopic.php?f=3&t=15470#p122993 (post #7 in topic "Extra Line in Models")
-    import itertools
+    from lattice2Subsequencer import HashableShape
     seams = []
     for w in shape.Wires:
-        for (e1,e2) in itertools.combinations(w.childShapes(),2):
-            if e1.isSame(e2):
-                seams.append(e1)
+        edges = [HashableShape(e) for e in w.childShapes()]
+        counts = {}
+        for e in edges:
+            counts[e] = counts.get(e, 0) + 1
+        if len(counts) == len(edges):
+            continue # no repeated edges in this wire
+        # an edge is output once per later occurrence of it in the wire
+        seen = {}
+        for e in edges:
+            r = seen.get(e, 0)
+            seen[e] = r + 1
+            seams.extend([e.Shape] * (counts[e] - 1 - r))
     return seams
 
+def getNonSeams(shape):
+    '''getNonSeams(shape): extract all edges of a shape that are not seams. Returns list of edges.'''
+    from lattice2Subsequencer import HashableShape
+    seams = set(HashableShape(e) for e in getAllSeams(shape))
+    return [e for e in shape.Edges if HashableShape(e) not in seams]
+
 
 # -------------------------- common stuff --------------------------------------------------
 
@@ -107,17 +122,7 @@ class _latticeDowngrade:
         elif obj.Mode == 'Seam edges':
             rst = getAllSeams(shp)
         elif obj.Mode == 'Non-seam edges':
-            seams = getAllSeams(shp)
-            edges = shp.Edges
-            rst = []
-            for e in edges:
-                bIsSeam = False
-                for s in seams:
-                    if e.isSame(s):
-                        bIsSeam = True
-                        break
-                if not bIsSeam:
-                    rst.append(e)
+            rst = getNonSeams(shp)
         elif obj.Mode == 'Vertices':
             rst = shp.Vertexes
         else:
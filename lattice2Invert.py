@@ -32,7 +32,7 @@ import Part
 
 from lattice2Common import *
 import lattice2BaseFeature
-import lattice2CompoundExplorer as LCE
+import lattice2PlacementArray as PlacementArray
 import lattice2GeomUtils as Utils
 import lattice2Executer
 
@@ -60,44 +60,22 @@ class LatticeInvert(lattice2BaseFeature.LatticeFeature):
 
     def derivedExecute(self,obj):
         # cache stuff
-        base = screen(obj.Base).Shape
         if not lattice2BaseFeature.isObjectLattice(screen(obj.Base)):
             lattice2Executer.warning(obj, "Base is not a lattice, but lattice is expected. Results may be unexpected.\n")
-        baseChildren = LCE.AllLeaves(base)
-                        
-        #cache mode comparisons, for speed
-        posIsInvert = obj.TranslateMode == 'invert'
-        posIsKeep = obj.TranslateMode == 'keep'
-        posIsReset = obj.TranslateMode == 'reset'
+        basePlms = lattice2BaseFeature.getPlacementsArray(screen(obj.Base), obj, suppressWarning= True)
         
-        oriIsInvert = obj.OrientMode == 'invert'
-        oriIsKeep = obj.OrientMode == 'keep'
-        oriIsReset = obj.OrientMode == 'reset'
+        # the essence
+        inverted = PlacementArray.inverse(basePlms)
+        outputPlms = PlacementArray.identity(len(basePlms))
         
-        # initialize output containers and loop variables
-        outputPlms = [] #list of placements
+        pos_source = {'invert': inverted, 'keep': basePlms, 'reset': None}[obj.TranslateMode]
+        if pos_source is not None:
+            outputPlms[:, 0:3] = pos_source[:, 0:3]
         
-        # the essence
-        for child in baseChildren:
-            pos = App.Vector()
-            ori = App.Rotation()
-            inverted = child.Placement.inverse()
-            if posIsInvert:
-                pos = inverted.Base
-            elif posIsKeep:
-                pos = child.Placement.Base
-            elif posIsReset:
-                pass
+        ori_source = {'invert': inverted, 'keep': basePlms, 'reset': None}[obj.OrientMode]
+        if ori_source is not None:
+            outputPlms[:, 3:7] = ori_source[:, 3:7]
             
-            if oriIsInvert:
-                ori = inverted.Rotation
-            elif oriIsKeep:
-                ori = child.Placement.Rotation
-            elif oriIsReset:
-                pass
-                
-            plm = App.Placement(pos, ori)
-            outputPlms.append(plm)
         return outputPlms
 
 
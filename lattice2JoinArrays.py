@@ -30,7 +30,6 @@ import Part
 
 from lattice2Common import *
 import lattice2BaseFeature
-import lattice2CompoundExplorer as LCE
 import lattice2Executer
 
 # -------------------------- document object --------------------------------------------------
@@ -66,9 +65,9 @@ class JoinArrays(lattice2BaseFeature.LatticeFeature):
         listlistPlms = []
         lengths = []
         for link in obj.Links:
-            leaves = LCE.AllLeaves(link.Shape)
-            listlistPlms.append([child.Placement for child in leaves])
-            lengths.append(len(leaves))
+            plms = lattice2BaseFeature.getPlacementsList(link, obj, suppressWarning= True)
+            listlistPlms.append(plms)
+            lengths.append(len(plms))
         
         #processing
         output = [] #list of placements
@@ -27,11 +27,14 @@ __url__ = ""
 
 import math
 
+import numpy
+
 import FreeCAD as App
 import Part
 
 from lattice2Common import *
 import lattice2BaseFeature
+import lattice2PlacementArray as PlacementArray
 from lattice2BaseFeature import assureProperty
 import lattice2Executer
 import lattice2GeomUtils
@@ -151,7 +154,7 @@ class LinearArray(lattice2BaseFeature.LatticeFeature):
         
         # Generate series of values
         self.generator.execute()
-        values = [float(strv) for strv in obj.Values]
+        values = numpy.array([float(strv) for strv in obj.Values])
         
         #Apply reversal
         if obj.Reverse:
@@ -170,11 +173,8 @@ class LinearArray(lattice2BaseFeature.LatticeFeature):
         dir.normalize()
         
         # Make the array
-        output = [] # list of placements
-        for v in values:
-            output.append( App.Placement(obj.Point + obj.Dir*v, ori) )
-            
-        return output
+        positions = PlacementArray.vectors(obj.Point) + numpy.outer(values, PlacementArray.vectors(obj.Dir))
+        return PlacementArray.make(positions, ori.Q)
         
     def onChanged(self, selfobj, prop): #prop is a string - name of the property
         # synchronize SubLink and Object+SubNames properties
@@ -0,0 +1,165 @@
+#***************************************************************************
+#*                                                                         *
+#*   Copyright (c) 2026 - Victor Titov (DeepSOIC)                          *
+#*                                               <vv.titov@gmail.com>      *  
+#*                                                                         *
+#*   This program is free software; you can redistribute it and/or modify  *
+#*   it under the terms of the GNU Lesser General Public License (LGPL)    *
+#*   as published by the Free Software Foundation; either version 2 of     *
+#*   the License, or (at your option) any later version.                   *
+#*   for detail see the LICENCE text file.                                 *
+#*                                                                         *
+#*   This program is distributed in the hope that it will be useful,       *
+#*   but WITHOUT ANY WARRANTY; without even the implied warranty of        *
+#*   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the         *
+#*   GNU Library General Public License for more details.                  *
+#*                                                                         *
+#*   You should have received a copy of the GNU Library General Public     *
+#*   License along with this program; if not, write to the Free Software   *
+#*   Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  *
+#*   USA                                                                   *
+#*                                                                         *
+#***************************************************************************
+
+__title__="LinkIndex module for Lattice2"
+__author__ = "DeepSOIC"
+__url__ = ""
+__doc__ = "Index of reverse links (which properties link to an object) per document, kept up to date by a document observer"
+
+# For every document, the index keeps link edges (object, property) -> target object, 
+# found by scanning link properties of objects. Scanning is lazy: a change of a link 
+# property, or addition/removal of an object or property, only marks the object as 
+# dirty, and it is rescanned on next lookup. Types of properties are resolved once per 
+# object, and re-resolved if a dynamic property is added or removed.
+
+import FreeCAD as App
+
+LINK_TYPES = ('App::PropertyLink', 'App::PropertyLinkList', 'App::PropertyLinkSub', 'App::PropertyLinkSubList')
+
+def linkTargets(value, typ):
+    '''linkTargets(value, typ): returns list of objects linked by value of a link property of type typ.'''
+    if value is None:
+        return []
+    if typ == 'App::PropertyLink':
+        return [value]
+    elif typ == 'App::PropertyLinkList':
+        return list(value)
+    elif typ == 'App::PropertyLinkSub':
+        return [value[0]]
+    elif typ == 'App::PropertyLinkSubList':
+        return [tup[0] for tup in value]
+    return []
+
+class LinkIndex(object):
+    def __init__(self, doc):
+        self.docName = doc.Name
+        self.props = {} # object name -> list of (property name, type) of link properties
+        self.edgesFrom = {} # object name -> list of (target name, property name)
+        self.edgesTo = {} # target name -> set of (object name, property name)
+        self.dirty = set(obj.Name for obj in doc.Objects)
+    
+    def markDirty(self, obj_name, types_changed = False):
+        self.dirty.add(obj_name)
+        if types_changed:
+            self.props.pop(obj_name, None)
+    
+    def isLinkProperty(self, obj_name, prop_name):
+        props = self.props.get(obj_name)
+        if props is None:
+            return True # not resolved yet; assume it may be
+        return any(p == prop_name for p, typ in props)
+    
+    def flush(self):
+        '''flush(): rescans dirty objects.'''
+        if not self.dirty:
+            return
+        doc = App.getDocument(self.docName)
+        for obj_name in self.dirty:
+            for target, prop_name in self.edgesFrom.pop(obj_name, []):
+                self.edgesTo[target].discard((obj_name, prop_name))
+            obj = doc.getObject(obj_name)
+            if obj is None:
+                self.props.pop(obj_name, None)
+                continue
+            props = self.props.get(obj_name)
+            if props is None:
+                props = [(prop_name, obj.getTypeIdOfProperty(prop_name)) for prop_name in obj.PropertiesList]
+                props = [(prop_name, typ) for prop_name, typ in props if typ in LINK_TYPES]
+                self.props[obj_name] = props
+            edges = []
+            for prop_name, typ in props:
+                for target in linkTargets(getattr(obj, prop_name), typ):
+                    if target is not None and target.Document.Name == self.docName:
+                        edges.append((target.Name, prop_name))
+            self.edgesFrom[obj_name] = edges
+            for edge in edges:
+                self.edgesTo.setdefault(edge[0], set()).add((obj_name, edge[1]))
+        self.dirty = set()
+    
+    def linksTo(self, obj_name):
+        '''linksTo(obj_name): returns sorted list of (object name, property name) of link properties pointing to the object.'''
+        self.flush()
+        return sorted(self.edgesTo.get(obj_name, ()))
+
+_indexes = {} # document name -> LinkIndex
+
+def getIndex(doc):
+    '''getIndex(doc): returns LinkIndex of a document, making one if needed.'''
+    _assureObserver()
+    index = _indexes.get(doc.Name)
+    if index is None:
+        index = LinkIndex(doc)
+        _indexes[doc.Name] = index
+    return index
+
+def linksTo(doc_obj, exclude = []):
+    '''linksTo(doc_obj, exclude = []): returns list of tuples (dependent_object_name, property_name) 
+    of link properties (Link, LinkList, LinkSub, LinkSubList) pointing to doc_obj. Objects in 
+    exclude are skipped.'''
+    exclude_names = set(obj.Name for obj in exclude)
+    return [link for link in getIndex(doc_obj.Document).linksTo(doc_obj.Name) if link[0] not in exclude_names]
+
+def forget(doc = None):
+    '''forget(doc = None): drops index of a document, or all indexes.'''
+    if doc is None:
+        _indexes.clear()
+    else:
+        _indexes.pop(doc.Name, None)
+
+
+class _DocumentObserver(object):
+    def slotChangedObject(self, obj, prop):
+        index = _indexes.get(obj.Document.Name)
+        if index is not None and index.isLinkProperty(obj.Name, prop):
+            index.markDirty(obj.Name)
+
+    def slotCreatedObject(self, obj):
+        index = _indexes.get(obj.Document.Name)
+        if index is not None:
+            index.markDirty(obj.Name, types_changed= True)
+
+    def slotDeletedObject(self, obj):
+        index = _indexes.get(obj.Document.Name)
+        if index is not None:
+            index.markDirty(obj.Name, types_changed= True)
+
+    def slotAppendDynamicProperty(self, obj, prop):
+        index = _indexes.get(obj.Document.Name)
+        if index is not None:
+            index.markDirty(obj.Name, types_changed= True)
+
+    def slotRemoveDynamicProperty(self, obj, prop):
+        index = _indexes.get(obj.Document.Name)
+        if index is not None:
+            index.markDirty(obj.Name, types_changed= True)
+
+    def slotDeletedDocument(self, doc):
+        forget(doc)
+
+_observer = None
+
+def _assureObserver():
+    global _observer
+    if _observer is None:
+        _observer = _DocumentObserver()
+        App.addDocumentObserver(_observer)
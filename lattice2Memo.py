@@ -0,0 +1,99 @@
+#***************************************************************************
+#*                                                                         *
+#*   Copyright (c) 2026 - Victor Titov (DeepSOIC)                          *
+#*                                               <vv.titov@gmail.com>      *  
+#*                                                                         *
+#*   This program is free software; you can redistribute it and/or modify  *
+#*   it under the terms of the GNU Lesser General Public License (LGPL)    *
+#*   as published by the Free Software Foundation; either version 2 of     *
+#*   the License, or (at your option) any later version.                   *
+#*   for detail see the LICENCE text file.                                 *
+#*                                                                         *
+#*   This program is distributed in the hope that it will be useful,       *
+#*   but WITHOUT ANY WARRANTY; without even the implied warranty of        *
+#*   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the         *
+#*   GNU Library General Public License for more details.                  *
+#*                                                                         *
+#*   You should have received a copy of the GNU Library General Public     *
+#*   License along with this program; if not, write to the Free Software   *
+#*   Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  *
+#*   USA                                                                   *
+#*                                                                         *
+#***************************************************************************
+
+__title__="Memo module for Lattice2"
+__author__ = "DeepSOIC"
+__url__ = ""
+__doc__ = "Cache of things extracted from shapes of document objects (placements, leaves), reused until the shape changes"
+
+import FreeCAD as App
+
+# _cache: dict. Key is (document name, object name, kind); value is (shape, result). 
+# A record is valid as long as object's shape is the same (isSame) as the stored 
+# one. Records are also dropped when object's Shape changes, or when the object 
+# or its document is deleted, so that the cache doesn't hold dead shapes.
+_cache = {}
+_hits = 0
+_misses = 0
+
+def memoize(documentObject, kind, compute):
+    '''memoize(documentObject, kind, compute): returns compute() cached for object's current 
+    shape. kind is a string to tell apart different things cached for the same object. 
+    The returned value is shared; don't modify it.'''
+    global _hits, _misses
+    _assureObserver()
+    shape = documentObject.Shape
+    key = (documentObject.Document.Name, documentObject.Name, kind)
+    record = _cache.get(key)
+    if record is not None and record[0].isSame(shape):
+        _hits += 1
+        return record[1]
+    _misses += 1
+    result = compute()
+    _cache[key] = (shape, result)
+    return result
+
+def forget(documentObject = None, document = None):
+    '''forget(documentObject = None, document = None): drops cached records of an object, or 
+    of all objects of a document. If nothing is specified, clears the cache.'''
+    if documentObject is None and document is None:
+        _cache.clear()
+        return
+    if documentObject is not None:
+        match = lambda key: key[0] == documentObject.Document.Name and key[1] == documentObject.Name
+    else:
+        match = lambda key: key[0] == document.Name
+    for key in [key for key in _cache if match(key)]:
+        del _cache[key]
+
+def stats():
+    '''stats(): returns a dict with cache diagnostics: hits, misses, records.'''
+    return {'hits': _hits, 'misses': _misses, 'records': len(_cache)}
+
+def resetStats():
+    '''resetStats(): zeroes hit and miss counters.'''
+    global _hits, _misses
+    _hits = 0
+    _misses = 0
+
+
+class _DocumentObserver(object):
+    def slotChangedObject(self, obj, prop):
+        if prop == 'Shape' and _cache:
+            forget(documentObject= obj)
+
+    def slotDeletedObject(self, obj):
+        if _cache:
+            forget(documentObject= obj)
+
+    def slotDeletedDocument(self, doc):
+        if _cache:
+            forget(document= doc)
+
+_observer = None
+
+def _assureObserver():
+    global _observer
+    if _observer is None:
+        _observer = _DocumentObserver()
+        App.addDocumentObserver(_observer)
@@ -25,12 +25,15 @@ from lattice2Common import *
 import lattice2CompoundExplorer as LCE
 import lattice2ShapeCopy as ShapeCopy
 import lattice2BaseFeature as LBF
+import lattice2PlacementArray as PlacementArray
 from lattice2GeomUtils import makeOrientationFromLocalAxes
 from lattice2Utils import getSelectionAsListOfLinkSub
 import lattice2Executer
 
 import FreeCAD as App
 
+import numpy
+
 __title__="Lattice Mirror module for FreeCAD"
 __author__ = "DeepSOIC"
 
@@ -61,6 +64,22 @@ def mirrorPlacement(placement, pivotPlacement, flipX, flipY, flipZ):
     rot = makeOrientationFromLocalAxes(zdir, xdir)
     return App.Placement(base, rot)
 
+def mirrorPlacements(placements, pivotPlacements, flipX, flipY, flipZ):
+    """mirrorPlacements(placements, pivotPlacements, flipX, flipY, flipZ): batch version of mirrorPlacement. 
+    placements and pivotPlacements are placement arrays (see lattice2PlacementArray), that are broadcast 
+    against each other. Returns placement array."""
+    flip = numpy.array([-1.0 if flipX else 1.0, -1.0 if flipY else 1.0, -1.0 if flipZ else 1.0])
+    pivotInverse = PlacementArray.inverse(pivotPlacements)
+    
+    base = PlacementArray.transformPoints(pivotPlacements, PlacementArray.transformPoints(pivotInverse, placements[..., 0:3]) * flip)
+    def mirrorDir(dir):
+        dir = PlacementArray.rotateVectors(placements, numpy.array(dir))
+        return PlacementArray.rotateVectors(pivotPlacements, PlacementArray.rotateVectors(pivotInverse, dir) * flip)
+    xdir = mirrorDir([1.0, 0.0, 0.0])
+    zdir = mirrorDir([0.0, 0.0, 1.0])
+    rot = PlacementArray.rotationsFromAxes(zdir, xdir)
+    return PlacementArray.make(base, rot)
+
 def resolveSingleSublink(lnk):
     if lnk is None:
         raise ValueError("resolveSingleSublink: link is empty")
@@ -152,7 +171,7 @@ class LatticeMirror(LBF.LatticeFeature):
         whole = obj.ObjectTraversal == 'Use whole'
         children = []
         if base_is_lattice:
-            children = LBF.getPlacementsList(obj.Object)
+            children = LBF.getPlacementsArray(obj.Object)
         else:
             if obj.ObjectTraversal == 'Use whole':
                 children = [obj.Object.Shape]
@@ -160,7 +179,7 @@ class LatticeMirror(LBF.LatticeFeature):
             elif obj.ObjectTraversal == 'Direct children only':
                 children = obj.Object.Shape.childShapes()
             elif obj.ObjectTraversal == 'Use whole':
-                children = LCE.AllLeaves(obj.Object.Shape)
+                children = LBF.getLeaves(obj.Object)
             else:
                 raise ValueError("Traversal mode not implemented: {mode}".format(mode= obj.ObjectTraversal))
         
@@ -177,29 +196,28 @@ class LatticeMirror(LBF.LatticeFeature):
             n = len(pivots)
         
         # actual mirroring!
+        if base_is_lattice:
+            pivots = PlacementArray.fromPlacements(pivots[0:n])
+            if whole:
+                # every pivot mirrors all of the array
+                return mirrorPlacements(children[numpy.newaxis, :], pivots[:, numpy.newaxis], flipX, flipY, flipZ).reshape(-1, 7)
+            else:
+                ichildren = numpy.arange(n) % max(len(children), 1)
+                return mirrorPlacements(children[ichildren], pivots, flipX, flipY, flipZ)
+        
         result = []
         for i in range(n):
             piv = pivots[i]
             ichild = i % len(children)
-            if base_is_lattice:
-                if whole:
-                    for plm in children:
-                        result.append(mirrorPlacement(plm, piv, flipX, flipY, flipZ))
-                else:
-                    result.append(mirrorPlacement(children[ichild], piv, flipX, flipY, flipZ))
-            else:
-                result.append(mirrorShape(children[ichild], piv, flipX, flipY, flipZ))
+            result.append(mirrorShape(children[ichild], piv, flipX, flipY, flipZ))
         
         # write out the result
-        if base_is_lattice:
-            return result
+        if n == 1:
+            result = ShapeCopy.transformCopy(result[0])
         else:
-            if n == 1:
-                result = ShapeCopy.transformCopy(result[0])
-            else:
-                result = Part.Compound(result)
-            obj.Shape = result
-            return None
+            result = Part.Compound(result)
+        obj.Shape = result
+        return None
                 
 class ViewProviderLatticeMirror(LBF.ViewProviderLatticeFeature):
     "A View Provider for the LatticeMirror object"
@@ -40,7 +40,11 @@ only for those that are actually imprinted into the shape being cut.
 
 Only the top level compound is iterated over. \
 Nested compounds are assumed to have no intersections within. \
-If that is not the case, use 'Downgrade to Leaves' command do flatten the compound structure.\
+If that is not the case, use 'Downgrade to Leaves' command do flatten the compound structure.
+
+For thousands of tools, set Mode to 'Single pass' (one boolean with all tools) \
+or 'Batched' (tools are fused in groups of overlapping bounding boxes first). \
+'Sequential' mode tells which tool makes the boolean fail.\
 """
 
 def makeMultiCut(name):
@@ -51,6 +55,18 @@ def makeMultiCut(name):
         ViewProviderMultiCut(obj.ViewObject)
     return obj
 
+def fuseBatches(shapes, tolerance = 0.0):
+    '''fuseBatches(shapes, tolerance = 0.0): fuses shapes in groups of overlapping bounding 
+    boxes. Returns list of fused groups, which don't intersect each other.'''
+    from lattice2ShapeIndex import clusterBoxes
+    result = []
+    for cluster in clusterBoxes([sh.BoundBox for sh in shapes], tolerance + DistConfusion):
+        if len(cluster) == 1:
+            result.append(shapes[cluster[0]])
+        else:
+            result.append(shapes[cluster[0]].fuse([shapes[i] for i in cluster[1:]], tolerance))
+    return result
+
 class MultiCut:
     "The MultiCut object"
     def __init__(self,host):
@@ -58,11 +74,20 @@ class MultiCut:
         host.addProperty('App::PropertyLink','Base',"MultiCut","Base solid to remove material from")
         host.addProperty('App::PropertyLink','Tool',"MultiCut","Compound of solids to subtract from Base, may intersect each other")
         host.addProperty('App::PropertyLength','Tolerance',"MultiCut","Textra tolerance to use when searching for intersections, in addition to shape tolerance")
+        self.assureProperties(host)
         
         host.Proxy = self
 
+    def assureProperties(self, host):
+        import lattice2BaseFeature
+        lattice2BaseFeature.assureProperty(host, 'App::PropertyEnumeration', 'Mode', ['Sequential', 'Single pass', 'Batched'], "MultiCut", 
+            "Sequential: cut tools one by one (slow for many tools, but reports which tool fails). "
+            "Single pass: cut with all tools in one boolean. "
+            "Batched: fuse tools in groups of overlapping bounding boxes, then cut with all groups in one boolean.")
+
     def execute(self,host):
         import Part
+        self.assureProperties(host)
         baseshape = host.Base.Shape
         toolshape = host.Tool.Shape
         if toolshape.ShapeType == 'Compound':
@@ -70,12 +95,22 @@ class MultiCut:
         else:
             toolshapes = [toolshape]
 
-        for i in range(len(toolshapes)):
-            try:
-                baseshape = baseshape.cut(toolshapes[i], host.Tolerance.Value)
-            except Exception as err:
-                App.Console.PrintError(f"{host.Label}: cut failed on toolshape[{i}]\n")
-                raise
+        if host.Mode == 'Sequential':
+            for i in range(len(toolshapes)):
+                try:
+                    baseshape = baseshape.cut(toolshapes[i], host.Tolerance.Value)
+                except Exception as err:
+                    App.Console.PrintError(f"{host.Label}: cut failed on toolshape[{i}]\n")
+                    raise
+        else:
+            # tools that miss the base can't remove anything
+            bb = App.BoundBox(baseshape.BoundBox)
+            bb.enlarge(host.Tolerance.Value + DistConfusion)
+            toolshapes = [sh for sh in toolshapes if bb.intersect(sh.BoundBox)]
+            if host.Mode == 'Batched':
+                toolshapes = fuseBatches(toolshapes, host.Tolerance.Value)
+            if len(toolshapes) > 0:
+                baseshape = baseshape.cut(toolshapes, host.Tolerance.Value)
         
         host.Shape = baseshape
         
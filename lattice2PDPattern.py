@@ -31,6 +31,8 @@ import Part
 from lattice2Common import *
 import lattice2BaseFeature
 import lattice2Executer
+import lattice2Parallel
+from lattice2ShapeIndex import clusterBoxes
 from lattice2ShapeCopy import shallowCopy, transformCopy_Smart
 
 from lattice2PopulateCopies import DereferenceArray
@@ -51,6 +53,9 @@ class MultiTransformSettings(object):
     sign_override = +1 #+1 for keep sign, -1 for invert, +2 for force positive, -2 for force negative
     use_basefeature = False # take basefeature of a body as an additive operation
     debug = False # output compound instead of boolean result
+    boolean_strategy = 'Auto' # 'Auto' (by selfintersections), 'Compound', 'Sequential' or 'Clustered'
+    parallel = False # for 'Clustered' strategy: fuse the clusters in worker processes
+    skipped = 0 # output: number of subtractive occurrences dropped because they miss the base
 
 
 def makeFeature():
@@ -163,25 +168,43 @@ def is_supported(feature):
     except (FeatureUnsupportedError, NotPartDesignFeatureError):
         return False
 
+def booleanStrategy(mts):
+    '''booleanStrategy(mts): resolves 'Auto' strategy of MultiTransformSettings into 'Compound' or 'Sequential'.'''
+    if mts.boolean_strategy == 'Auto':
+        return 'Sequential' if mts.selfintersections else 'Compound'
+    return mts.boolean_strategy
+
 def applyFeature(baseshape, feature, transforms, mts):
     if hasattr(feature, 'Proxy') and hasattr(feature.Proxy, 'applyTransformed'):
         return feature.Proxy.applyTransformed(feature, baseshape, transforms, mts)
     task = getFeatureShapes(feature)
+    strategy = booleanStrategy(mts)
     for sign,featureshape in task:
-        actionshapes = []
-        for transform in transforms:
-            actionshapes.append(shallowCopy(featureshape, transform))
+        assert(sign != 0)
+        realsign = sign * mts.sign_override
+        if abs(mts.sign_override) == +2:
+            realsign = int(mts.sign_override / 2)
+        
+        occurrences = transforms
+        if realsign < 0 and not mts.debug:
+            occurrences = filterByBox(featureshape, transforms, baseshape.BoundBox)
+            mts.skipped += len(transforms) - len(occurrences)
+            if len(occurrences) == 0:
+                continue
+        
+        if strategy == 'Clustered':
+            actionshapes = [Part.Compound(fuseClusters(featureshape, occurrences, mts.parallel))]
+        else:
+            actionshapes = []
+            for transform in occurrences:
+                actionshapes.append(shallowCopy(featureshape, transform))
             
-        if mts.selfintersections:
+        if strategy == 'Sequential':
             pass #to fuse the shapes to baseshape one by one
-        else:
+        elif strategy == 'Compound':
             actionshapes = [Part.Compound(actionshapes)] #to fuse all at once, saving for computing intersections between the occurrences of the feature
             
         for actionshape in actionshapes:
-            assert(sign != 0)
-            realsign = sign * mts.sign_override
-            if abs(mts.sign_override) == +2:
-                realsign = int(mts.sign_override / 2)
             if realsign > 0:
                 if not mts.debug:
                     baseshape = baseshape.fuse(actionshape)
@@ -196,6 +219,70 @@ def applyFeature(baseshape, feature, transforms, mts):
         raise FeatureFailure('applying {name} failed - returned shape is null'.format(name= feature.Name))
     return baseshape
 
+def occurrenceBoxes(featureshape, transforms):
+    '''occurrenceBoxes(featureshape, transforms): returns bounding boxes of featureshape moved by 
+    each of transforms. The boxes are computed by transforming the box of featureshape, so they 
+    may be somewhat bigger than true boxes of the occurrences.'''
+    bb = featureshape.BoundBox
+    return [bb.transformed(transform.toMatrix()) for transform in transforms]
+
+def filterByBox(featureshape, transforms, box):
+    '''filterByBox(featureshape, transforms, box): returns those of transforms that place 
+    featureshape so that its bounding box intersects box. If box is invalid (e.g. of an empty 
+    shape), returns all transforms.'''
+    if not box.isValid():
+        return transforms
+    box = App.BoundBox(box)
+    box.enlarge(DistConfusion)
+    return [transform for transform, bb in zip(transforms, occurrenceBoxes(featureshape, transforms)) if box.intersect(bb)]
+
+def fuseOccurrences(featureshape, transforms):
+    '''fuseOccurrences(featureshape, transforms): fuses copies of featureshape moved by transforms into one shape.'''
+    copies = [shallowCopy(featureshape, transform) for transform in transforms]
+    if len(copies) == 1:
+        return copies[0]
+    return copies[0].fuse(copies[1:])
+
+def _fuseClustersJob(clusters, brep):
+    # lattice2Parallel job for fuseClusters. Placements travel as (base, rotation) tuples.
+    featureshape = lattice2Parallel.sharedShape(brep)
+    return [
+        lattice2Parallel.shapeToBrep(fuseOccurrences(featureshape, [App.Placement(App.Vector(*b), App.Rotation(*q)) for b,q in cluster]))
+        for cluster in clusters
+    ]
+
+def fuseClusters(featureshape, transforms, parallel = False):
+    '''fuseClusters(featureshape, transforms, parallel = False): groups occurrences of featureshape 
+    into clusters of overlapping bounding boxes, and fuses each cluster. Returns list of shapes, one 
+    per cluster; they don't intersect each other, so they can be booleaned with the base all at once.
+    
+    If parallel, clusters with more than one occurrence are fused by worker processes. The boolean 
+    with the base is left to the caller, as one operation with a compound of the clusters.'''
+    clusters = clusterBoxes(occurrenceBoxes(featureshape, transforms))
+    result = [None]*len(clusters)
+    heavy = []
+    for ic, cluster in enumerate(clusters):
+        if len(cluster) == 1:
+            result[ic] = shallowCopy(featureshape, transforms[cluster[0]])
+        else:
+            heavy.append(ic)
+    if parallel and len(heavy) > 1:
+        # largest clusters go first, so that one of them is not left for the end
+        heavy.sort(key= lambda ic: -len(clusters[ic]))
+        jobs = [[(tuple(transforms[i].Base), tuple(transforms[i].Rotation.Q)) for i in clusters[ic]] for ic in heavy]
+        breps = lattice2Parallel.mapChunks(_fuseClustersJob, jobs, 
+            shared= (lattice2Parallel.shapeToBrep(featureshape),), min_chunk= 1)
+        for ic, brep in zip(heavy, breps):
+            result[ic] = lattice2Parallel.shapeFromBrep(brep)
+    else:
+        for ic in heavy:
+            result[ic] = fuseOccurrences(featureshape, [transforms[i] for i in clusters[ic]])
+    return result
+
+def placementKey(placement):
+    '''placementKey(placement): returns a hashable key of a placement, for matching equal placements.'''
+    return tuple(round(v, 9) for v in tuple(placement.Base) + tuple(placement.Rotation.Q))
+
 def append_to_compound(cmp, sh):
     """append_to_compound(cmp, sh): appends a shape to a compound. cmp can be not a compound, too (any shape type, or None). returns result
     """
@@ -229,12 +316,18 @@ class LatticePDPattern(object):
 
         self.assureProperties(obj)
         obj.AllowBaseFeature = True
+        obj.Incremental = True # patterns restored from older projects get False, to keep recomputing as before
 
         obj.Proxy = self
 
     def assureProperties(self, obj):
         lattice2BaseFeature.assureProperty(obj,'App::PropertyBool', 'AllowBaseFeature', False, "Lattice Pattern", "Allow using BaseFeature (this property is here mostly for backwards compatibility).") 
         lattice2BaseFeature.assureProperty(obj,'App::PropertyBool', 'Debug', False, "LatticePattern", "Output a compound instead of boolean result, to analyze boolean failures.") 
+        lattice2BaseFeature.assureProperty(obj,'App::PropertyEnumeration', 'BooleanStrategy', ['Auto', 'Compound', 'Sequential', 'Clustered'], "Lattice Pattern", "How to boolean occurrences with base. Auto: Sequential if Selfintersections is true, Compound otherwise. Compound: all occurrences at once. Sequential: one by one. Clustered: fuse groups of occurrences with overlapping bounding boxes, then boolean all groups with the base at once, in one operation (only the fusing of groups can go parallel).") 
+        lattice2BaseFeature.assureProperty(obj,'App::PropertyBool', 'Parallel', False, "Lattice Pattern", "Fuse clusters of occurrences in worker processes (for Clustered strategy). The boolean with the base is still one operation in this process.") 
+        lattice2BaseFeature.assureProperty(obj,'App::PropertyBool', 'Incremental', False, "Lattice Pattern", "If only placements were added since last recompute, apply the features just at the new ones, on top of the previous result.") 
+        if lattice2BaseFeature.assureProperty(obj,'App::PropertyInteger', 'SkippedOccurrences', 0, "Lattice Pattern", "Info: number of subtractive occurrences that were dropped because they miss the base."):
+            obj.setEditorMode('SkippedOccurrences', 1) # set read-only
     
     def execute(self, selfobj):
         self.assureProperties(selfobj)
@@ -249,8 +342,28 @@ class LatticePDPattern(object):
         mts.selfintersections = selfobj.Selfintersections
         mts.use_basefeature = selfobj.AllowBaseFeature
         mts.debug = selfobj.Debug
+        mts.boolean_strategy = selfobj.BooleanStrategy
+        mts.parallel = selfobj.Parallel
         
-        result = self.applyTransformed(selfobj, baseshape, None, mts)
+        featurelist = self.getFeatureList(selfobj, mts)
+        placements = self.getTargetPlacements(selfobj, None)
+        signature = self.inputSignature(selfobj, featurelist, mts) if selfobj.Incremental else None
+        added = self.incrementalPlacements(signature, placements)
+        last_result = self._lastRun[2] if added is not None else None
+        self._lastRun = None # in case of failure, don't reuse anything
+        if added is not None and len(added) == 0:
+            result = last_result
+        elif added is not None:
+            App.Console.PrintLog('{name}: applying {n} new occurrences to the previous result.\n'.format(name= selfobj.Name, n= len(added)))
+            result = self.applyFeatures(selfobj, last_result, featurelist, added, mts)
+        else:
+            result = self.applyFeatures(selfobj, baseshape, featurelist, placements, mts)
+        if signature is not None:
+            self._lastRun = (signature, placements, result)
+        # with incremental recompute, occurrences skipped in the previous run are still skipped
+        selfobj.SkippedOccurrences = mts.skipped + (selfobj.SkippedOccurrences if added is not None else 0)
+        if mts.skipped > 0:
+            App.Console.PrintMessage('{name}: {n} subtractive occurrences miss the base, skipped.\n'.format(name= selfobj.Label, n= mts.skipped))
         if selfobj.SingleSolid:
             # not proper implementation, but should do for majority of cases: pick the largest solid.
             vmax = 0
@@ -270,6 +383,11 @@ class LatticePDPattern(object):
         selfobj.Shape = result
     
     def applyTransformed(self, selfobj, baseshape, transforms, mts):
+        featurelist = self.getFeatureList(selfobj, mts)
+        placements = self.getTargetPlacements(selfobj, transforms)
+        return self.applyFeatures(selfobj, baseshape, featurelist, placements, mts)
+    
+    def getFeatureList(self, selfobj, mts):
         featurelist = []
         has_bodies = False
         has_features = False
@@ -289,8 +407,9 @@ class LatticePDPattern(object):
             for feature in featurelist:
                 if bodyOf(feature) is not body_ref:
                     raise ScopeError('Reference placement and the feature are not in the same body (use Shapebinder or Ghost to bring the placement in).')
-        
-        
+        return featurelist
+    
+    def getTargetPlacements(self, selfobj, transforms):
         placements = lattice2BaseFeature.getPlacementsList(selfobj.PlacementsTo, selfobj)
         placements = DereferenceArray(selfobj, placements, selfobj.PlacementsFrom, selfobj.Referencing)
         if selfobj.Referencing == 'First item' and transforms is None:
@@ -302,6 +421,9 @@ class LatticePDPattern(object):
             for transform in transforms:
                 newplacements += [transform.multiply(plm) for plm in placements]
             placements = newplacements
+        return placements
+    
+    def applyFeatures(self, selfobj, baseshape, featurelist, placements, mts):
         for feature in featurelist:
             try:
                 baseshape = applyFeature(baseshape, feature, placements, mts)
@@ -312,6 +434,63 @@ class LatticePDPattern(object):
                     App.Console.PrintLog('{name} is unsupported, skipped.\n'.format(name= feature.Name))
         return baseshape
 
+    def inputSignature(self, selfobj, featurelist, mts):
+        '''inputSignature(selfobj, featurelist, mts): returns (settings, shapes) describing everything 
+        but PlacementsTo that the result depends on, for incremental recompute; or None if the 
+        features can't be applied incrementally (nested patterns, or a mix of additive and 
+        subtractive features, where order of application matters).'''
+        settings = [mts.sign_override, booleanStrategy(mts), mts.use_basefeature, mts.debug, 
+                    selfobj.IgnoreUnsupported, selfobj.SkipFirstInBody, selfobj.Referencing]
+        shapes = [None if selfobj.BaseFeature is None else selfobj.BaseFeature.Shape]
+        signs = set()
+        for feature in featurelist:
+            if hasattr(feature, 'Proxy') and hasattr(feature.Proxy, 'applyTransformed'):
+                return None
+            try:
+                task = getFeatureShapes(feature)
+            except FeatureUnsupportedError:
+                settings.append((feature.Name, None))
+                continue
+            for sign, sh in task:
+                signs.add(sign)
+                settings.append((feature.Name, sign))
+                shapes.append(sh)
+        if len(signs) > 1 and abs(mts.sign_override) != 2:
+            return None
+        return (settings, shapes)
+    
+    def incrementalPlacements(self, signature, placements):
+        '''incrementalPlacements(signature, placements): if the result of previous recompute can be 
+        reused, returns placements that are new since then (list, possibly empty); otherwise, None.'''
+        last = getattr(self, '_lastRun', None)
+        if last is None or signature is None:
+            return None
+        last_signature, last_placements, last_result = last
+        if last_signature[0] != signature[0]:
+            return None
+        for sh1, sh2 in zip(last_signature[1], signature[1]):
+            if (sh1 is None) != (sh2 is None):
+                return None
+            if sh1 is not None and not sh1.isSame(sh2):
+                return None
+        if len(last_signature[1]) != len(signature[1]):
+            return None
+        
+        pool = {}
+        for plm in last_placements:
+            k = placementKey(plm)
+            pool[k] = pool.get(k, 0) + 1
+        added = []
+        for plm in placements:
+            k = placementKey(plm)
+            if pool.get(k, 0) > 0:
+                pool[k] -= 1
+            else:
+                added.append(plm)
+        if any(pool.values()):
+            return None # some placements are gone
+        return added
+
     def __getstate__(self):
         return None
 
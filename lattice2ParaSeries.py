@@ -27,6 +27,7 @@ __url__ = ""
 __doc__ = "Lattice ParaSeries feature: generates series of shapes by modifying a parameter"
 
 import math
+import os
 
 import FreeCAD as App
 import Part
@@ -35,6 +36,10 @@ from lattice2Common import *
 import lattice2BaseFeature
 import lattice2Executer
 import lattice2Markers as markers
+import lattice2Parallel
+import lattice2ResultCache as ResultCache
+import lattice2ShadowDocument as ShadowDocument
+import lattice2ShapeStore as ShapeStore
 from lattice2ValueSeriesGenerator import ValueSeriesGenerator
 
 # --------------------------- general routines ------------------------------------------------
@@ -90,6 +95,31 @@ def setParameter(doc, strParameter, value, get_not_set = False):
                 compval = stack.pop()
                 setattr(stack[-1], piece, compval)
 
+def parameterHolders(refstrs):
+    '''parameterHolders(refstrs): returns names of objects the parameter references refer to.'''
+    return [refstr.strip().split(".")[0] for refstr in refstrs]
+
+def computeRow(doc, refstrs, row, object, closure):
+    '''computeRow(doc, refstrs, row, object, closure): sets parameters to values of the row, recomputes 
+    objects affected by the parameters (closure, see lattice2ShadowDocument.dependentClosure), and 
+    returns a copy of shape of the object. Returns None if recompute failed.'''
+    for icol in range(len(row)):
+        setParameter(doc, refstrs[icol].strip(), row[icol])
+    if not ShadowDocument.recomputeClosure(doc, closure):
+        return None
+    return object.Shape.copy()
+
+def _computeRowsJob(rows, filename, refstrs, object_name):
+    # lattice2Parallel job: computeRow for a chunk of rows. Returns BREP strings (or None for failures).
+    doc = lattice2Parallel.sharedDocument(filename)
+    obj = doc.getObject(object_name)
+    closure = ShadowDocument.dependentClosure(doc, parameterHolders(refstrs), obj)
+    result = []
+    for row in rows:
+        shape = computeRow(doc, refstrs, row, obj, closure)
+        result.append(None if shape is None else lattice2Parallel.shapeToBrep(shape))
+    return result
+
 # -------------------------- document object --------------------------------------------------
 
 def makeLatticeParaSeries(name):
@@ -114,6 +144,21 @@ class LatticeParaSeries(lattice2BaseFeature.LatticeFeature):
         obj.Recomputing = "Disabled" # recomputing ParaSeries can be very long, so disable it by default
         
         self.assureGenerator(obj)
+        self.assureProperties(obj)
+        
+    def assureProperties(self, obj):
+        '''Adds properties that can be missing on objects made with earlier version of Lattice2.'''
+        self.assureProperty(obj, "App::PropertyBool", "Parallel", False, "Lattice ParaSeries", 
+            "Compute rows in worker processes (number of workers is set in preferences). The temporary document is saved to a file for them; xlinks with relative paths may break.")
+        self.assureProperty(obj, "App::PropertyBool", "CacheResults", False, "Lattice ParaSeries", 
+            "Keep computed shapes in a disk cache, and reuse them for rows whose values, and the objects they are computed from, haven't changed.")
+        self.assureProperty(obj, "App::PropertyEnumeration", "OutputMode", ["Shapes", "Streamed", "Bounding boxes"], "Lattice ParaSeries", 
+            "Shapes: children are collected in memory. Streamed: children are written to disk as they are computed, and the compound "
+            "is assembled from there; this saves memory during the recompute only, as the result holds all children just the same. "
+            "Bounding boxes: same, but the shape gets boxes in place of children, so the children stay out of memory; use this to save memory. "
+            "Other features see the boxes, not the "
+            "children; the children can only be read back by macros, with lattice2ShapeStore.getChild. The stored children are deleted when the "
+            "feature is deleted or recomputed in 'Shapes' mode.")
         
     def assureGenerator(self, obj):
         '''Adds an instance of value series generator, if one doesn't exist yet.'''
@@ -130,6 +175,7 @@ class LatticeParaSeries(lattice2BaseFeature.LatticeFeature):
         self.assureGenerator(selfobj)
         self.generator.updateReadonlyness()
         self.generator.execute()
+        self.assureProperties(selfobj)
         
         if selfobj.Recomputing == "Disabled":
             raise ValueError(selfobj.Name+": recomputing of this object is currently disabled. Modify 'Recomputing' property to enable it.")
@@ -200,75 +246,71 @@ class LatticeParaSeries(lattice2BaseFeature.LatticeFeature):
                 progress.setModal(True)
                 progress.show()
             
-            doc1 = selfobj.Document
-            doc2 = App.newDocument() #create temporary doc to do the computations
+            store = None
+            if selfobj.OutputMode != 'Shapes':
+                # children go to disk as they are computed, not to accumulate in memory
+                store = ShapeStore.forFeature(selfobj)
+                store.clear()
+            else:
+                ShapeStore.forFeature(selfobj).remove()
             
-            # assign doc's filename before copying objects, otherwise we get errors with xlinks
-            try:
-                doc2.FileName = doc1.FileName
-            except Exception as err:
-                pass #in old FreeCADs, FileName property is read-only, we can safely ignore that
+            results = [None] * len(values) # shape for each row, or True if it is in store. None if not computed (yet).
+            def accept(i, shape):
+                # shape is a Part.Shape or a BREP string
+                if store is not None:
+                    store.put(i, shape)
+                    results[i] = True
+                else:
+                    results[i] = lattice2Parallel.shapeFromBrep(shape) if isinstance(shape, str) else shape
+            
+            # reuse results cached by earlier recomputes
+            keys = None
+            if selfobj.CacheResults:
+                graph_hash = ResultCache.graphHash([screen(selfobj.Object)] + screen(selfobj.Object).OutListRecursive)
+                keys = [ResultCache.makeKey(graph_hash, refstrs, row) for row in values]
+                for i in range(len(values)):
+                    shape = ResultCache.get(keys[i])
+                    if shape is not None:
+                        accept(i, shape)
+            todo = [i for i in range(len(values)) if results[i] is None]
             
-            object_in_doc2 = None # define the variable, to prevent del() in finally block from raising another error
             try:
-                doc2.copyObject(screen(selfobj.Object), True)
-                
-                #if there are nested paraseries in the dependencies, make sure to enable them
-                for objd2 in doc2.Objects:
-                    if hasattr(objd2,"Recomputing"):
-                        try:
-                            objd2.Recomputing = "Enabled"
-                            objd2.purgeTouched()
-                        except exception:
-                            lattice2Executer.warning(selfobj,"Failed to enable recomputing of "+objd2.Name)
-                
-                object_in_doc2 = doc2.getObject(screen(selfobj.Object).Name)
-                if bGui:
-                    progress.setValue(1)
-                output_shapes = []
-                for row in values:
-                    for icol in range(len(row)):
-                        setParameter(doc2, refstrs[icol].strip(), row[icol])
-                    
-                    #recompute
-                    doc2.recompute()
-                    
-                    #get shape
-                    shape = None
-                    for obj in doc2.Objects:
-                        if 'Invalid' in obj.State:
-                            lattice2Executer.error(obj,"Recomputing shape for parameter value of "+repr(row)+" failed.")
-                            
-                            scale = 1.0
-                            try:
-                                if not screen(selfobj.Object).Shape.isNull():
-                                    scale = screen(selfobj.Object).Shape.BoundBox.DiagonalLength/math.sqrt(3)
-                            except Exception:
-                                pass
-                            if scale < DistConfusion * 100:
-                                scale = 1.0
-                            shape = markers.getNullShapeShape(scale)
-                    if shape is None:
-                        shape = object_in_doc2.Shape.copy()
-                    output_shapes.append(shape)
-                    
-                    #update progress
-                    if bGui:
-                        progress.setValue(progress.value()+1)
-                        if progress.wasCanceled():
-                            raise lattice2Executer.CancelError()
-                    
+                if len(todo) > 0:
+                    def sink(k, shape):
+                        if shape is None:
+                            return
+                        if keys is not None:
+                            ResultCache.put(keys[todo[k]], shape)
+                        accept(todo[k], shape)
+                    self.computeRows(selfobj, [values[i] for i in todo], refstrs, progress if bGui else None, sink)
+                    if keys is not None:
+                        ResultCache.trim()
             finally:
-                #delete all references, before destroying the document. Probably not required, but to be sure...
-                del(object_in_doc2)
-                doc2_name = doc2.Name
-                del(doc2)
-                App.closeDocument(doc2_name)
                 if bGui:
                     progress.setValue(len(values)+1)
-
-                
-            selfobj.Shape = Part.makeCompound(output_shapes)
+            
+            for i, row in enumerate(values):
+                if results[i] is None:
+                    lattice2Executer.error(selfobj,"Recomputing shape for parameter value of "+repr(row)+" failed.")
+                    
+                    scale = 1.0
+                    try:
+                        if not screen(selfobj.Object).Shape.isNull():
+                            scale = screen(selfobj.Object).Shape.BoundBox.DiagonalLength/math.sqrt(3)
+                    except Exception:
+                        pass
+                    if scale < DistConfusion * 100:
+                        scale = 1.0
+                    accept(i, markers.getNullShapeShape(scale))
+            
+            if store is None:
+                selfobj.Shape = Part.makeCompound(results)
+            elif selfobj.OutputMode == 'Bounding boxes':
+                selfobj.Shape = store.makeBoundBoxes(len(values))
+            else:
+                selfobj.Shape = store.makeCompound(len(values))
+            if store is not None:
+                ShapeStore.trim(keep= store.path)
 
             output_is_lattice = lattice2BaseFeature.isObjectLattice(screen(selfobj.Object))
             if 'Auto' in selfobj.isLattice:
@@ -280,6 +322,63 @@ class LatticeParaSeries(lattice2BaseFeature.LatticeFeature):
                 selfobj.Recomputing = "Disabled"
         return "suppress" # "suppress" disables most convenience code of lattice2BaseFeature. We do it because we build a nested array, which are not yet supported by lattice WB.
 
+    def computeRows(self, selfobj, rows, refstrs, progress, sink):
+        '''computeRows(selfobj, rows, refstrs, progress, sink): computes a copy of the object with its 
+        dependencies (see lattice2ShadowDocument) for every row of parameter values. Results are 
+        passed to sink(index_of_row, shape) as soon as they are made; shape is a Part.Shape, or a 
+        BREP string, or None if the row failed.'''
+        # temporary doc to do the computations, with a copy of the object and its dependencies. It is kept for next recompute.
+        doc2 = ShadowDocument.acquire(selfobj, screen(selfobj.Object))
+        
+        try:
+            #if there are nested paraseries in the dependencies, make sure to enable them
+            for objd2 in doc2.Objects:
+                if hasattr(objd2,"Recomputing"):
+                    try:
+                        objd2.Recomputing = "Enabled"
+                        objd2.purgeTouched()
+                    except exception:
+                        lattice2Executer.warning(selfobj,"Failed to enable recomputing of "+objd2.Name)
+            
+            object_in_doc2 = doc2.getObject(screen(selfobj.Object).Name)
+            if progress is not None:
+                progress.setValue(1)
+                def reportProgress(done, total):
+                    progress.setValue(done + 1)
+                    if progress.wasCanceled():
+                        raise lattice2Executer.CancelError()
+            else:
+                reportProgress = None
+            
+            # go parallel only if the work is really going to workers; otherwise, the temporary copy would be opened in this session
+            bParallel = (selfobj.Parallel and lattice2Parallel.chunkCount(len(rows), True, min_chunk= 1) > 1 
+                         and lattice2Parallel.getPool() is not None)
+            if bParallel:
+                # each worker opens its own copy of doc2, and computes a share of the rows
+                tmpfile = lattice2Parallel.saveTempDocument(doc2)
+                try:
+                    k = 0
+                    for breps in lattice2Parallel.imapChunks(_computeRowsJob, rows, 
+                            shared= (tmpfile, refstrs, object_in_doc2.Name),
+                            progress= reportProgress, min_chunk= 1):
+                        for brep in breps:
+                            sink(k, brep)
+                            k += 1
+                finally:
+                    lattice2Parallel.closeSharedDocument() # in case the job ran in this process after all
+                    os.remove(tmpfile)
+            else:
+                # only what depends on the parameters needs recomputing
+                closure = ShadowDocument.dependentClosure(doc2, parameterHolders(refstrs), object_in_doc2)
+                for k, row in enumerate(rows):
+                    sink(k, computeRow(doc2, refstrs, row, object_in_doc2, closure))
+                    if reportProgress:
+                        reportProgress(k + 1, len(rows))
+        finally:
+            #parameters were modified in doc2; have them restored on next use
+            ShadowDocument.release(selfobj, parameterHolders(refstrs))
+
+
 class ViewProviderLatticeParaSeries(lattice2BaseFeature.ViewProviderLatticeFeature):
 
     def getIcon(self):
@@ -0,0 +1,294 @@
+#***************************************************************************
+#*                                                                         *
+#*   Copyright (c) 2026 - Victor Titov (DeepSOIC)                          *
+#*                                               <vv.titov@gmail.com>      *  
+#*                                                                         *
+#*   This program is free software; you can redistribute it and/or modify  *
+#*   it under the terms of the GNU Lesser General Public License (LGPL)    *
+#*   as published by the Free Software Foundation; either version 2 of     *
+#*   the License, or (at your option) any later version.                   *
+#*   for detail see the LICENCE text file.                                 *
+#*                                                                         *
+#*   This program is distributed in the hope that it will be useful,       *
+#*   but WITHOUT ANY WARRANTY; without even the implied warranty of        *
+#*   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the         *
+#*   GNU Library General Public License for more details.                  *
+#*                                                                         *
+#*   You should have received a copy of the GNU Library General Public     *
+#*   License along with this program; if not, write to the Free Software   *
+#*   Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  *
+#*   USA                                                                   *
+#*                                                                         *
+#***************************************************************************
+
+__title__="Parallel execution module for Lattice2"
+__author__ = "DeepSOIC"
+__url__ = ""
+__doc__ = "Process pool for running independent chunks of work in headless FreeCAD worker processes"
+
+# Workers are python processes that import FreeCAD as a module. Jobs are top-level 
+# functions (so that they can be pickled by reference), called as func(chunk, *shared). 
+# Shapes can't be pickled; pass them as BREP strings (shapeToBrep), and restore them 
+# in the worker with sharedShape, which parses each distinct BREP only once per worker.
+# Shared arguments are written to a temporary file once per job, and every worker reads 
+# them from there once, so big BREPs don't travel along with every chunk.
+# For the common case of many independent queries against one shape, use mapShapeQuery,
+# which does the BREP round trip for you, and only if the work actually goes to workers.
+
+import os
+import pickle
+import sys
+
+import FreeCAD as App
+
+from lattice2Executer import CancelError
+
+_paramPath = "User parameter:BaseApp/Preferences/Mod/Lattice2/Parallel"
+
+def workerCount():
+    '''workerCount(): number of worker processes to use, from preferences. Zero in preferences means one less than the number of CPUs.'''
+    n = App.ParamGet(_paramPath).GetInt("Workers", 0)
+    if n <= 0:
+        n = (os.cpu_count() or 1) - 1
+    return max(n, 1)
+
+def minChunkSize():
+    '''minChunkSize(): minimum number of items per chunk, from preferences. Prevents farming out jobs too small to pay off.'''
+    return max(App.ParamGet(_paramPath).GetInt("MinChunkSize", 100), 1)
+
+def shapeToBrep(shape):
+    '''shapeToBrep(shape): serializes a shape for sending to workers.'''
+    return shape.exportBrepToString()
+
+def shapeFromBrep(brep):
+    '''shapeFromBrep(brep): reverse of shapeToBrep.'''
+    import Part
+    sh = Part.Shape()
+    sh.importBrepFromString(brep)
+    return sh
+
+_shapeCache = {}
+
+def sharedShape(brep):
+    '''sharedShape(brep): shapeFromBrep, cached. For use in worker functions, where the same 
+    shape comes along with every chunk.'''
+    key = hash(brep)
+    rec = _shapeCache.get(key)
+    if rec is None or rec[0] != brep:
+        if len(_shapeCache) > 8:
+            _shapeCache.clear()
+        rec = (brep, shapeFromBrep(brep))
+        _shapeCache[key] = rec
+    return rec[1]
+
+def saveTempDocument(doc):
+    '''saveTempDocument(doc): saves a copy of document into a temporary file, for workers to 
+    open with sharedDocument. Returns the file path; delete the file when done.'''
+    import tempfile
+    fd, path = tempfile.mkstemp(suffix= '.FCStd', prefix= 'lattice2-')
+    os.close(fd)
+    doc.saveCopy(path)
+    return path
+
+_document = None # (path, modification time, document)
+
+def sharedDocument(path):
+    '''sharedDocument(path): opens document from file, for use in worker functions. The document 
+    stays open for subsequent chunks of the same job, and is closed when another file is requested.'''
+    global _document
+    stamp = os.path.getmtime(path)
+    if _document is not None and _document[0:2] == (path, stamp):
+        return _document[2]
+    if _document is not None:
+        try:
+            App.closeDocument(_document[2].Name)
+        except Exception:
+            pass
+        _document = None
+    doc = App.openDocument(path)
+    _document = (path, stamp, doc)
+    return doc
+
+def closeSharedDocument():
+    '''closeSharedDocument(): closes the document opened by sharedDocument, if any.'''
+    global _document
+    if _document is None:
+        return
+    try:
+        App.closeDocument(_document[2].Name)
+    except Exception:
+        pass
+    _document = None
+
+def _saveShared(shared):
+    '''_saveShared(shared): pickles shared arguments of a job into a temporary file, for 
+    workers to read with _loadShared. Returns the file path; delete the file when done.'''
+    import tempfile
+    fd, path = tempfile.mkstemp(suffix= '.pickle', prefix= 'lattice2-')
+    with os.fdopen(fd, 'wb') as f:
+        pickle.dump(tuple(shared), f, protocol= pickle.HIGHEST_PROTOCOL)
+    return path
+
+_shared = None # (path, modification time, shared arguments)
+
+def _loadShared(path):
+    '''_loadShared(path): reads shared arguments saved by _saveShared, once per worker and job.'''
+    global _shared
+    stamp = os.path.getmtime(path)
+    if _shared is None or _shared[0:2] != (path, stamp):
+        _shared = None
+        with open(path, 'rb') as f:
+            _shared = (path, stamp, pickle.load(f))
+    return _shared[2]
+
+def splitChunks(items, n_chunks):
+    '''splitChunks(items, n_chunks): splits a sequence into n_chunks contiguous slices of nearly equal length (fewer if there are fewer items).'''
+    n = len(items)
+    n_chunks = max(min(n_chunks, n), 1)
+    bounds = [n * i // n_chunks for i in range(n_chunks + 1)]
+    return [items[bounds[i]:bounds[i+1]] for i in range(n_chunks)]
+
+def _pythonExecutable():
+    '''returns path to a python interpreter that FreeCAD runs with, or None. sys.executable 
+    is FreeCAD itself, when running in FreeCAD.'''
+    candidates = [sys.executable, getattr(sys, '_base_executable', None)]
+    bindir = os.path.dirname(sys.executable)
+    candidates += [os.path.join(bindir, name) for name in ('python3', 'python', 'python.exe', 'python3.exe')]
+    for exe in candidates:
+        if exe and os.path.isfile(exe) and os.path.basename(exe).lower().startswith('python'):
+            return exe
+    return None
+
+def _initWorker(paths):
+    for path in paths:
+        if path not in sys.path:
+            sys.path.append(path)
+    # preload FreeCAD in the worker, so that the time it takes isn't charged to the first chunk
+    import importlib
+    for module in ('FreeCAD', 'Part'):
+        importlib.import_module(module)
+
+_pool = None
+_poolSize = 0
+
+def getPool(workers = None):
+    '''getPool(workers = None): returns the process pool (it is kept between calls), or None 
+    if workers can't be started.'''
+    global _pool, _poolSize
+    if workers is None:
+        workers = workerCount()
+    if _pool is not None and _poolSize == workers:
+        return _pool
+    shutdown()
+    exe = _pythonExecutable()
+    if exe is None:
+        App.Console.PrintWarning("Lattice2: can't find python executable to start worker processes. Running serially.\n")
+        return None
+    import multiprocessing
+    ctx = multiprocessing.get_context('spawn')
+    ctx.set_executable(exe)
+    paths = list(sys.path) + [os.path.dirname(os.path.abspath(__file__)), os.path.join(App.getHomePath(), 'lib'), os.path.join(App.getHomePath(), 'bin')]
+    _pool = ctx.Pool(workers, initializer= _initWorker, initargs= (paths,))
+    _poolSize = workers
+    return _pool
+
+def shutdown():
+    '''shutdown(): terminates worker processes.'''
+    global _pool, _poolSize
+    if _pool is not None:
+        _pool.terminate()
+        _pool.join()
+    _pool = None
+    _poolSize = 0
+
+def chunkCount(n_items, parallel = True, workers = None, min_chunk = None):
+    '''chunkCount(n_items, parallel = True, workers = None, min_chunk = None): number of chunks 
+    mapChunks will split n_items into. 1 means the job will run in this process.'''
+    if not parallel:
+        return 1
+    if workers is None:
+        workers = workerCount()
+    if min_chunk is None:
+        min_chunk = minChunkSize()
+    if workers <= 1:
+        return 1
+    return max(min(workers * 4, n_items // max(min_chunk, 1)), 1)
+
+def mapShapeQuery(func, shape, items, args = (), parallel = True, progress = None, workers = None, min_chunk = None):
+    '''mapShapeQuery(func, shape, items, args = (), parallel = True, progress = None, workers = None, min_chunk = None): 
+    evaluates func(chunk, shape, *args) over chunks of items, like mapChunks, and returns the 
+    concatenated results, in order. func must be a module-level function returning a list, 
+    one value per item. 
+    
+    The shape is sent to workers as BREP, which each worker reads and parses once (see 
+    mapChunks and sharedShape). If the job is too small to be split, func is called with the 
+    shape directly, without serialization.'''
+    items = list(items)
+    if chunkCount(len(items), parallel, workers, min_chunk) <= 1:
+        result = func(items, shape, *args)
+        if progress is not None:
+            progress(len(items), len(items))
+        return result
+    return mapChunks(_shapeQueryJob, items, (func, shapeToBrep(shape)) + tuple(args), parallel, progress, workers, min_chunk)
+
+def _shapeQueryJob(chunk, func, brep, *args):
+    return func(chunk, sharedShape(brep), *args)
+
+def mapChunks(func, items, shared = (), parallel = True, progress = None, workers = None, min_chunk = None):
+    '''mapChunks(func, items, shared = (), parallel = True, progress = None, workers = None, min_chunk = None): 
+    splits items into chunks, and returns concatenation of func(chunk, *shared) over the 
+    chunks, in order. func must be a module-level function returning a list. 
+    
+    If parallel, the chunks are run by worker processes; otherwise, or if there are too few 
+    items for that to pay off, in this process. progress is a callable progress(done, total) 
+    called as chunks complete (total is number of items); raising CancelError from it 
+    terminates the workers. min_chunk overrides minChunkSize() preference, for jobs whose 
+    items are heavy. shared is shipped to the workers once per job, through a temporary file, 
+    rather than with every chunk.'''
+    output = []
+    for result in imapChunks(func, items, shared, parallel, progress, workers, min_chunk):
+        output.extend(result)
+    return output
+
+def imapChunks(func, items, shared = (), parallel = True, progress = None, workers = None, min_chunk = None):
+    '''imapChunks(...): same as mapChunks, but yields result of every chunk as soon as it (and 
+    all chunks before it) is done, so that results can be consumed without accumulating them.'''
+    items = list(items)
+    if workers is None:
+        workers = workerCount()
+    n_chunks = chunkCount(len(items), parallel, workers, min_chunk)
+    pool = getPool(workers) if n_chunks > 1 else None
+    shared_path = None
+    if pool is None:
+        chunks = [items]
+        results = map(lambda chunk: func(chunk, *shared), chunks)
+    else:
+        chunks = splitChunks(items, n_chunks)
+        shared_path = _saveShared(shared)
+        results = pool.imap(_Job(func, shared_path), chunks)
+    n_done = 0
+    try:
+        for chunk, result in zip(chunks, results):
+            n_done += len(chunk)
+            if progress is not None:
+                progress(n_done, len(items))
+            yield result
+    except (CancelError, KeyboardInterrupt, GeneratorExit):
+        # stop the workers, if they are still busy
+        if pool is not None and n_done < len(items):
+            shutdown()
+        raise
+    finally:
+        if shared_path is not None:
+            try:
+                os.remove(shared_path)
+            except OSError:
+                pass
+
+class _Job(object):
+    '''picklable callable binding shared arguments (saved to a file, see _saveShared) to a job function'''
+    def __init__(self, func, shared_path):
+        self.func = func
+        self.shared_path = shared_path
+    def __call__(self, chunk):
+        return self.func(chunk, *_loadShared(self.shared_path))
@@ -0,0 +1,310 @@
+#***************************************************************************
+#*                                                                         *
+#*   Copyright (c) 2026 - Victor Titov (DeepSOIC)                          *
+#*                                               <vv.titov@gmail.com>      *  
+#*                                                                         *
+#*   This program is free software; you can redistribute it and/or modify  *
+#*   it under the terms of the GNU Lesser General Public License (LGPL)    *
+#*   as published by the Free Software Foundation; either version 2 of     *
+#*   the License, or (at your option) any later version.                   *
+#*   for detail see the LICENCE text file.                                 *
+#*                                                                         *
+#*   This program is distributed in the hope that it will be useful,       *
+#*   but WITHOUT ANY WARRANTY; without even the implied warranty of        *
+#*   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the         *
+#*   GNU Library General Public License for more details.                  *
+#*                                                                         *
+#*   You should have received a copy of the GNU Library General Public     *
+#*   License along with this program; if not, write to the Free Software   *
+#*   Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  *
+#*   USA                                                                   *
+#*                                                                         *
+#***************************************************************************
+
+__title__="PlacementArray module for Lattice2"
+__author__ = "DeepSOIC"
+__url__ = ""
+__doc__ = "Compact storage for arrays of placements"
+
+# A placement array is a numpy array of shape (N,7) and dtype float64. Each row 
+# is one placement: x, y, z of position, followed by the rotation quaternion, in 
+# the order FreeCAD uses for Rotation.Q (qx, qy, qz, qw).
+
+import numpy
+
+import FreeCAD as App
+
+from lattice2Common import ParaConfusion
+
+def empty(count = 0):
+    '''empty(count = 0): returns an uninitialized placement array for count placements.'''
+    return numpy.empty((count, 7))
+
+def identity(count = 1):
+    '''identity(count = 1): returns a placement array filled with count zero placements.'''
+    ret = numpy.zeros((count, 7))
+    ret[:, 6] = 1.0
+    return ret
+
+def isArray(plms):
+    '''isArray(plms): returns True if plms is a placement array (as opposed to a list of App.Placement).'''
+    return isinstance(plms, numpy.ndarray)
+
+def fromPlacements(placements):
+    '''fromPlacements(placements): converts a list of App.Placement into an (N,7) placement array.'''
+    if len(placements) == 0:
+        return empty()
+    return numpy.array([tuple(plm.Base) + plm.Rotation.Q for plm in placements], dtype= numpy.float64)
+
+def fromPlacement(placement):
+    '''fromPlacement(placement): converts a single App.Placement into a row of placement array (array of shape (7,)).'''
+    return numpy.array(tuple(placement.Base) + placement.Rotation.Q, dtype= numpy.float64)
+
+def toPlacements(array):
+    '''toPlacements(array): converts an (N,7) placement array into a list of App.Placement.'''
+    V = App.Vector
+    R = App.Rotation
+    P = App.Placement
+    return [P(V(x, y, z), R(qx, qy, qz, qw)) for (x, y, z, qx, qy, qz, qw) in array.tolist()]
+
+def toPlacement(row):
+    '''toPlacement(row): converts a single row of placement array into App.Placement.'''
+    x, y, z, qx, qy, qz, qw = row.tolist()
+    return App.Placement(App.Vector(x, y, z), App.Rotation(qx, qy, qz, qw))
+
+def asArray(plms):
+    '''asArray(plms): returns plms as a placement array. plms can be a placement array (returned 
+    as is), a list of App.Placement, or a single App.Placement (a one-row array is returned).'''
+    if isArray(plms):
+        return plms
+    if hasattr(plms, 'toMatrix'):
+        return fromPlacement(plms).reshape(1,7)
+    return fromPlacements(plms)
+
+def vectors(vecs):
+    '''vectors(vecs): converts an App.Vector, or a list of them, into numpy array of shape (3,) or (N,3).'''
+    if hasattr(vecs, 'Length'):
+        return numpy.array(tuple(vecs), dtype= numpy.float64)
+    if len(vecs) == 0:
+        return numpy.empty((0,3))
+    return numpy.array([tuple(v) for v in vecs], dtype= numpy.float64)
+
+def toVectors(pts):
+    '''toVectors(pts): converts an (N,3) numpy array into a list of App.Vector.'''
+    V = App.Vector
+    return [V(x, y, z) for (x, y, z) in pts.tolist()]
+
+def make(positions = None, quaternions = None):
+    '''make(positions = None, quaternions = None): assembles a placement array from arrays of 
+    positions (...,3) and quaternions (...,4). Either one can be omitted (zero position, or no 
+    rotation are assumed then). Arguments are broadcast against each other.'''
+    if positions is None:
+        positions = numpy.zeros(3)
+    if quaternions is None:
+        quaternions = numpy.array([0.0, 0.0, 0.0, 1.0])
+    positions = numpy.asarray(positions, dtype= numpy.float64)
+    quaternions = numpy.asarray(quaternions, dtype= numpy.float64)
+    shape = numpy.broadcast_shapes(positions.shape[:-1], quaternions.shape[:-1])
+    ret = numpy.empty(shape + (7,))
+    ret[..., 0:3] = positions
+    ret[..., 3:7] = quaternions
+    return ret
+
+
+# ---------------------------- quaternion routines -----------------------------------
+# All of these broadcast over leading dimensions; the last dimension is the quaternion (x, y, z, w).
+
+def quatMultiply(q1, q2):
+    '''quatMultiply(q1, q2): Hamilton product of quaternions (rotation q2 followed by rotation q1, like Rotation.multiply).'''
+    x1, y1, z1, w1 = numpy.moveaxis(numpy.asarray(q1), -1, 0)
+    x2, y2, z2, w2 = numpy.moveaxis(numpy.asarray(q2), -1, 0)
+    return numpy.stack((
+        w1*x2 + x1*w2 + y1*z2 - z1*y2,
+        w1*y2 - x1*z2 + y1*w2 + z1*x2,
+        w1*z2 + x1*y2 - y1*x2 + z1*w2,
+        w1*w2 - x1*x2 - y1*y2 - z1*z2,
+    ), axis= -1)
+
+def quatConjugate(q):
+    '''quatConjugate(q): conjugate quaternion (which is the inverse rotation, for unit quaternions).'''
+    ret = numpy.array(q, dtype= numpy.float64)
+    ret[..., 0:3] *= -1.0
+    return ret
+
+def quatRotate(q, vecs):
+    '''quatRotate(q, vecs): applies rotations q (...,4) to vectors vecs (...,3). Quaternions must be unit.'''
+    q = numpy.asarray(q)
+    u = q[..., 0:3]
+    w = q[..., 3:4]
+    t = 2.0 * numpy.cross(u, vecs)
+    return vecs + w * t + numpy.cross(u, t)
+
+def quatFromAxisAngle(axis, angles):
+    '''quatFromAxisAngle(axis, angles): quaternions of rotations around axis (3,) or (...,3) by angles, 
+    in radians. Axis needn't be normalized.'''
+    axis = numpy.asarray(axis, dtype= numpy.float64)
+    axis = axis / numpy.linalg.norm(axis, axis= -1, keepdims= True)
+    half = numpy.asarray(angles, dtype= numpy.float64)[..., numpy.newaxis] * 0.5
+    xyz = axis * numpy.sin(half)
+    w = numpy.broadcast_to(numpy.cos(half), xyz.shape[:-1] + (1,))
+    return numpy.concatenate((xyz, w), axis= -1)
+
+def quatToMatrix(q):
+    '''quatToMatrix(q): converts unit quaternions (...,4) into rotation matrices (...,3,3). Columns of 
+    the matrix are the rotated X, Y, Z axes.'''
+    x, y, z, w = numpy.moveaxis(numpy.asarray(q), -1, 0)
+    return numpy.stack((
+        numpy.stack((1 - 2*(y*y + z*z),     2*(x*y - z*w),     2*(x*z + y*w)), axis= -1),
+        numpy.stack((    2*(x*y + z*w), 1 - 2*(x*x + z*z),     2*(y*z - x*w)), axis= -1),
+        numpy.stack((    2*(x*z - y*w),     2*(y*z + x*w), 1 - 2*(x*x + y*y)), axis= -1),
+    ), axis= -2)
+
+def toMatrices(array):
+    '''toMatrices(array): returns 4x4 transformation matrices (...,4,4) of placements, in the 
+    convention of App.Matrix (column vectors, translation in the last column).'''
+    array = numpy.asarray(array, dtype= numpy.float64)
+    m = numpy.zeros(array.shape[:-1] + (4,4))
+    m[..., 0:3, 0:3] = quatToMatrix(array[..., 3:7])
+    m[..., 0:3, 3] = array[..., 0:3]
+    m[..., 3, 3] = 1.0
+    return m
+
+def quatFromMatrix(m):
+    '''quatFromMatrix(m): converts rotation matrices (...,3,3) into unit quaternions (...,4).'''
+    m = numpy.asarray(m, dtype= numpy.float64)
+    m00 = m[..., 0, 0]; m11 = m[..., 1, 1]; m22 = m[..., 2, 2]
+    # four candidate formulas; per matrix, the one with the largest denominator is numerically best (Shepperd's method)
+    cands = numpy.stack((
+        numpy.stack((1 + m00 - m11 - m22, m[..., 0, 1] + m[..., 1, 0], m[..., 0, 2] + m[..., 2, 0], m[..., 2, 1] - m[..., 1, 2]), axis= -1),
+        numpy.stack((m[..., 0, 1] + m[..., 1, 0], 1 - m00 + m11 - m22, m[..., 1, 2] + m[..., 2, 1], m[..., 0, 2] - m[..., 2, 0]), axis= -1),
+        numpy.stack((m[..., 0, 2] + m[..., 2, 0], m[..., 1, 2] + m[..., 2, 1], 1 - m00 - m11 + m22, m[..., 1, 0] - m[..., 0, 1]), axis= -1),
+        numpy.stack((m[..., 2, 1] - m[..., 1, 2], m[..., 0, 2] - m[..., 2, 0], m[..., 1, 0] - m[..., 0, 1], 1 + m00 + m11 + m22), axis= -1),
+    ), axis= -2)
+    diag = numpy.stack((1 + m00 - m11 - m22, 1 - m00 + m11 - m22, 1 - m00 - m11 + m22, 1 + m00 + m11 + m22), axis= -1)
+    best = numpy.argmax(diag, axis= -1)
+    q = numpy.take_along_axis(cands, best[..., numpy.newaxis, numpy.newaxis], axis= -2)[..., 0, :]
+    return normalized(q)
+
+def normalized(vecs):
+    '''normalized(vecs): returns vectors (or quaternions) scaled to unit length, along last axis.'''
+    vecs = numpy.asarray(vecs, dtype= numpy.float64)
+    return vecs / numpy.linalg.norm(vecs, axis= -1, keepdims= True)
+
+def rotationsFromAxes(ZAx, XAx = None):
+    '''rotationsFromAxes(ZAx, XAx = None): batch version of lattice2GeomUtils.makeOrientationFromLocalAxes. 
+    Returns quaternions (...,4) of rotations that align Z axis with ZAx, and X axis as close to XAx as possible. 
+    ZAx and XAx are arrays (...,3) and are broadcast against each other.'''
+    ZAx = normalized(ZAx)
+    if XAx is None:
+        XAx = numpy.array([0.0, 0.0, 1.0])
+    ZAx, XAx = numpy.broadcast_arrays(ZAx, numpy.asarray(XAx, dtype= numpy.float64))
+    YAx = numpy.cross(ZAx, XAx)
+    # replace the hint where it is parallel to Z axis. Same fallbacks as in makeOrientationFromLocalAxesUni.
+    for hint in ([0.0, 0.0, 1.0], [1.0, 0.0, 0.0]):
+        bad = numpy.linalg.norm(YAx, axis= -1) < ParaConfusion*10.0
+        if not numpy.any(bad):
+            break
+        YAx[bad] = numpy.cross(ZAx[bad], numpy.array(hint))
+    YAx = normalized(YAx)
+    XAx = numpy.cross(YAx, ZAx)
+    return quatFromMatrix(numpy.stack((XAx, YAx, ZAx), axis= -1))
+
+def unifySigns(array, sequential = True):
+    '''unifySigns(array, sequential = True): returns a copy of placement array with signs of quaternions 
+    made consistent (q and -q are the same rotation). If sequential, every quaternion is made to be on 
+    the same side as its predecessor, which is what interpolation needs. Otherwise, all quaternions 
+    are made to have non-negative w.'''
+    ret = numpy.array(array, dtype= numpy.float64)
+    q = ret[..., 3:7]
+    if sequential:
+        if len(q) < 2:
+            return ret
+        dots = numpy.sum(q[1:] * q[:-1], axis= -1)
+        flips = numpy.concatenate(([1.0], numpy.cumprod(numpy.where(dots < -ParaConfusion, -1.0, 1.0))))
+        q *= flips[:, numpy.newaxis]
+    else:
+        q *= numpy.where(q[..., 3:4] < 0.0, -1.0, 1.0)
+    return ret
+
+def normalize(array):
+    '''normalize(array): returns a copy of placement array with quaternions normalized to unit length.'''
+    ret = numpy.array(array, dtype= numpy.float64)
+    ret[..., 3:7] = normalized(ret[..., 3:7])
+    return ret
+
+
+# ---------------------------- placement algebra -----------------------------------
+# All of these broadcast over leading dimensions, so one can combine a single placement (7,) with an 
+# array (N,7), or do an outer product by arr1[:, numpy.newaxis] and arr2[numpy.newaxis, :].
+
+def compose(a, b):
+    '''compose(a, b): batch version of Placement.multiply: a.multiply(b) for every pair of rows.'''
+    a = numpy.asarray(a)
+    b = numpy.asarray(b)
+    return make(a[..., 0:3] + quatRotate(a[..., 3:7], b[..., 0:3]), quatMultiply(a[..., 3:7], b[..., 3:7]))
+
+def inverse(a):
+    '''inverse(a): batch version of Placement.inverse.'''
+    a = numpy.asarray(a)
+    iq = quatConjugate(a[..., 3:7])
+    return make(-quatRotate(iq, a[..., 0:3]), iq)
+
+def moveFromTo(plmFrom, plmTo):
+    '''moveFromTo(plmFrom, plmTo): batch version of lattice2BaseFeature.makeMoveFromTo.'''
+    return compose(plmTo, inverse(plmFrom))
+
+def transformPoints(a, pts):
+    '''transformPoints(a, pts): batch version of Placement.multVec. pts is (...,3) array.'''
+    a = numpy.asarray(a)
+    return a[..., 0:3] + quatRotate(a[..., 3:7], pts)
+
+def rotateVectors(a, vecs):
+    '''rotateVectors(a, vecs): applies rotation part of placements to vectors (...,3), e.g. to get directions of local axes.'''
+    a = numpy.asarray(a)
+    return quatRotate(a[..., 3:7], vecs)
+
+def power(a, t, shorten = True):
+    '''power(a, t, shorten = True): batch version of Placement.pow. Raises a rigid transform to 
+    (possibly fractional) power t, by scaling the screw motion it represents. If shorten, 
+    rotations by more than 180 degrees are replaced with equivalent rotations the other way.'''
+    a = numpy.asarray(a, dtype= numpy.float64)
+    t = numpy.asarray(t, dtype= numpy.float64)
+    q = a[..., 3:7]
+    if shorten:
+        q = q * numpy.where(q[..., 3:4] < 0.0, -1.0, 1.0)
+    p = a[..., 0:3]
+    sin_half = numpy.linalg.norm(q[..., 0:3], axis= -1)
+    angle = 2.0 * numpy.arctan2(sin_half, q[..., 3])
+    # rotation by nearly 0 or (if not shorten) nearly 360 degrees: the screw axis is ill-defined, see below
+    degenerate = numpy.abs(numpy.sin(angle * 0.5)) < ParaConfusion
+    # axis of rotation is still meaningful near 360 degrees, so it is taken from the quaternion whenever possible
+    has_axis = sin_half > 0.0
+    axis = numpy.where(has_axis[..., numpy.newaxis], 
+                       q[..., 0:3] / numpy.where(has_axis, sin_half, 1.0)[..., numpy.newaxis], 
+                       numpy.array([0.0, 0.0, 1.0]))
+    
+    # decompose into screw motion: rotation around an axis passing through point c, plus translation d along the axis
+    d = numpy.sum(p * axis, axis= -1)
+    p_perp = p - d[..., numpy.newaxis] * axis
+    cot_half = numpy.cos(angle * 0.5) / numpy.where(degenerate, 1.0, numpy.sin(angle * 0.5))
+    c = 0.5 * (p_perp + cot_half[..., numpy.newaxis] * numpy.cross(axis, p_perp))
+    
+    angle_t = angle * t
+    q_t = quatFromAxisAngle(axis, angle_t)
+    p_t = c - quatRotate(q_t, c) + (d * t)[..., numpy.newaxis] * axis
+    
+    # the rotation is nearly a full number of turns, so the screw axis can't be found from the 
+    # translation; scale the rotation as is (by angle, not by sin_half, which is tiny near 360 
+    # degrees too), and interpolate translation linearly
+    if numpy.any(degenerate):
+        p_t = numpy.where(degenerate[..., numpy.newaxis], p * t[..., numpy.newaxis], p_t)
+    return make(p_t, q_t)
+
+def sclerp(a, b, t, shorten = True):
+    '''sclerp(a, b, t, shorten = True): batch version of Placement.sclerp. Interpolates between 
+    placements a and b, t = 0 giving a, and t = 1 giving b. t can be an array of values, 
+    e.g. sclerp(a, b, numpy.linspace(0,1,11)), which gives an array of 11 placements.'''
+    a = numpy.asarray(a)
+    t = numpy.asarray(t, dtype= numpy.float64)
+    rel = compose(inverse(a), b)
+    return compose(a, power(rel, t, shorten))
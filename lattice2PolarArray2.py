@@ -28,12 +28,15 @@ __url__ = ""
 import math
 turn = 2 * math.pi
 
+import numpy
+
 import FreeCAD as App
 import Part
 
 from lattice2Common import *
 from lattice2Compatibility import attachment_support_name
 import lattice2BaseFeature
+import lattice2PlacementArray as PlacementArray
 from lattice2BaseFeature import assureProperty
 import lattice2Executer
 import lattice2GeomUtils
@@ -136,7 +139,7 @@ class PolarArray(APlm.AttachableFeature):
         
         # cache properties into variables
         radius = float(selfobj.Radius)
-        values = [float(strv) for strv in selfobj.Values]
+        values = numpy.array([float(strv) for strv in selfobj.Values])
         
         irot = selfobj.Placement.inverse().Rotation
         
@@ -190,19 +193,13 @@ class PolarArray(APlm.AttachableFeature):
         on_arc = self.isOnArc(selfobj)
         angleplus = -90.0 if on_arc else 0.0
         mm = -1.0 if selfobj.Reverse else +1.0
-        output = [] # list of placements
-        for ang in values:
-            localrot = App.Rotation(App.Vector(0,0,1), ang * mm + angleplus)
-            localtransl = localrot.multVec(App.Vector(radius,0,0))
-            localplm = App.Placement(localtransl, localrot)
-            resultplm = localplm.multiply(baseplm)
-            if is_zero:
-                resultplm.Rotation = irot
-                resultplm = resultplm.multiply(flipplm)
-            elif is_static:
-                resultplm.Rotation = App.Rotation()
-                resultplm = resultplm.multiply(flipplm)
-            output.append(resultplm)
+        angles = numpy.radians(values * mm + angleplus)
+        localtransl = numpy.stack((radius * numpy.cos(angles), radius * numpy.sin(angles), numpy.zeros(len(angles))), axis= -1)
+        localrot = PlacementArray.quatFromAxisAngle([0.0, 0.0, 1.0], angles)
+        output = PlacementArray.compose(PlacementArray.make(localtransl, localrot), PlacementArray.fromPlacement(baseplm))
+        if is_zero or is_static:
+            output[:, 3:7] = irot.Q if is_zero else App.Rotation().Q
+            output = PlacementArray.compose(output, PlacementArray.fromPlacement(flipplm))
 
         return output
     
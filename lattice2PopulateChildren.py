@@ -27,13 +27,15 @@ __url__ = ""
 
 import math
 
+import numpy
+
 import FreeCAD as App
 import Part
 
 from lattice2Common import *
 import lattice2BaseFeature
-import lattice2CompoundExplorer as LCE
 import lattice2Executer
+import lattice2PlacementArray as PlacementArray
 from lattice2PopulateCopies import DereferenceArray, throwBody
 import lattice2ShapeCopy as ShapeCopy
 
@@ -83,12 +85,12 @@ class LatticePopulateChildren(lattice2BaseFeature.LatticeFeature):
                 if screen(obj.Object).Shape.ShapeType != "Compound":
                     lattice2Executer.warning(obj,"shape supplied as object is not a compound. It is going to be downgraded one level down (e.g, if it is a wire, the edges are going to be enumerated as children).")
             elif obj.ObjectTraversal == "Recursive":
-                objectShapes = LCE.AllLeaves(screen(obj.Object).Shape)
+                objectShapes = lattice2BaseFeature.getLeaves(screen(obj.Object))
             else:
                 raise ValueError("Traversal mode not implemented: "+obj.ObjectTraversal)
         else:
-            objectPlms = lattice2BaseFeature.getPlacementsList(screen(obj.Object), obj)
-        placements = lattice2BaseFeature.getPlacementsList(screen(obj.PlacementsTo), obj)
+            objectPlms = lattice2BaseFeature.getPlacementsArray(screen(obj.Object), obj)
+        placements = lattice2BaseFeature.getPlacementsArray(screen(obj.PlacementsTo), obj)
 
         
         # Precompute referencing
@@ -96,31 +98,25 @@ class LatticePopulateChildren(lattice2BaseFeature.LatticeFeature):
                 
         # initialize output containers and loop variables
         outputShapes = [] #output list of shapes
-        outputPlms = [] #list of placements
-        iChild = 0
         numChildren = len(objectPlms) if outputIsLattice else len(objectShapes) 
         copy_method_index = ShapeCopy.getCopyTypeIndex(obj.Copying)
         
+        # figure out which child goes to which placement
+        if obj.LoopObjectSequence and numChildren > 0:
+            numOutput = len(placements)
+        else:
+            numOutput = min(len(placements), numChildren)
+        iChildren = numpy.arange(numOutput) % max(numChildren, 1)
+        
         # the essence
-        for iPlm in range(len(placements)):
-            if iChild == numChildren:
-                if obj.LoopObjectSequence:
-                    iChild = 0
-                else:
-                    break
-            
-            plm = placements[iPlm]
-             
-            if outputIsLattice:
-                objectPlm = objectPlms[iChild]
-                outputPlms.append(plm.multiply(objectPlm))
-            else:
+        if outputIsLattice:
+            outputPlms = PlacementArray.compose(placements[:numOutput], objectPlms[iChildren])
+        else:
+            for plm, iChild in zip(PlacementArray.toPlacements(placements[:numOutput]), iChildren.tolist()):
                 outputShape = ShapeCopy.copyShape(objectShapes[iChild], copy_method_index, plm)
                 # outputShape.Placement = plm.multiply(outputShape.Placement) #now done by shape copy routine
                 outputShapes.append(outputShape)
             
-            iChild += 1
-            
         if len(placements) > numChildren and not obj.LoopObjectSequence:
             lattice2Executer.warning(obj,"There are fewer children to populate, than placements to be populated (%1, %2). Extra placements will be dropped.".replace("%1", str(numChildren)).replace("%2",str(len(placements))))
             
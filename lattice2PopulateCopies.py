@@ -27,6 +27,8 @@ __url__ = ""
 
 import math
 
+import numpy
+
 import FreeCAD as App
 import Part
 
@@ -34,39 +36,44 @@ from lattice2Common import *
 import lattice2BaseFeature
 import lattice2CompoundExplorer as LCE
 import lattice2Executer
+import lattice2PlacementArray as PlacementArray
 import lattice2ShapeCopy as ShapeCopy
 
 # ---------------------------shared code--------------------------------------
 def DereferenceArray(obj,placements, lnkFrom, refmode):
     '''common implementation of treatment Referencing property. Returns a list of placements to use directly.
     obj - feature being executed (used for error reporting; can be None)
-    placements - the array, converted into a list of placements.
+    placements - the array, converted into a list of placements, or a placement array (see lattice2PlacementArray). 
+    The returned value is of the same kind.
     lnkFrom - object linked as a lattice of 'from' placements. Can be None, if mode is not 'Use PlacemenetsFrom'
     refmode - a string - enum property item'''
+    
+    if not PlacementArray.isArray(placements):
+        return PlacementArray.toPlacements(DereferenceArray(obj, PlacementArray.fromPlacements(placements), lnkFrom, refmode))
         
-    plmDeref = App.Placement() #inverse placement of reference (reference is a substitute of origin)
+    plmDeref = PlacementArray.identity(1)[0] #inverse placement of reference (reference is a substitute of origin)
     if lnkFrom is not None  and  refmode != "Use PlacementsFrom":
         lattice2Executer.warning(obj,"Referencing mode is '"+refmode+"', doesn't need PlacementsFrom link to be set. The link is set, but it will be ignored.")
     if refmode == "Origin":
         return placements
     elif refmode == "First item":
-        plmDeref = placements[0].inverse()
+        plmDeref = PlacementArray.inverse(placements[0])
     elif refmode == "Last item":
-        plmDeref = placements[0].inverse()
+        plmDeref = PlacementArray.inverse(placements[0])
     elif refmode == "Use PlacementsFrom":
         if lnkFrom is None:
             raise ValueError("Referencing mode is 'Move from to', but PlacementsFrom link is not set.")
-        placementsFrom = lattice2BaseFeature.getPlacementsList(lnkFrom, obj)
+        placementsFrom = lattice2BaseFeature.getPlacementsArray(lnkFrom, obj)
         if len(placementsFrom) == 1:
-            plmDeref = placementsFrom[0].inverse()
+            plmDeref = PlacementArray.inverse(placementsFrom[0])
         elif len(placementsFrom) == len(placements):
-            return [lattice2BaseFeature.makeMoveFromTo(placementsFrom[i], placements[i]) for i in range(0, len(placements))]
+            return PlacementArray.moveFromTo(placementsFrom, placements)
         else:
             lattice2Executer.warning(obj,"Lengths of arrays linked as PlacementsTo and PlacementsFrom must equal, or PlacementsFrom can be one placement. Violation: lengths are "+str(len(placements))+ " and "+str(len(placementsFrom)))
     else:
         raise ValueError("Referencing mode not implemented: "+refmode)
     
-    return [plm.multiply(plmDeref) for plm in placements]
+    return PlacementArray.compose(placements, plmDeref)
 
     
 
@@ -110,51 +117,44 @@ class LatticePopulateCopies(lattice2BaseFeature.LatticeFeature):
         
         # cache stuff
         objectShape = screen(obj.Object).Shape
-        placements = lattice2BaseFeature.getPlacementsList(screen(obj.PlacementsTo), obj)
+        placements = lattice2BaseFeature.getPlacementsArray(screen(obj.PlacementsTo), obj)
 
         outputIsLattice = lattice2BaseFeature.isObjectLattice(screen(obj.Object))
 
-        # Pre-collect base placement list, if base is a lattice. For speed.
-        if outputIsLattice:
-            objectPlms = lattice2BaseFeature.getPlacementsList(screen(obj.Object),obj)
-        
         placements = DereferenceArray(obj, placements, screen(obj.PlacementsFrom), obj.Referencing)
         
+        if outputIsLattice:
+            objectPlms = lattice2BaseFeature.getPlacementsArray(screen(obj.Object),obj)
+            # every placement of object, moved to every placement of PlacementsTo
+            outputPlms = PlacementArray.compose(placements[:, numpy.newaxis], objectPlms[numpy.newaxis, :])
+            return outputPlms.reshape(-1, 7)
+        
         # initialize output containers and loop variables
         outputShapes = [] #output list of shapes
-        outputPlms = [] #list of placements
         copy_method_index = ShapeCopy.getCopyTypeIndex(obj.Copying)
 
         
         # the essence
-        for plm in placements:
-
-            if outputIsLattice:
-                for objectPlm in objectPlms:
-                    outputPlms.append(plm.multiply(objectPlm))
-            else:
-                outputShape = ShapeCopy.copyShape(objectShape, copy_method_index, plm)
-                #outputShape.Placement = plm.multiply(outputShape.Placement) # now handled by copyShape
-                outputShapes.append(outputShape)
+        for plm in PlacementArray.toPlacements(placements):
+            outputShape = ShapeCopy.copyShape(objectShape, copy_method_index, plm)
+            #outputShape.Placement = plm.multiply(outputShape.Placement) # now handled by copyShape
+            outputShapes.append(outputShape)
             
-        if outputIsLattice:
-            return outputPlms
-        else:
-            # Output shape or compound (complex logic involving OutputCompounding property)
-            #first, autosettle the OutputCompounding.
-            if obj.OutputCompounding == "(autosettle)":
-                if hasattr(screen(obj.PlacementsTo),"ExposePlacement") and screen(obj.PlacementsTo).ExposePlacement == False:
-                    obj.OutputCompounding = "always"
-                else:
-                    obj.OutputCompounding = "only if many"
-            #now, set the result shape
-            if len(outputShapes) == 1 and obj.OutputCompounding == "only if many":
-                sh = outputShapes[0]
-                sh = ShapeCopy.transformCopy(sh)
-                obj.Shape = sh
+        # Output shape or compound (complex logic involving OutputCompounding property)
+        #first, autosettle the OutputCompounding.
+        if obj.OutputCompounding == "(autosettle)":
+            if hasattr(screen(obj.PlacementsTo),"ExposePlacement") and screen(obj.PlacementsTo).ExposePlacement == False:
+                obj.OutputCompounding = "always"
             else:
-                obj.Shape = Part.makeCompound(outputShapes)
-            return None
+                obj.OutputCompounding = "only if many"
+        #now, set the result shape
+        if len(outputShapes) == 1 and obj.OutputCompounding == "only if many":
+            sh = outputShapes[0]
+            sh = ShapeCopy.transformCopy(sh)
+            obj.Shape = sh
+        else:
+            obj.Shape = Part.makeCompound(outputShapes)
+        return None
 
 class ViewProviderLatticePopulateCopies(lattice2BaseFeature.ViewProviderLatticeFeature):
 
@@ -3,6 +3,7 @@ __doc__ = 'module that registers preference page'
 allSettings = """
 Mod/Lattice2
 WeakParenting True
+KeepShadowDocuments True
 MarkerColor #ffb300 (255,179,0)
 
 Mod/Lattice2/Autosize
@@ -11,6 +12,14 @@ FeatureAdj 1.0
 ModelAdj 1.0
 AutoPosition True
 
+Mod/Lattice2/Parallel
+Workers 0
+MinChunkSize 100
+
+Mod/Lattice2/ResultCache
+Directory  (empty = Lattice2/SeriesCache in user cache directory)
+MaxSizeMB 512
+
 Mod/Lattice2/Warnings
 PopUpWarn True
 PopUpErr True
@@ -26,9 +26,10 @@ import Part
 
 from lattice2Common import *
 import lattice2BaseFeature
-import lattice2CompoundExplorer as LCE
 import lattice2Executer
 import lattice2GeomUtils as Utils
+import lattice2Parallel
+import lattice2ShapeIndex as ShapeIndex
 
 __title__="Lattice ProjectArray module for FreeCAD"
 __author__ = "DeepSOIC"
@@ -37,6 +38,82 @@ __url__ = ""
 
 # -------------------------- common stuff --------------------------------------------------
 
+def _solutions(vertex, shape):
+    # distToShape from vertex to shape, unpacked into list of (posKeep, posPrj, el_topo, element, el_params)
+    (dist, gaps, infos) = vertex.distToShape(shape)
+    result = []
+    for iSol in range(0,len(gaps)):
+        (posKeep, posPrj) = gaps[iSol]
+        (dummy, dummy, dummy, el_topo, el_index, el_params) = infos[iSol]
+        element = None
+        if el_topo == 'Face':
+            element = shape.Faces[el_index]
+        elif el_topo == 'Edge':
+            element = shape.Edges[el_index]
+        result.append((posKeep, posPrj, el_topo, element, el_params))
+    return result
+
+def projectPoint(point, toolShape, index = None, all_solutions = True):
+    '''projectPoint(point, toolShape, index = None, all_solutions = True): projects a point onto a 
+    shape. Returns list of (posKeep, posPrj, el_topo, element, el_params), where element is the 
+    face or edge the point landed on (None for a vertex), and el_params are parameters on it.
+    
+    If index (a lattice2ShapeIndex.ShapeIndex of toolShape) is given, the search for nearest 
+    faces/edges goes through its bounding box tree, and exact projection is done only onto 
+    those. Points strictly inside solids are projected with plain distToShape, as it treats them 
+    specially; points on the surface go through the index like any other.'''
+    vertex = Part.Vertex(point)
+    if index is None or index.isInsideSolid(point, include_boundary= False):
+        return _solutions(vertex, toolShape)
+    dist, pieces = index.nearest(point)
+    result = []
+    for ipiece in pieces:
+        for sol in _solutions(vertex, index.pieces[ipiece]):
+            # an edge or vertex shared by adjacent faces is found from each of them; keep one
+            if any(sol[2] == prev[2] and (sol[1] - prev[1]).Length < DistConfusion 
+                   and (sol[3] is None or sol[3].isSame(prev[3])) for prev in result):
+                continue
+            result.append(sol)
+        if len(result) > 0 and not all_solutions:
+            break
+    return result
+
+def projectionData(point, toolShape, index = None, all_solutions = True):
+    '''projectionData(point, toolShape, index = None, all_solutions = True): projects a point (see 
+    projectPoint), and evaluates the local frame there. Returns list of (posKeep, posPrj, el_topo, 
+    normal, tangU, tangV); normal is normalized; normal and tangents can be None if not available.'''
+    result = []
+    for (posKeep, posPrj, el_topo, element, el_params) in projectPoint(point, toolShape, index, all_solutions):
+        normal = posKeep - posPrj
+        if normal.Length < DistConfusion:
+            normal = None
+        
+        tangU = None
+        tangV = None
+        if el_topo == 'Face':
+            face = element
+            if normal is None:
+                normal = face.normalAt(*el_params)
+            (tangU, tangV) = face.tangentAt(*el_params)
+        elif el_topo == "Edge":
+            edge = element
+            tangU = edge.tangentAt(el_params)
+        
+        if normal is not None:
+            normal.normalize()
+        result.append((posKeep, posPrj, el_topo, normal, tangU, tangV))
+    return result
+
+def _projectJob(points, toolShape, indexed, all_solutions):
+    # lattice2Parallel.mapShapeQuery job: projectionData for a chunk of points. Vectors are passed as tuples.
+    index = ShapeIndex.sharedIndex(toolShape) if indexed else None
+    tup = lambda v: None if v is None else tuple(v)
+    return [
+        [(tup(posKeep), tup(posPrj), el_topo, tup(normal), tup(tangU), tup(tangV)) 
+         for (posKeep, posPrj, el_topo, normal, tangU, tangV) in projectionData(App.Vector(*point), toolShape, index, all_solutions)]
+        for point in points
+    ]
+
 def makeProjectArray(name):
     '''makeProjectArray(name): makes a Lattice ProjectArray object.'''
     return lattice2BaseFeature.makeLatticeFeature(name, LatticeProjectArray, ViewProviderProjectArray)
@@ -64,9 +141,26 @@ class LatticeProjectArray(lattice2BaseFeature.LatticeFeature):
         
         obj.addProperty("App::PropertyEnumeration","Multisolution","Lattice ProjectArray","Specify the way of dealing with multiple solutions of projection")
         obj.Multisolution = ['use first','use all']
+        
+        self.assureProperties(obj)
+        obj.Engine = 'indexed'
                 
+    def assureProperties(self, obj):
+        '''Adds properties that can be missing on objects made with earlier version of Lattice2.'''
+        if self.assureProperty(obj, "App::PropertyEnumeration", "Engine", ['indexed', 'plain'], "Lattice ProjectArray", 
+            "indexed: find nearest faces/edges through a bounding box tree of Tool, built once per Tool shape, and project onto those only (fast for large tools). "
+            "plain: project onto the whole Tool shape (distToShape) for every placement."):
+            obj.Engine = 'plain' # keep projects made before the engine choice computing as they did. New objects get 'indexed', see derivedInit
+        self.assureProperty(obj, "App::PropertyBool", "Parallel", False, "Lattice ProjectArray", 
+            "Split the work among worker processes. Pays off for large arrays only. Number of workers is set in preferences.")
+        
+    def onDocumentRestored(self, obj):
+        lattice2BaseFeature.LatticeFeature.onDocumentRestored(self, obj)
+        self.assureProperties(obj)
 
     def derivedExecute(self,obj):
+        self.assureProperties(obj)
+        
         #validity check
         if not lattice2BaseFeature.isObjectLattice(screen(obj.Base)):
             lattice2Executer.warning(obj,"A lattice object is expected as Base, but a generic shape was provided. It will be treated as a lattice object; results may be unexpected.")
@@ -74,12 +168,14 @@ class LatticeProjectArray(lattice2BaseFeature.LatticeFeature):
         toolShape = screen(obj.Tool).Shape
         if lattice2BaseFeature.isObjectLattice(screen(obj.Tool)):
             lattice2Executer.warning(obj,"A lattice object was provided as Tool. It will be converted into points; orientations will be ignored.")
-            leaves = LCE.AllLeaves(toolShape)
-            points = [Part.Vertex(leaf.Placement.Base) for leaf in leaves]
+            positions = lattice2BaseFeature.getPlacementsArray(screen(obj.Tool), suppressWarning= True)[:, 0:3]
+            points = [Part.Vertex(App.Vector(*pos)) for pos in positions.tolist()]
             toolShape = Part.makeCompound(points)
+            index = ShapeIndex.ShapeIndex(toolShape) if obj.Engine == 'indexed' else None
+        else:
+            index = lattice2BaseFeature.getShapeIndex(screen(obj.Tool)) if obj.Engine == 'indexed' else None
 
-        leaves = LCE.AllLeaves(screen(obj.Base).Shape)
-        input = [leaf.Placement for leaf in leaves]
+        input = lattice2BaseFeature.getPlacementsList(screen(obj.Base), obj, suppressWarning= True)
 
         output = [] #variable to receive the final list of placements
         
@@ -97,32 +193,18 @@ class LatticeProjectArray(lattice2BaseFeature.LatticeFeature):
         
         isMultiSol = obj.Multisolution == 'use all'
         
-        for plm in input:
-            v = Part.Vertex(plm.Base)
-            projection = v.distToShape(toolShape)
-            (dist, gaps, infos) = projection
-            for iSol in range(0,len(gaps)):
-                (posKeep, posPrj) = gaps[iSol]
-                (dummy, dummy, dummy, el_topo, el_index, el_params) = infos[iSol]
-
-                # Fetch all possible parameters (some may not be required, depending on modes)
-                normal = posKeep - posPrj
-                if normal.Length < DistConfusion:
-                    normal = None
-                
-                tangU = None
-                tangV = None
-                if el_topo == 'Face':
-                    face = toolShape.Faces[el_index]
-                    if normal is None:
-                        normal = face.normalAt(*el_params)
-                    (tangU, tangV) = face.tangentAt(*el_params)
-                elif el_topo == "Edge":
-                    edge = toolShape.Edges[el_index]
-                    tangU = edge.tangentAt(el_params)
-                
-                if normal is not None:
-                    normal.normalize()
+        if lattice2Parallel.chunkCount(len(input), obj.Parallel) > 1:
+            vec = lambda t: None if t is None else App.Vector(*t)
+            projections = [
+                [(vec(posKeep), vec(posPrj), el_topo, vec(normal), vec(tangU), vec(tangV)) 
+                 for (posKeep, posPrj, el_topo, normal, tangU, tangV) in sols]
+                for sols in lattice2Parallel.mapShapeQuery(_projectJob, toolShape, [tuple(plm.Base) for plm in input], (index is not None, isMultiSol))
+            ]
+        else:
+            projections = (projectionData(plm.Base, toolShape, index, isMultiSol) for plm in input)
+        
+        for plm, sols in zip(input, projections):
+            for (posKeep, posPrj, el_topo, normal, tangU, tangV) in sols:
                 
                 #mode logic - compute new placement
                 if posIsKeep:
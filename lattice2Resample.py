@@ -32,7 +32,6 @@ import Part
 
 from lattice2Common import *
 import lattice2BaseFeature
-import lattice2CompoundExplorer as LCE
 import lattice2InterpolatorUtil as LIU
 import lattice2Executer
 
@@ -69,10 +68,9 @@ class LatticeResample(lattice2BaseFeature.LatticeFeature):
 
     def derivedExecute(self,obj):
         # cache stuff
-        base = screen(obj.Base).Shape
         if not lattice2BaseFeature.isObjectLattice(screen(obj.Base)):
             lattice2Executer.warning(obj, "Base is not a lattice, but lattice is expected. Results may be unexpected.\n")
-        input = [leaf.Placement for leaf in LCE.AllLeaves(base)]
+        input = lattice2BaseFeature.getPlacementsList(screen(obj.Base), obj, suppressWarning= True)
         
         if len(input) < 2:
             raise ValueError("At least 2 placements ar needed to interpolate; there are just "+str(len(input))+" in base array.")
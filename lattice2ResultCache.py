@@ -0,0 +1,167 @@
+#***************************************************************************
+#*                                                                         *
+#*   Copyright (c) 2026 - Victor Titov (DeepSOIC)                          *
+#*                                               <vv.titov@gmail.com>      *  
+#*                                                                         *
+#*   This program is free software; you can redistribute it and/or modify  *
+#*   it under the terms of the GNU Lesser General Public License (LGPL)    *
+#*   as published by the Free Software Foundation; either version 2 of     *
+#*   the License, or (at your option) any later version.                   *
+#*   for detail see the LICENCE text file.                                 *
+#*                                                                         *
+#*   This program is distributed in the hope that it will be useful,       *
+#*   but WITHOUT ANY WARRANTY; without even the implied warranty of        *
+#*   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the         *
+#*   GNU Library General Public License for more details.                  *
+#*                                                                         *
+#*   You should have received a copy of the GNU Library General Public     *
+#*   License along with this program; if not, write to the Free Software   *
+#*   Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  *
+#*   USA                                                                   *
+#*                                                                         *
+#***************************************************************************
+
+__title__="ResultCache module for Lattice2"
+__author__ = "DeepSOIC"
+__url__ = ""
+__doc__ = "Disk cache of shapes computed by series features, keyed by hash of everything they depend on"
+
+# Records are BREP files named by the key, in a directory from preferences (by default, 
+# in the user cache directory). Least recently used records are deleted when the total 
+# size exceeds the limit from preferences. Reading a record updates its modification 
+# time, which is what "recently used" is judged by.
+
+import hashlib
+import os
+
+import FreeCAD as App
+
+_paramPath = "User parameter:BaseApp/Preferences/Mod/Lattice2/ResultCache"
+
+def cacheDirectory():
+    '''cacheDirectory(): returns directory of the cache (creating it, if necessary).'''
+    path = App.ParamGet(_paramPath).GetString("Directory", "")
+    if not path:
+        if hasattr(App, 'getUserCachePath'):
+            root = App.getUserCachePath()
+        else:
+            root = App.getUserAppDataDir()
+        path = os.path.join(root, 'Lattice2', 'SeriesCache')
+    if not os.path.isdir(path):
+        os.makedirs(path)
+    return path
+
+def sizeLimit():
+    '''sizeLimit(): maximum total size of cache, in bytes.'''
+    return App.ParamGet(_paramPath).GetInt("MaxSizeMB", 512) * 1024 * 1024
+
+def makeKey(*parts):
+    '''makeKey(*parts): makes a cache key out of strings (or anything with a stable repr).'''
+    h = hashlib.sha1()
+    for part in parts:
+        h.update(repr(part).encode('utf-8'))
+        h.update(b'\0')
+    return h.hexdigest()
+
+def graphHash(objects):
+    '''graphHash(objects): returns a hash of inputs of the objects (see inputProperties). Supply 
+    the object with all its dependencies, and the hash will tell if its result may have changed.'''
+    h = hashlib.sha1()
+    for obj in sorted(set(objects), key= lambda obj: obj.Name):
+        h.update((obj.Name + '\0' + objectHash(obj) + '\0').encode('utf-8'))
+    return h.hexdigest()
+
+def objectHash(obj):
+    '''objectHash(obj): returns a hash of type and input properties of one object.'''
+    h = hashlib.sha1()
+    h.update((obj.TypeId + '\0').encode('utf-8'))
+    for prop in inputProperties(obj):
+        h.update((prop + '\0').encode('utf-8'))
+        h.update(_propertyContent(obj, prop))
+    return h.hexdigest()
+
+def inputProperties(obj):
+    '''inputProperties(obj): returns sorted list of names of properties of the object that can affect 
+    its result: all properties, except outputs (shape of an object that depends on something, 
+    properties marked as output or transient), Label and Label2 (renaming doesn't change the result), 
+    Visibility, and Recomputing of series features.'''
+    result = []
+    for prop in sorted(obj.PropertiesList):
+        if prop in ('Label', 'Label2', 'Visibility', 'Recomputing'):
+            continue
+        try:
+            status = obj.getPropertyStatus(prop)
+        except Exception:
+            status = []
+        if 'Output' in status or 'Transient' in status:
+            continue
+        if obj.getTypeIdOfProperty(prop) == 'Part::PropertyPartShape' and len(obj.OutList) > 0:
+            continue
+        result.append(prop)
+    return result
+
+def _propertyContent(obj, prop):
+    if hasattr(obj, 'dumpPropertyContent'):
+        try:
+            return obj.dumpPropertyContent(prop)
+        except Exception:
+            pass
+    val = getattr(obj, prop)
+    if hasattr(val, 'exportBrepToString'):
+        return val.exportBrepToString().encode('utf-8')
+    return repr(val).encode('utf-8')
+
+def _path(key):
+    return os.path.join(cacheDirectory(), key + '.brep')
+
+def get(key):
+    '''get(key): returns cached shape, or None if there is no record.'''
+    import Part
+    path = _path(key)
+    if not os.path.isfile(path):
+        return None
+    try:
+        sh = Part.Shape()
+        sh.importBrep(path)
+        os.utime(path, None)
+        return sh
+    except Exception as err:
+        App.Console.PrintWarning("Lattice2: failed to read cached result {path}: {err}\n".format(path= path, err= str(err)))
+        return None
+
+def put(key, shape):
+    '''put(key, shape): stores shape (a Part.Shape, or a BREP string) in cache. Call trim() after storing a batch.'''
+    path = _path(key)
+    tmp = path + '.part'
+    if isinstance(shape, str):
+        with open(tmp, 'w') as f:
+            f.write(shape)
+    else:
+        shape.exportBrep(tmp)
+    os.replace(tmp, path) # for concurrent FreeCAD instances not to read a half-written file
+
+def trim(limit = None):
+    '''trim(limit = None): deletes least recently used records until cache size is within limit (from preferences, if None).'''
+    if limit is None:
+        limit = sizeLimit()
+    directory = cacheDirectory()
+    records = []
+    for name in os.listdir(directory):
+        if not name.endswith('.brep'):
+            continue
+        st = os.stat(os.path.join(directory, name))
+        records.append((st.st_mtime, st.st_size, name))
+    total = sum(rec[1] for rec in records)
+    records.sort()
+    for mtime, size, name in records:
+        if total <= limit:
+            break
+        try:
+            os.remove(os.path.join(directory, name))
+            total -= size
+        except OSError:
+            pass
+
+def clear():
+    '''clear(): deletes all records.'''
+    trim(0)
@@ -24,11 +24,14 @@
 __title__="Lattice ScLERP object: interpolation between two placements."
 __author__ = "DeepSOIC"
 
+import numpy
+
 import FreeCAD as App
 import Part
 
 from lattice2Common import *
 import lattice2BaseFeature
+import lattice2PlacementArray as PlacementArray
 import lattice2Executer
 from lattice2ValueSeriesGenerator import ValueSeriesGenerator
 
@@ -77,24 +80,18 @@ class LatticeScLERP(lattice2BaseFeature.LatticeFeature):
         self.assureGenerator(host)
         
         self.generator.execute()
-        values = [float(strv) for strv in host.Values]
+        values = numpy.array([float(strv) for strv in host.Values])
 
-        input = lattice2BaseFeature.getPlacementsList(host.Placement1Ref)
+        input = lattice2BaseFeature.getPlacementsArray(host.Placement1Ref)
         if host.Placement2Ref is not None:
-            input.extend(lattice2BaseFeature.getPlacementsList(host.Placement2Ref))
+            input = numpy.concatenate((input, lattice2BaseFeature.getPlacementsArray(host.Placement2Ref)))
         
         if len(input) != 2:
             raise ValueError("Need exactly 2 placements. {n} provided.".format(n= len(input)))
             
         plm1, plm2 = input
 
-        # construct interpolation functions
-        #  prepare lists of input samples
-                
-        def plmByVal(val):
-            return plm1.sclerp(plm2, val, host.Shorten)
-
-        output = [plmByVal(val) for val in values]
+        output = PlacementArray.sclerp(plm1, plm2, values, host.Shorten)
 
         ## update reference placement
         #ref = host.ReferencePlacementOption
@@ -181,6 +178,6 @@ class CommandLatticeScLERP:
 if FreeCAD.GuiUp:
     FreeCADGui.addCommand('Lattice2_ScLERP', CommandLatticeScLERP())
 
-exportedCommands = ['Lattice2_ScLERP'] if hasattr(App.Placement, 'sclerp') else []
+exportedCommands = ['Lattice2_ScLERP']
 
 # -------------------------- /Gui command --------------------------------------------------
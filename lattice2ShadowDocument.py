@@ -0,0 +1,203 @@
+#***************************************************************************
+#*                                                                         *
+#*   Copyright (c) 2026 - Victor Titov (DeepSOIC)                          *
+#*                                               <vv.titov@gmail.com>      *  
+#*                                                                         *
+#*   This program is free software; you can redistribute it and/or modify  *
+#*   it under the terms of the GNU Lesser General Public License (LGPL)    *
+#*   as published by the Free Software Foundation; either version 2 of     *
+#*   the License, or (at your option) any later version.                   *
+#*   for detail see the LICENCE text file.                                 *
+#*                                                                         *
+#*   This program is distributed in the hope that it will be useful,       *
+#*   but WITHOUT ANY WARRANTY; without even the implied warranty of        *
+#*   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the         *
+#*   GNU Library General Public License for more details.                  *
+#*                                                                         *
+#*   You should have received a copy of the GNU Library General Public     *
+#*   License along with this program; if not, write to the Free Software   *
+#*   Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  *
+#*   USA                                                                   *
+#*                                                                         *
+#***************************************************************************
+
+__title__="ShadowDocument module for Lattice2"
+__author__ = "DeepSOIC"
+__url__ = ""
+__doc__ = "Temporary documents kept between recomputes of series features, and resynchronized incrementally"
+
+# A shadow document holds a copy of an object with all its dependencies, for a series 
+# feature to play with. Instead of copying the whole dependency tree on every recompute, 
+# the shadow is kept, and only objects whose inputs changed since are updated (by copying 
+# property contents over). The shadow is remade from scratch if the dependency graph 
+# changes, and closed if the feature, or its document, is deleted.
+#
+# The feature must tell which shadow objects it modified (markDirty), so that they are 
+# restored on next sync.
+
+import FreeCAD as App
+
+import lattice2ResultCache as ResultCache
+
+_paramPath = "User parameter:BaseApp/Preferences/Mod/Lattice2"
+
+def keepShadows():
+    '''keepShadows(): if False, shadow documents are closed after every use (preferences).'''
+    return App.ParamGet(_paramPath).GetBool("KeepShadowDocuments", True)
+
+class ShadowDocument(object):
+    def __init__(self, feature):
+        self.featureDocName = feature.Document.Name
+        self.featureName = feature.Name
+        self.doc = None
+        self.rootName = None
+        self.graph = None # tuple of (object name, names of objects it links to), for telling if dependency graph changed
+        self.hashes = {} # object name -> objectHash of the source object, as of last sync
+        self.dirty = set()
+    
+    def isAlive(self):
+        return self.doc is not None and self.doc.Name in App.listDocuments()
+        
+    def sync(self, root):
+        '''sync(root): brings the shadow up to date with root object and its dependencies. Returns the shadow document.'''
+        objects = [root] + root.OutListRecursive
+        graph = tuple(sorted((obj.Name, tuple(sorted(set(o.Name for o in obj.OutList)))) for obj in objects))
+        if not self.isAlive() or self.rootName != root.Name or self.graph != graph or not hasattr(root, 'dumpPropertyContent'):
+            self.rebuild(root, objects, graph)
+            return self.doc
+        for obj in objects:
+            shadow_obj = self.doc.getObject(obj.Name)
+            if shadow_obj is not None and shadow_obj.Label != obj.Label:
+                # labels aren't inputs (see inputProperties), but expressions may refer to objects by label
+                shadow_obj.Label = obj.Label
+            h = ResultCache.objectHash(obj)
+            if self.hashes.get(obj.Name) == h and obj.Name not in self.dirty:
+                continue
+            props = ResultCache.inputProperties(obj)
+            if shadow_obj is None or not set(props).issubset(shadow_obj.PropertiesList):
+                # a property was added to the source object; can't sync that
+                self.rebuild(root, objects, graph)
+                return self.doc
+            for prop in props:
+                # links are stored by object name, so restored in the shadow document they point to shadow objects
+                shadow_obj.restorePropertyContent(prop, obj.dumpPropertyContent(prop))
+            self.hashes[obj.Name] = h
+        self.dirty = set()
+        return self.doc
+    
+    def rebuild(self, root, objects, graph):
+        self.close()
+        doc1 = root.Document
+        try:
+            self.doc = App.newDocument("Lattice2Shadow", "Lattice2Shadow", True) # hidden
+        except TypeError:
+            self.doc = App.newDocument() # old FreeCAD, no hidden documents
+        # assign doc's filename before copying objects, otherwise we get errors with xlinks
+        try:
+            self.doc.FileName = doc1.FileName
+        except Exception as err:
+            pass #in old FreeCADs, FileName property is read-only, we can safely ignore that
+        try:
+            self.doc.UndoMode = 0
+        except Exception:
+            pass
+        self.doc.copyObject(root, True)
+        self.rootName = root.Name
+        self.graph = graph
+        self.hashes = dict((obj.Name, ResultCache.objectHash(obj)) for obj in objects) if keepShadows() else {}
+        self.dirty = set()
+        
+    def markDirty(self, object_names):
+        '''markDirty(object_names): tells that the shadow objects were modified, and are to be restored on next sync.'''
+        self.dirty.update(object_names)
+    
+    def close(self):
+        if self.isAlive():
+            App.closeDocument(self.doc.Name)
+        self.doc = None
+        self.hashes = {}
+
+def dependentClosure(doc, object_names, root):
+    '''dependentClosure(doc, object_names, root): returns objects of doc that need recomputing when 
+    the named objects are modified, for root to be up to date: the named objects themselves, and 
+    everything depending on them, limited to root and its dependencies.'''
+    relevant = set([root.Name] + [obj.Name for obj in root.OutListRecursive])
+    closure = {}
+    for name in object_names:
+        obj = doc.getObject(name)
+        if obj is None:
+            continue
+        for o in [obj] + obj.InListRecursive:
+            if o.Name in relevant:
+                closure[o.Name] = o
+    return list(closure.values())
+
+def recomputeClosure(doc, objects):
+    '''recomputeClosure(doc, objects): recomputes the objects (see dependentClosure), and returns 
+    True if all of them are valid afterwards.'''
+    try:
+        doc.recompute(objects)
+    except TypeError:
+        doc.recompute() # old FreeCAD, can't recompute a subset
+    for obj in objects:
+        if 'Invalid' in obj.State:
+            return False
+    return True
+
+# key is (document name, feature name)
+_shadows = {}
+
+def acquire(feature, root):
+    '''acquire(feature, root): returns a document with a copy of root object and its dependencies, 
+    for the feature to modify and recompute. Call release when done.'''
+    _assureObserver()
+    key = (feature.Document.Name, feature.Name)
+    shadow = _shadows.get(key)
+    if shadow is None:
+        shadow = ShadowDocument(feature)
+        _shadows[key] = shadow
+    return shadow.sync(root)
+
+def release(feature, modified_object_names):
+    '''release(feature, modified_object_names): to be called after done with the document given 
+    by acquire; modified_object_names lists names of objects the feature has modified.'''
+    key = (feature.Document.Name, feature.Name)
+    shadow = _shadows.get(key)
+    if shadow is None:
+        return
+    if keepShadows():
+        shadow.markDirty(modified_object_names)
+    else:
+        forget(key)
+
+def forget(key):
+    shadow = _shadows.pop(key, None)
+    if shadow is not None:
+        shadow.close()
+
+def closeAll():
+    '''closeAll(): closes all shadow documents.'''
+    for key in list(_shadows):
+        forget(key)
+
+
+class _DocumentObserver(object):
+    def slotDeletedObject(self, obj):
+        try:
+            key = (obj.Document.Name, obj.Name)
+        except Exception:
+            return
+        if key in _shadows:
+            forget(key)
+
+    def slotDeletedDocument(self, doc):
+        for key in [key for key in _shadows if key[0] == doc.Name]:
+            forget(key)
+
+_observer = None
+
+def _assureObserver():
+    global _observer
+    if _observer is None:
+        _observer = _DocumentObserver()
+        App.addDocumentObserver(_observer)
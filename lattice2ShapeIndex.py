@@ -0,0 +1,308 @@
+#***************************************************************************
+#*                                                                         *
+#*   Copyright (c) 2026 - Victor Titov (DeepSOIC)                          *
+#*                                               <vv.titov@gmail.com>      *  
+#*                                                                         *
+#*   This program is free software; you can redistribute it and/or modify  *
+#*   it under the terms of the GNU Lesser General Public License (LGPL)    *
+#*   as published by the Free Software Foundation; either version 2 of     *
+#*   the License, or (at your option) any later version.                   *
+#*   for detail see the LICENCE text file.                                 *
+#*                                                                         *
+#*   This program is distributed in the hope that it will be useful,       *
+#*   but WITHOUT ANY WARRANTY; without even the implied warranty of        *
+#*   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the         *
+#*   GNU Library General Public License for more details.                  *
+#*                                                                         *
+#*   You should have received a copy of the GNU Library General Public     *
+#*   License along with this program; if not, write to the Free Software   *
+#*   Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  *
+#*   USA                                                                   *
+#*                                                                         *
+#***************************************************************************
+
+__title__="ShapeIndex module for Lattice2"
+__author__ = "DeepSOIC"
+__url__ = ""
+__doc__ = "Bounding box hierarchy over pieces of a shape, for fast point-to-shape distance queries"
+
+import heapq
+
+import numpy
+
+import FreeCAD as App
+import Part
+
+from lattice2Common import DistConfusion
+import lattice2Parallel
+
+def boxDistances(points, boxes):
+    '''boxDistances(points, boxes): distances from points (...,3) to axis-aligned boxes (...,6) 
+    given as (xmin, ymin, zmin, xmax, ymax, zmax). Zero if point is inside the box. Broadcasting.'''
+    points = numpy.asarray(points)
+    boxes = numpy.asarray(boxes)
+    gap = numpy.maximum(numpy.maximum(boxes[..., 0:3] - points, points - boxes[..., 3:6]), 0.0)
+    return numpy.sqrt(numpy.sum(gap*gap, axis= -1))
+
+def clusterBoxes(boxes, tolerance = DistConfusion):
+    '''clusterBoxes(boxes, tolerance = DistConfusion): groups boxes into clusters, so that boxes 
+    of different clusters don't overlap. Returns list of lists of indexes into boxes.'''
+    parent = list(range(len(boxes)))
+    def root(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+    
+    # sweep along X, testing only the boxes whose X ranges overlap
+    order = sorted(range(len(boxes)), key= lambda i: boxes[i].XMin)
+    active = []
+    for i in order:
+        bb = boxes[i]
+        active = [j for j in active if boxes[j].XMax + tolerance >= bb.XMin]
+        for j in active:
+            bj = boxes[j]
+            if (bj.YMin <= bb.YMax + tolerance and bb.YMin <= bj.YMax + tolerance 
+                and bj.ZMin <= bb.ZMax + tolerance and bb.ZMin <= bj.ZMax + tolerance):
+                parent[root(i)] = root(j)
+        active.append(i)
+    
+    clusters = {}
+    for i in range(len(boxes)):
+        clusters.setdefault(root(i), []).append(i)
+    return sorted(clusters.values())
+
+def _spreadBits(v):
+    # spreads lower 21 bits of v (uint64 array) to every third bit
+    u = numpy.uint64
+    v = v & u(0x1fffff)
+    v = (v | v << u(32)) & u(0x1f00000000ffff)
+    v = (v | v << u(16)) & u(0x1f0000ff0000ff)
+    v = (v | v << u(8)) & u(0x100f00f00f00f00f)
+    v = (v | v << u(4)) & u(0x10c30c30c30c30c3)
+    v = (v | v << u(2)) & u(0x1249249249249249)
+    return v
+
+def mortonOrder(points):
+    '''mortonOrder(points): returns indexes that sort points (N,3) along Z-order (Morton) curve, 
+    so that points close in space tend to be close in the order.'''
+    points = numpy.asarray(points, dtype= float).reshape(-1,3)
+    if len(points) == 0:
+        return numpy.zeros(0, dtype= int)
+    lo = points.min(axis= 0)
+    span = points.max(axis= 0) - lo
+    span[span == 0] = 1.0
+    q = ((points - lo) / span * (2**21 - 1)).astype(numpy.uint64)
+    codes = _spreadBits(q[:,0]) | _spreadBits(q[:,1]) << numpy.uint64(1) | _spreadBits(q[:,2]) << numpy.uint64(2)
+    return numpy.argsort(codes, kind= 'stable')
+
+def _box(shape):
+    bb = shape.BoundBox
+    tol = DistConfusion
+    return (bb.XMin - tol, bb.YMin - tol, bb.ZMin - tol, bb.XMax + tol, bb.YMax + tol, bb.ZMax + tol)
+
+class ShapeIndex(object):
+    '''ShapeIndex(shape, leaf_size = 4): bounding volume hierarchy over faces, free edges and free 
+    vertices of a shape, plus its solids. Answers "how far is this point from the shape", computing 
+    exact distances (distToShape) only for pieces whose bounding boxes are close enough to matter.
+    Distances are the same as from Part.Vertex(point).distToShape(shape): zero for points inside solids.'''
+    
+    def __init__(self, shape, leaf_size = 4):
+        self.shape = shape
+        
+        pieces = list(shape.Faces)
+        used = set()
+        for f in pieces:
+            used.update(e.hashCode() for e in f.Edges)
+        edges = [e for e in shape.Edges if e.hashCode() not in used]
+        used = set()
+        for e in shape.Edges:
+            used.update(v.hashCode() for v in e.Vertexes)
+        vertices = [v for v in shape.Vertexes if v.hashCode() not in used]
+        self.pieces = pieces + edges + vertices
+        
+        self.solids = list(shape.Solids)
+        self.solidBoxes = numpy.array([_box(s) for s in self.solids]).reshape(-1, 6)
+        
+        # tree is stored in flat lists. Node i has box nodeBoxes[i]. If nodeChildren[i] is 
+        # None, the node is a leaf and holds pieces order[nodeStart[i] : nodeStart[i]+nodeCount[i]].
+        boxes = numpy.array([_box(p) for p in self.pieces]).reshape(-1, 6)
+        self.order = numpy.arange(len(self.pieces))
+        self._nodeBoxes = []
+        self._nodeChildren = []
+        self._nodeStart = []
+        self._nodeCount = []
+        if len(self.pieces) > 0:
+            self._build(boxes, 0, len(self.pieces), max(leaf_size, 1))
+        self.nodeBoxes = numpy.array(self._nodeBoxes).reshape(-1, 6)
+        self.pieceBoxes = boxes
+        
+    def _build(self, boxes, start, stop, leaf_size):
+        idx = self.order[start:stop]
+        sub = boxes[idx]
+        inode = len(self._nodeBoxes)
+        self._nodeBoxes.append(numpy.concatenate((sub[:, 0:3].min(axis= 0), sub[:, 3:6].max(axis= 0))))
+        self._nodeChildren.append(None)
+        self._nodeStart.append(start)
+        self._nodeCount.append(stop - start)
+        if stop - start <= leaf_size:
+            return inode
+        # split by median of box centers along the longest extent
+        centers = (sub[:, 0:3] + sub[:, 3:6]) * 0.5
+        axis = int(numpy.argmax(centers.max(axis= 0) - centers.min(axis= 0)))
+        self.order[start:stop] = idx[numpy.argsort(centers[:, axis], kind= 'stable')]
+        mid = (start + stop) // 2
+        left = self._build(boxes, start, mid, leaf_size)
+        right = self._build(boxes, mid, stop, leaf_size)
+        self._nodeChildren[inode] = (left, right)
+        return inode
+        
+    def isInsideSolid(self, point, include_boundary = True):
+        '''isInsideSolid(point, include_boundary = True): True if point (a Vector or 3 floats) is inside 
+        any solid of the shape. Points on the boundary count as inside, unless include_boundary is False.'''
+        if len(self.solids) == 0:
+            return False
+        v = App.Vector(*point)
+        for i in numpy.nonzero(boxDistances(numpy.array(tuple(point)), self.solidBoxes) == 0.0)[0]:
+            if self.solids[i].isInside(v, DistConfusion, include_boundary):
+                return True
+        return False
+        
+    def distance(self, point, limit = float('inf')):
+        '''distance(point, limit = inf): exact distance from point to the shape. If the distance 
+        exceeds limit, returns inf without computing it.'''
+        if len(self.nodeBoxes) == 0:
+            return 0.0 if self.isInsideSolid(point) else float('inf')
+        p = numpy.array(tuple(point), dtype= numpy.float64)
+        if boxDistances(p, self.nodeBoxes[0]) > limit:
+            return float('inf')
+        if self.isInsideSolid(p):
+            return 0.0
+        vertex = None
+        best = float('inf')
+        # branch-and-bound: visit nodes nearest-box-first, skip those that can't beat the best found
+        heap = [(0.0, 0)]
+        while heap:
+            lb, inode = heapq.heappop(heap)
+            if lb > limit or lb >= best:
+                break
+            children = self._nodeChildren[inode]
+            if children is not None:
+                for ich in children:
+                    lb_ch = float(boxDistances(p, self.nodeBoxes[ich]))
+                    if lb_ch <= limit and lb_ch < best:
+                        heapq.heappush(heap, (lb_ch, ich))
+                continue
+            start = self._nodeStart[inode]
+            pieces = self.order[start : start + self._nodeCount[inode]]
+            for ipiece, lb_p in zip(pieces, boxDistances(p, self.pieceBoxes[pieces])):
+                if lb_p > limit or lb_p >= best:
+                    continue
+                if vertex is None:
+                    vertex = Part.Vertex(App.Vector(*p))
+                d = vertex.distToShape(self.pieces[ipiece])[0]
+                if d < best:
+                    best = d
+                    if best < DistConfusion:
+                        return best
+        return best if best <= limit else float('inf')
+
+    def nearest(self, point, tolerance = DistConfusion):
+        '''nearest(point, tolerance = DistConfusion): finds pieces (faces, free edges, free vertices) 
+        nearest to point. Solids are not considered, so a point inside is projected onto the 
+        boundary. Returns (distance, list of indexes into self.pieces), where the list has all 
+        pieces not farther than distance + tolerance, nearest first.'''
+        if len(self.nodeBoxes) == 0:
+            return (float('inf'), [])
+        p = numpy.array(tuple(point), dtype= numpy.float64)
+        vertex = Part.Vertex(App.Vector(*p))
+        best = float('inf')
+        found = [] # list of (distance, piece index)
+        heap = [(float(boxDistances(p, self.nodeBoxes[0])), 0)]
+        while heap:
+            lb, inode = heapq.heappop(heap)
+            if lb > best + tolerance:
+                break
+            children = self._nodeChildren[inode]
+            if children is not None:
+                for ich in children:
+                    lb_ch = float(boxDistances(p, self.nodeBoxes[ich]))
+                    if lb_ch <= best + tolerance:
+                        heapq.heappush(heap, (lb_ch, ich))
+                continue
+            start = self._nodeStart[inode]
+            pieces = self.order[start : start + self._nodeCount[inode]]
+            for ipiece, lb_p in zip(pieces, boxDistances(p, self.pieceBoxes[pieces])):
+                if lb_p > best + tolerance:
+                    continue
+                d = vertex.distToShape(self.pieces[ipiece])[0]
+                found.append((d, int(ipiece)))
+                best = min(best, d)
+        found.sort()
+        return (best, [ipiece for d, ipiece in found if d <= best + tolerance])
+
+    def distances(self, points, limit = float('inf')):
+        '''distances(points, limit = inf): distance() for an array of points (N,3). Points 
+        whose bounding-box distance to the whole shape exceeds limit are rejected in one go.'''
+        points = numpy.asarray(points, dtype= numpy.float64).reshape(-1, 3)
+        result = numpy.full(len(points), numpy.inf)
+        if len(self.nodeBoxes) > 0:
+            candidates = numpy.nonzero(boxDistances(points, self.nodeBoxes[0]) <= limit)[0]
+        else:
+            candidates = numpy.arange(len(points))
+        for i in candidates:
+            result[i] = self.distance(points[i], limit)
+        return result
+
+
+def insideFlags(shape, points, tolerance = DistConfusion):
+    '''insideFlags(shape, points, tolerance = DistConfusion): tells which points (N,3) are 
+    inside solids of the shape (points on the boundary count as inside). Returns a bool array. 
+    Points are classified by BRepClass3d (isInside) only if they are within a solid's bounding box.'''
+    points = numpy.asarray(points, dtype= numpy.float64).reshape(-1, 3)
+    solids = shape.Solids
+    if len(solids) == 0:
+        raise ValueError("Shape has no solids, can't tell inside from outside")
+    flags = numpy.zeros(len(points), dtype= bool)
+    for solid in solids:
+        candidates = numpy.nonzero(~flags & (boxDistances(points, _box(solid)) == 0.0))[0]
+        for i in candidates:
+            flags[i] = solid.isInside(App.Vector(*points[i]), tolerance, True)
+    return flags
+
+def _insideFlagsJob(points, shape, tolerance):
+    # lattice2Parallel.mapShapeQuery job for insideFlags
+    return insideFlags(shape, points, tolerance).tolist()
+
+def insideFlagsParallel(shape, points, tolerance = DistConfusion, parallel = True):
+    '''insideFlagsParallel(shape, points, tolerance = DistConfusion, parallel = True): same as 
+    insideFlags, but splits the points among worker processes (see lattice2Parallel).'''
+    if not parallel:
+        return insideFlags(shape, points, tolerance)
+    points = numpy.asarray(points, dtype= numpy.float64).reshape(-1, 3)
+    flags = lattice2Parallel.mapShapeQuery(_insideFlagsJob, shape, points.tolist(), (tolerance,))
+    return numpy.array(flags, dtype= bool).reshape(-1)
+
+_sharedIndex = None # (shape, ShapeIndex), index of the shape last used by a job in this process
+
+def sharedIndex(shape):
+    '''sharedIndex(shape): ShapeIndex of shape, kept for as long as jobs come with the same shape 
+    object (see lattice2Parallel.sharedShape, which gives the same object for the same BREP).'''
+    global _sharedIndex
+    if _sharedIndex is None or _sharedIndex[0] is not shape:
+        _sharedIndex = (shape, ShapeIndex(shape))
+    return _sharedIndex[1]
+
+def _distancesJob(points, shape, limit):
+    # lattice2Parallel.mapShapeQuery job for distancesParallel
+    return sharedIndex(shape).distances(points, limit).tolist()
+
+def distancesParallel(index, points, limit = float('inf'), parallel = True):
+    '''distancesParallel(index, points, limit = inf, parallel = True): same as index.distances(points, limit), 
+    but splits the points among worker processes (see lattice2Parallel). Each worker builds its 
+    own index of index.shape.'''
+    points = numpy.asarray(points, dtype= numpy.float64).reshape(-1, 3)
+    if lattice2Parallel.chunkCount(len(points), parallel) <= 1:
+        return index.distances(points, limit)
+    dists = lattice2Parallel.mapShapeQuery(_distancesJob, index.shape, points.tolist(), (limit,))
+    return numpy.array(dists, dtype= numpy.float64).reshape(-1)
@@ -0,0 +1,181 @@
+#***************************************************************************
+#*                                                                         *
+#*   Copyright (c) 2026 - Victor Titov (DeepSOIC)                          *
+#*                                               <vv.titov@gmail.com>      *  
+#*                                                                         *
+#*   This program is free software; you can redistribute it and/or modify  *
+#*   it under the terms of the GNU Lesser General Public License (LGPL)    *
+#*   as published by the Free Software Foundation; either version 2 of     *
+#*   the License, or (at your option) any later version.                   *
+#*   for detail see the LICENCE text file.                                 *
+#*                                                                         *
+#*   This program is distributed in the hope that it will be useful,       *
+#*   but WITHOUT ANY WARRANTY; without even the implied warranty of        *
+#*   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the         *
+#*   GNU Library General Public License for more details.                  *
+#*                                                                         *
+#*   You should have received a copy of the GNU Library General Public     *
+#*   License along with this program; if not, write to the Free Software   *
+#*   Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  *
+#*   USA                                                                   *
+#*                                                                         *
+#***************************************************************************
+
+__title__="ShapeStore module for Lattice2"
+__author__ = "DeepSOIC"
+__url__ = ""
+__doc__ = "On-disk storage of children of series features, for making the result without holding all of them in memory"
+
+# A store is deleted when its feature is deleted, or recomputed with OutputMode 'Shapes'. 
+# Stores left behind by closed documents are deleted least recently used first, when the 
+# total size exceeds the limit of the result cache (see lattice2ResultCache.sizeLimit). Stores 
+# of open documents are never trimmed, as their features may still read them (getChild).
+
+import os
+import shutil
+
+import FreeCAD as App
+import Part
+
+from lattice2Common import DistConfusion
+
+_paramPath = "User parameter:BaseApp/Preferences/Mod/Lattice2/ResultCache"
+
+def storeDirectory(feature):
+    '''storeDirectory(feature): returns directory to store children of a series feature in. It is 
+    in user cache directory, unique per document (by Uid) and feature, so it survives restarts.'''
+    return os.path.join(_rootDirectory(), feature.Document.Uid, feature.Name)
+
+def _rootDirectory():
+    root = App.ParamGet(_paramPath).GetString("Directory", "")
+    if not root:
+        root = App.getUserCachePath() if hasattr(App, 'getUserCachePath') else App.getUserAppDataDir()
+        root = os.path.join(root, 'Lattice2')
+    return os.path.join(root, 'SeriesOutput')
+
+class ShapeStore(object):
+    '''ShapeStore(path): numbered shapes stored as BREP files in a directory.'''
+    def __init__(self, path):
+        self.path = path
+    
+    def clear(self):
+        '''clear(): removes all shapes, and (re)creates the directory.'''
+        self.remove()
+        os.makedirs(self.path)
+    
+    def remove(self):
+        '''remove(): deletes the directory with all shapes.'''
+        if os.path.isdir(self.path):
+            shutil.rmtree(self.path, ignore_errors= True)
+    
+    def _file(self, index):
+        return os.path.join(self.path, '{i}.brep'.format(i= index))
+    
+    def put(self, index, shape):
+        '''put(index, shape): stores a shape. shape can be a Part.Shape, or a BREP string.'''
+        if isinstance(shape, str):
+            with open(self._file(index), 'w') as f:
+                f.write(shape)
+        else:
+            shape.exportBrep(self._file(index))
+    
+    def get(self, index):
+        '''get(index): reads a shape back.'''
+        path = self._file(index)
+        if not os.path.isfile(path):
+            raise KeyError("Child {i} is not in store {path}. Recompute the feature.".format(i= index, path= self.path))
+        sh = Part.Shape()
+        sh.importBrep(path)
+        os.utime(path, None) # for trim to see the store as recently used
+        return sh
+    
+    def makeCompound(self, count):
+        '''makeCompound(count): returns a compound of shapes 0..count-1, reading them one by one.'''
+        return Part.makeCompound([self.get(i) for i in range(count)])
+    
+    def makeBoundBoxes(self, count):
+        '''makeBoundBoxes(count): returns a compound of boxes of shapes 0..count-1, as stand-ins for 
+        display. Only one shape is in memory at a time.'''
+        boxes = []
+        for i in range(count):
+            bb = self.get(i).BoundBox
+            boxes.append(_makeBox(bb))
+        return Part.makeCompound(boxes)
+
+def _makeBox(bb):
+    # box from BoundBox, tolerating flat boxes (which Part.makeBox refuses to make)
+    if bb.XLength > DistConfusion and bb.YLength > DistConfusion and bb.ZLength > DistConfusion:
+        return Part.makeBox(bb.XLength, bb.YLength, bb.ZLength, App.Vector(bb.XMin, bb.YMin, bb.ZMin))
+    edges = []
+    for i in range(12):
+        edge = bb.getEdge(i)
+        if (edge[1] - edge[0]).Length > DistConfusion:
+            edges.append(Part.LineSegment(edge[0], edge[1]).toShape())
+    if len(edges) == 0:
+        return Part.Vertex(App.Vector(bb.XMin, bb.YMin, bb.ZMin))
+    return Part.makeCompound(edges)
+
+def forFeature(feature):
+    '''forFeature(feature): returns ShapeStore of a series feature.'''
+    return ShapeStore(storeDirectory(feature))
+
+def trim(limit = None, keep = None):
+    '''trim(limit = None, keep = None): deletes least recently used stores of documents that aren't open, 
+    until total size of stores is within limit (the limit of the result cache, if None). keep is the 
+    path of a store not to delete.'''
+    if limit is None:
+        import lattice2ResultCache
+        limit = lattice2ResultCache.sizeLimit()
+    root = _rootDirectory()
+    if not os.path.isdir(root):
+        return
+    stores = [] # (time of last use, size, path)
+    for doc_dir in os.listdir(root):
+        for name in os.listdir(os.path.join(root, doc_dir)):
+            path = os.path.join(root, doc_dir, name)
+            stats = [os.stat(os.path.join(path, f)) for f in os.listdir(path)]
+            stores.append((max([st.st_mtime for st in stats] + [os.stat(path).st_mtime]), sum(st.st_size for st in stats), path))
+    total = sum(rec[1] for rec in stores)
+    stores.sort()
+    open_uids = set(doc.Uid for doc in App.listDocuments().values())
+    for mtime, size, path in stores:
+        if total <= limit:
+            break
+        if keep is not None and os.path.normpath(path) == os.path.normpath(keep):
+            continue
+        if os.path.basename(os.path.dirname(path)) in open_uids:
+            continue
+        ShapeStore(path).remove()
+        total -= size
+    for doc_dir in os.listdir(root):
+        if len(os.listdir(os.path.join(root, doc_dir))) == 0:
+            os.rmdir(os.path.join(root, doc_dir))
+
+def getChild(feature, index):
+    '''getChild(feature, index): returns index-th child of a series feature, that keeps its children 
+    in a store (OutputMode other than 'Shapes'). For other features, returns child of the shape.'''
+    if getattr(feature, 'OutputMode', 'Shapes') == 'Shapes':
+        return feature.Shape.childShapes()[index]
+    return forFeature(feature).get(index)
+
+
+class _DocumentObserver(object):
+    def slotDeletedObject(self, obj):
+        try:
+            if getattr(obj, 'OutputMode', 'Shapes') == 'Shapes':
+                return
+            path = storeDirectory(obj)
+        except Exception:
+            return
+        ShapeStore(path).remove()
+
+_observer = None
+
+def _assureObserver():
+    global _observer
+    if _observer is None:
+        _observer = _DocumentObserver()
+        App.addDocumentObserver(_observer)
+
+# stores are to be deleted with their features, including ones not recomputed in this session
+_assureObserver()
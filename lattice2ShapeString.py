@@ -25,7 +25,6 @@
 from lattice2Common import *
 import lattice2BaseFeature
 import lattice2Executer
-import lattice2CompoundExplorer as LCE
 from lattice2BoundBox import getPrecisionBoundBox #needed for alignment
 
 import lattice2Markers as markers
@@ -174,8 +173,7 @@ class LatticeShapeString:
         else:
             if not lattice2BaseFeature.isObjectLattice(lattice):
                 lattice2Executer.warning(obj,"ShapeString's link to array must point to a lattice. It points to a generic shape. Results may be unexpected.")
-            leaves = LCE.AllLeaves(lattice.Shape)
-            plms = [leaf.Placement for leaf in leaves]
+            plms = lattice2BaseFeature.getPlacementsList(lattice, obj, suppressWarning= True)
         
         #update foolObj's properties
         self.makeFoolObj(obj) #make sure we have one - fixes defunct Lattice ShapeString after save-load
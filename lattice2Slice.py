@@ -22,7 +22,9 @@
 #***************************************************************************
 
 from lattice2Common import *
+import lattice2BaseFeature
 import lattice2CompoundExplorer as LCE
+import lattice2Parallel
 
 __title__="LatticeSlice module for FreeCAD"
 __author__ = "DeepSOIC"
@@ -41,6 +43,62 @@ def makeLatticeSlice(name):
 def float_fuzzy_equal(v1, v2, rel_tol):
     return abs(v1-v2) <= (abs(v1)+abs(v2))*0.5*rel_tol
 
+def boxesOverlap(bb1, bb2):
+    '''boxesOverlap(bb1, bb2): True if bounding boxes intersect (with confusion tolerance).'''
+    bb1 = FreeCAD.BoundBox(bb1)
+    bb1.enlarge(DistConfusion)
+    return bb1.intersect(bb2)
+
+def slicePiece(piece, cutter):
+    '''slicePiece(piece, cutter): slices piece with a solid. Returns list of resulting pieces.'''
+    if not boxesOverlap(piece.BoundBox, cutter.BoundBox):
+        return [piece]
+    pieces_1 = LCE.AllLeaves(piece.cut(cutter))
+    pieces_2 = LCE.AllLeaves(piece.common(cutter))
+    # when cutting with shells, and object doesn't intersect cutter, duplicates are sometimes produced. This is probably as occ bug. 
+    # But we can filter the duplicates out. The trick is to test, if the result of a cut is the same as the original, which can be done by simply comparing masses.
+    pieces_12 = pieces_1+pieces_2
+    all_same = True
+    for piece_test in pieces_12:
+        if float_fuzzy_equal(piece_test.Mass, piece.Mass, 1e-9):
+            # piece doesn't intersect cutter (probably).
+            # this test may fail, if the piece cut off by the cutter is very small.... So we discard cut result only if all masses are equal (no smaller objects are found)
+            pass
+        else:
+            all_same = False
+            break
+    if all_same:
+        #the object doesn't intersect with cutter. Special processing, to remove duplicates if we are cutting with shells.
+        return [piece]
+    else:
+        return pieces_1 + pieces_2
+
+def splitPiece(piece, cutters):
+    '''splitPiece(piece, cutters): slices piece with all cutters (solids) at once, by general fuse. Returns list of resulting pieces.'''
+    cutters = [cutter for cutter in cutters if boxesOverlap(piece.BoundBox, cutter.BoundBox)]
+    if len(cutters) == 0:
+        return [piece]
+    gf_result, gf_map = piece.generalFuse(cutters)
+    pieces = []
+    for fragment in gf_map[0]:
+        pieces += LCE.AllLeaves(fragment)
+    return pieces
+
+def _slicePiecesJob(pieces, cutter):
+    # lattice2Parallel job: slicePiece over a chunk of pieces. Shapes travel as BREP strings.
+    cutter = lattice2Parallel.sharedShape(cutter)
+    return [[lattice2Parallel.shapeToBrep(sh) for sh in slicePiece(lattice2Parallel.shapeFromBrep(piece), cutter)] for piece in pieces]
+
+def _splitPiecesJob(pieces, cutters):
+    # lattice2Parallel job: splitPiece over a chunk of pieces.
+    cutters = [lattice2Parallel.sharedShape(cutter) for cutter in cutters]
+    return [[lattice2Parallel.shapeToBrep(sh) for sh in splitPiece(lattice2Parallel.shapeFromBrep(piece), cutters)] for piece in pieces]
+
+def _mapPieces(job, pieces, shared):
+    # runs job over pieces in worker processes, returns list of lists of resulting pieces, one list per piece
+    result = lattice2Parallel.mapChunks(job, [lattice2Parallel.shapeToBrep(piece) for piece in pieces], shared= shared)
+    return [[lattice2Parallel.shapeFromBrep(brep) for brep in breps] for breps in result]
+
 class LatticeSlice:
     "The LatticeSlice object"
     def __init__(self,obj):
@@ -48,14 +106,19 @@ class LatticeSlice:
         obj.addProperty("App::PropertyLink","Base","LatticeSlice","Object to slice. Can be almost anything, including invalid compounds.")
         obj.addProperty("App::PropertyLink","Tool","LatticeSlice","Slicer object. Must be a solid, or a face/shell. If compound, children will be used for successive slices.")
         obj.addProperty("App::PropertyBool","Refine","LatticeSlice","True = refine resulting shape. False = output as is.")
+        self.assureProperties(obj)
 
         obj.Proxy = self
         
+    def assureProperties(self, obj):
+        lattice2BaseFeature.assureProperty(obj, "App::PropertyEnumeration", "Algorithm", ["Successive", "Splitter"], "LatticeSlice", "Successive: slice with one cutter at a time. Splitter: split each piece by all cutters in one general fuse (faster for many cutters).")
+        lattice2BaseFeature.assureProperty(obj, "App::PropertyBool", "Parallel", False, "LatticeSlice", "Slice pieces in worker processes.")
 
     def execute(self,obj):
+        self.assureProperties(obj)
         rst = []
-        pieces = LCE.AllLeaves(screen(obj.Base).Shape)
-        cutters = LCE.AllLeaves(screen(obj.Tool).Shape)
+        pieces = lattice2BaseFeature.getLeaves(screen(obj.Base))
+        cutters = lattice2BaseFeature.getLeaves(screen(obj.Tool))
         # prepare cutter shapes by converting them to solids
         cutters_solids = []
         for cutter in cutters:
@@ -68,30 +131,22 @@ class LatticeSlice:
                 cutters_solids.append(cutter)
             else:
                 raise TypeError("Cannot slice with shape of type '{typ}'".format(typ= cutter.ShapeType))
-        # cut everything successively with one cutter at a time
-        for cutter in cutters_solids:
-            pieces_old = pieces
-            pieces = []
-            for piece in pieces_old:
-                pieces_1 = LCE.AllLeaves(piece.cut(cutter))
-                pieces_2 = LCE.AllLeaves(piece.common(cutter))
-                # when cutting with shells, and object doesn't intersect cutter, duplicates are sometimes produced. This is probably as occ bug. 
-                # But we can filter the duplicates out. The trick is to test, if the result of a cut is the same as the original, which can be done by simply comparing masses.
-                pieces_12 = pieces_1+pieces_2
-                all_same = True
-                for piece_test in pieces_12:
-                    if float_fuzzy_equal(piece_test.Mass, piece.Mass, 1e-9):
-                        # piece doesn't intersect cutter (probably).
-                        # this test may fail, if the piece cut off by the cutter is very small.... So we discard cut result only if all masses are equal (no smaller objects are found)
-                        pass
-                    else:
-                        all_same = False
-                        break
-                if all_same:
-                    #the object doesn't intersect with cutter. Special processing, to remove duplicates if we are cutting with shells.
-                    pieces += [piece]
+        if obj.Algorithm == 'Splitter':
+            # split every piece by all cutters at once
+            if obj.Parallel:
+                pieces = sum(_mapPieces(_splitPiecesJob, pieces, ([lattice2Parallel.shapeToBrep(cutter) for cutter in cutters_solids],)), [])
+            else:
+                pieces = [sh for piece in pieces for sh in splitPiece(piece, cutters_solids)]
+        else:
+            # cut everything successively with one cutter at a time
+            for cutter in cutters_solids:
+                if obj.Parallel:
+                    # pieces the cutter misses don't need to be sent to workers
+                    hit = [boxesOverlap(piece.BoundBox, cutter.BoundBox) for piece in pieces]
+                    sliced = iter(_mapPieces(_slicePiecesJob, [piece for piece, h in zip(pieces, hit) if h], (lattice2Parallel.shapeToBrep(cutter),)))
+                    pieces = [sh for piece, h in zip(pieces, hit) for sh in (next(sliced) if h else [piece])]
                 else:
-                    pieces += pieces_1 + pieces_2
+                    pieces = [sh for piece in pieces for sh in slicePiece(piece, cutter)]
         if obj.Refine:
             pieces_old = pieces
             pieces = []
@@ -73,7 +73,7 @@ def traverseCompound(compound, traversal):
         return compound.childShapes()
     elif traversal == 'Compound leaves':
         import lattice2CompoundExplorer as LCE
-        return LCE.allLeaves(compound)
+        return LCE.AllLeaves(compound)
 
 element_extractors = {
     "Vertex": (lambda sh: sh.Vertexes),
@@ -104,6 +104,44 @@ def getIndexesIntoList(element, list_of_shapes):
                 if i_el * 2 > len(elements):
                     i_el = i_el - len(elements)
                 yield (i_sh, element_type_string, i_el)
+
+class ElementIndex(object):
+    """ElementIndex(compound, traversal, element_type_string): lookup tables of elements of a 
+    compound, to replace scanning with isEqual/isSame. Maps element to its index in the whole 
+    compound, and to (child index, index within child) pairs."""
+    def __init__(self, compound, traversal, element_type_string):
+        extractor = element_extractors[element_type_string]
+        self.element_type_string = element_type_string
+        self.children = traverseCompound(compound, traversal)
+        self.child_elements = [extractor(child) for child in self.children]
+        elements = extractor(compound)
+        self.global_index = dict([(HashableShape(elements[i]), i) for i in range(len(elements))])
+        self.local_index = {} # HashableShape -> list of (i_child, i_el)
+        for i_sh in range(len(self.child_elements)):
+            for i_el, element in enumerate(self.child_elements[i_sh]):
+                self.local_index.setdefault(HashableShape(element), []).append((i_sh, i_el))
+    
+    def findInChildren(self, element):
+        """findInChildren(element): same as getIndexesIntoList(element, children), but uses the index.
+        Generator of (index_into_children, element_type_string, subelement_index)."""
+        for i_sh, i_el in self.local_index.get(HashableShape(element), []):
+            elements = self.child_elements[i_sh]
+            if elements[i_el].isEqual(element):
+                # to make link more robust, use negative index if one is closer to the end
+                if i_el * 2 > len(elements):
+                    i_el = i_el - len(elements)
+                yield (i_sh, self.element_type_string, i_el)
+    
+    def globalIndex(self, element):
+        """globalIndex(element): index of element in the whole compound (0-based)."""
+        return self.global_index[HashableShape(element)]
+
+def getElementIndex(object, traversal, element_type_string):
+    """getElementIndex(object, traversal, element_type_string): returns ElementIndex of object's shape, 
+    cached until the shape changes (see lattice2Memo)."""
+    import lattice2Memo as Memo
+    return Memo.memoize(object, 'ElementIndex '+traversal+' '+element_type_string, 
+        lambda: ElementIndex(object.Shape, traversal, element_type_string))
 # -----------------------</HELPER STUFF>-----------------------
 
 # -------------------<LINK TYPE CONVERSION>--------------------
@@ -162,7 +200,6 @@ def Subsequence_basic(link, traversal, loop):
     
     # extract shapes of the array
     compound = link[0].Shape
-    children = traverseCompound(compound, traversal)
 
     # parse link string. Input: element_string. Output: element_shape, element_type_string
     element_string = link[1]
@@ -177,6 +214,7 @@ def Subsequence_basic(link, traversal, loop):
         # raise ValueError("Subelement string format not recognized")
         # resort to generic FreeCAD method
         element_shape = compound.getElement(element_string)
+        element_type_string = element_shape.ShapeType
     else:
         # use negative-index-aware method
         #extract index from string:
@@ -184,21 +222,20 @@ def Subsequence_basic(link, traversal, loop):
         element_shape = element_extractors[element_type_string](compound)[index]
     
     # convert global element index to index in child 
-    i_first_child, element_type_string, i_in_child = next(getIndexesIntoList(element_shape, children))
+    element_index = getElementIndex(link[0], traversal, element_type_string)
+    children = element_index.children
+    i_first_child, element_type_string, i_in_child = next(element_index.findInChildren(element_shape))
     if loop == 'All from first':
         i_first_child = 0
     
-    elements = element_extractors[element_type_string](compound) 
-    index_dict = dict([(HashableShape(elements[i]), i) for i in range(len(elements))])
-    
     # find the element in each child, find out its global index, and output result in a form of a string for a link
     ret = [] #list of tuples (object, subelement_string)
     for i in range(    len(children) if loop != 'Till end' else len(children) - i_first_child    ):
         i_child = (i + i_first_child) % len(children)
-        element = element_extractors[element_type_string](children[i_child])[i_in_child]
+        element = element_index.child_elements[i_child][i_in_child]
         ret.append((
             link[0],
-            element_type_string + str(index_dict[HashableShape(element)]+1)
+            element_type_string + str(element_index.globalIndex(element)+1)
         ))
     return ret
 
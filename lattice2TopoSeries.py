@@ -27,6 +27,7 @@ __url__ = ""
 __doc__ = "Lattice TopoSeries feature: generates series of shapes by subsequencing sublinks"
 
 import math
+import os
 
 import FreeCAD as App
 import Part
@@ -34,7 +35,12 @@ import Part
 from lattice2Common import *
 import lattice2BaseFeature
 import lattice2Executer as Executer
+import lattice2LinkIndex as LinkIndex
 import lattice2Markers as markers
+import lattice2Parallel
+import lattice2ResultCache as ResultCache
+import lattice2ShadowDocument as ShadowDocument
+import lattice2ShapeStore as ShapeStore
 import lattice2Subsequencer as Subsequencer
 
 # --------------------------- general routines ------------------------------------------------
@@ -42,28 +48,80 @@ import lattice2Subsequencer as Subsequencer
 def findAllLinksTo(doc_obj, exclude = []):
     """findAllLinksTo(doc_obj): finds all link properties pointing to supplied object. 
     Returns them as list of tuples (dependent_object_name, property_name). Does not include 
-    expression links."""
-    ret = []
-    doc = doc_obj.Document
-    for obj in set(doc_obj.InList): # InList sometimes reports same object multiple times. Wrapping with set() removes the duplicates. 
-        if obj in exclude:
-            continue
-        for prop_name in obj.PropertiesList:
-            typ = obj.getTypeIdOfProperty(prop_name)
-            if typ == 'App::PropertyLink':
-                if readProperty(doc, obj.Name, prop_name) is doc_obj:
-                    ret.append((obj.Name, prop_name))
-            elif typ == 'App::PropertyLinkList':
-                if doc_obj in readProperty(doc, obj.Name, prop_name):
-                    ret.append((obj.Name, prop_name))
-            elif typ == 'App::PropertyLinkSub':
-                val = readProperty(doc, obj.Name, prop_name)
-                if val is not None   and   doc_obj is val[0]:
-                    ret.append((obj.Name, prop_name))
-            elif typ == 'App::PropertyLinkSubList':
-                if doc_obj in [tup[0] for tup in readProperty(doc, obj.Name, prop_name)]:
-                    ret.append((obj.Name, prop_name))
+    expression links. Uses the link index of the document (see lattice2LinkIndex)."""
+    return LinkIndex.linksTo(doc_obj, exclude= exclude)
+    
+def makeSubsequence(object_to_loop, cycle_mode, exclude = [], verbose = False):
+    """makeSubsequence(object_to_loop, cycle_mode, exclude = [], verbose = False): subsequences all 
+    links to object_to_loop. Returns tuple (n_seq, subs_linkdict), see Subsequencer.Subsequence_LinkDict."""
+    if not lattice2BaseFeature.hasCompleteMarkers(object_to_loop):
+        # links refer to elements of the marker compound, which doesn't have all the placements
+        raise ValueError("Markers of {obj} don't cover all placements. Recompute {obj} (it makes complete markers when used by other objects), or set its Markers to 'All'."
+                         .format(obj= object_to_loop.Label))
+    # gather up the links
+    links = findAllLinksTo(object_to_loop, exclude= exclude)
+    if verbose:
+        print ("All links to {feature}:\n    {links}"
+               .format(feature= object_to_loop.Document.Name+"."+object_to_loop.Name,
+                       links= "\n    ".join([link[0]+"."+link[1] for link in links])      )    )
+    
+    # subsequencing
+    # prepare dict of link values
+    linkdict = {} #key is tuple (object_name, property_name). Value is the value of property.
+    for link in links:
+        link_val = readProperty(object_to_loop.Document, link[0], link[1])
+        linkdict[link] = link_val
+    # do the subsequencing
+    ret = Subsequencer.Subsequence_LinkDict(
+                              linkdict, 
+                              loop= ('Till end' if cycle_mode == 'Open' else 'All around'), 
+                              object_filter= [object_to_loop]                             )
+    if verbose:
+        print ("Subsequence made. Length: {n_seq}".format(n_seq= ret[0]))
+        print ("Links subsequenced: \n    {links}"
+               .format(links= "\n    ".join([link[0]+"."+link[1] for link in ret[1].keys()]))   )
     return ret
+
+def computeIndex(doc, subs_linkdict, i, object, closure):
+    """computeIndex(doc, subs_linkdict, i, object, closure): sets links to i-th item of subsequence, 
+    recomputes objects affected by the links (closure, see lattice2ShadowDocument.dependentClosure), 
+    and returns a copy of shape of the object. Returns None if recompute failed."""
+    for key in subs_linkdict:
+        writeProperty(doc, key[0], key[1], subs_linkdict[key][i])
+    if not ShadowDocument.recomputeClosure(doc, closure):
+        return None
+    return object.Shape.copy()
+
+def linkHolders(subs_linkdict):
+    """linkHolders(subs_linkdict): returns names of objects whose links are subsequenced."""
+    return list(set(key[0] for key in subs_linkdict))
+
+_workerSubsequence = None # (document, n_seq, subs_linkdict, closure), subsequence made in worker process for its copy of the document
+
+def _computeIndicesJob(indices, filename, object_to_take_name, object_to_loop_name, cycle_mode):
+    # lattice2Parallel job: computeIndex for a shard of subsequence indices. Returns BREP strings (or None for failures).
+    global _workerSubsequence
+    doc = lattice2Parallel.sharedDocument(filename)
+    if _workerSubsequence is None or _workerSubsequence[0] is not doc:
+        # subsequence once per document copy: computeIndex rewrites the links, so they can't be read again later
+        n_seq, subs_linkdict = makeSubsequence(doc.getObject(object_to_loop_name), cycle_mode)
+        closure = ShadowDocument.dependentClosure(doc, linkHolders(subs_linkdict), doc.getObject(object_to_take_name))
+        _workerSubsequence = (doc, n_seq, subs_linkdict, closure)
+    doc, n_seq, subs_linkdict, closure = _workerSubsequence
+    obj = doc.getObject(object_to_take_name)
+    result = []
+    for i in indices:
+        shape = computeIndex(doc, subs_linkdict, i, obj, closure)
+        result.append(None if shape is None else lattice2Parallel.shapeToBrep(shape))
+    return result
+    
+def _linkValueRepr(value):
+    # link value with objects replaced by their names, for making cache keys
+    if hasattr(value, 'isDerivedFrom'):
+        return value.Name
+    if isinstance(value, (list, tuple)):
+        return tuple(_linkValueRepr(v) for v in value)
+    return value
     
 def readProperty(doc, object_name, property_name):
     return getattr(doc.getObject(object_name), property_name)
@@ -93,37 +151,30 @@ class LatticeTopoSeries(lattice2BaseFeature.LatticeFeature):
         obj.Recomputing = ["Disabled", "Recompute Once", "Enabled"]
         obj.Recomputing = "Disabled" # recomputing TopoSeries can be very long, so disable it by default
         
-    def makeSubsequence(self, selfobj, object_to_loop):
+        self.assureProperties(obj)
         
-        # gather up the links
-        links = findAllLinksTo(object_to_loop, exclude= [selfobj])
-        if self.isVerbose():
-            print ("All links to {feature}:\n    {links}"
-                   .format(feature= object_to_loop.Document.Name+"."+object_to_loop.Name,
-                           links= "\n    ".join([link[0]+"."+link[1] for link in links])      )    )
+    def assureProperties(self, obj):
+        '''Adds properties that can be missing on objects made with earlier version of Lattice2.'''
+        self.assureProperty(obj, "App::PropertyBool", "Parallel", False, "Lattice TopoSeries", 
+            "Compute items in worker processes (number of workers is set in preferences). The temporary document is saved to a file for them; xlinks with relative paths may break.")
+        self.assureProperty(obj, "App::PropertyBool", "CacheResults", False, "Lattice TopoSeries", 
+            "Keep computed shapes in a disk cache, and reuse them for items whose links, and the objects they are computed from, haven't changed.")
+        self.assureProperty(obj, "App::PropertyEnumeration", "OutputMode", ["Shapes", "Streamed", "Bounding boxes"], "Lattice TopoSeries", 
+            "Shapes: children are collected in memory. Streamed: children are written to disk as they are computed, and the compound "
+            "is assembled from there; this saves memory during the recompute only, as the result holds all children just the same. "
+            "Bounding boxes: same, but the shape gets boxes in place of children, so the children stay out of memory; use this to save memory. "
+            "Other features see the boxes, not the "
+            "children; the children can only be read back by macros, with lattice2ShapeStore.getChild. The stored children are deleted when the "
+            "feature is deleted or recomputed in 'Shapes' mode.")
         
-        # subsequencing
-        # prepare dict of link values
-        linkdict = {} #key is tuple (object_name, property_name). Value is the value of property.
-        for link in links:
-            link_val = readProperty(object_to_loop.Document, link[0], link[1])
-            linkdict[link] = link_val
-        # do the subsequencing
-        ret = Subsequencer.Subsequence_LinkDict(
-                                  linkdict, 
-                                  loop= ('Till end' if selfobj.CycleMode == 'Open' else 'All around'), 
-                                  object_filter= [object_to_loop]                             )
-        if self.isVerbose():
-            print ("Subsequence made. Length: {n_seq}".format(n_seq= ret[0]))
-            print ("Links subsequenced: \n    {links}"
-                   .format(links= "\n    ".join([link[0]+"."+link[1] for link in ret[1].keys()]))   )
-        return ret
-
+    def makeSubsequence(self, selfobj, object_to_loop):
+        return makeSubsequence(object_to_loop, selfobj.CycleMode, exclude= [selfobj], verbose= self.isVerbose())
     
     def isVerbose(self):
         return True
     
     def derivedExecute(self,selfobj):
+        self.assureProperties(selfobj)
         
         if selfobj.Recomputing == "Disabled":
             raise ValueError(selfobj.Name+": recomputing of this object is currently disabled. Modify 'Recomputing' property to enable it.")
@@ -142,93 +193,73 @@ class LatticeTopoSeries(lattice2BaseFeature.LatticeFeature):
                 progress.setModal(True)
                 progress.show()
             
-            doc1 = selfobj.Document
-            doc2 = App.newDocument() #create temporary doc to do the computations
+            store = None
+            if selfobj.OutputMode != 'Shapes':
+                # children go to disk as they are computed, not to accumulate in memory
+                store = ShapeStore.forFeature(selfobj)
+                store.clear()
+            else:
+                ShapeStore.forFeature(selfobj).remove()
             
-            # assign doc's filename before copying objects, otherwise we get errors with xlinks
-            try:
-                doc2.FileName = doc1.FileName
-            except Exception as err:
-                pass #in old FreeCADs, FileName property is read-only, we can safely ignore that
-            object_to_take_in_doc2 = None # define the variable, to prevent del() in finally block from raising another error
-            object_to_loop_in_doc2 = None
-            try:
-                if self.isVerbose():
-                    print ("Copying object with dependencies to a temporary document...")
-
-                doc2.copyObject(screen(selfobj.ObjectToTake), True)
-                
-                if self.isVerbose():
-                    print ("Enabling nested para/toposeries, if any...")
-                #if there are nested para/toposeries in the dependencies, make sure to enable them
-                for objd2 in doc2.Objects:
-                    if hasattr(objd2,"Recomputing"):
-                        try:
-                            objd2.Recomputing = "Enabled"
-                            objd2.purgeTouched()
-                        except exception:
-                            Executer.warning(selfobj,"Failed to enable recomputing of "+objd2.Name)
-                
-                object_to_take_in_doc2 = doc2.getObject(screen(selfobj.ObjectToTake).Name)
-                object_to_loop_in_doc2 = doc2.getObject(screen(selfobj.ObjectToLoopOver).Name)
-                if bGui:
-                    progress.setValue(1)
-                    
-                if self.isVerbose():
-                    print ("Repeating subsequencing in temporary document...")
-                n_seq, subs_linkdict = self.makeSubsequence(selfobj, object_to_loop_in_doc2)                
-                
-                output_shapes = []
+            results = [None] * n_seq # shape for each item, or True if it is in store. None if not computed (yet).
+            def accept(i, shape):
+                # shape is a Part.Shape or a BREP string
+                if store is not None:
+                    store.put(i, shape)
+                    results[i] = True
+                else:
+                    results[i] = lattice2Parallel.shapeFromBrep(shape) if isinstance(shape, str) else shape
+            
+            # reuse results cached by earlier recomputes
+            keys = None
+            if selfobj.CacheResults:
+                obj_to_take = screen(selfobj.ObjectToTake)
+                graph_hash = ResultCache.graphHash([obj_to_take] + obj_to_take.OutListRecursive)
+                keys = [ResultCache.makeKey(graph_hash, i, sorted((key, _linkValueRepr(subs_linkdict[key][i])) for key in subs_linkdict)) 
+                        for i in range(n_seq)]
                 for i in range(n_seq):
-                    if self.isVerbose():
-                        print ("Computing {x}/{y}".format(x= i+1, y= n_seq))
-
-                    for key in subs_linkdict:
-                        writeProperty(doc2, key[0], key[1], subs_linkdict[key][i])
-                    
-                    #recompute
-                    doc2.recompute()
-                    
-                    #get shape
-                    shape = None
-                    for obj in doc2.Objects:
-                        if 'Invalid' in obj.State:
-                            Executer.error(obj,"Recomputing shape for subsequence index "+repr(i)+" failed.")
-                            
-                            scale = 1.0
-                            try:
-                                if not screen(selfobj.ObjectToTake).Shape.isNull():
-                                    scale = screen(selfobj.ObjectToTake).Shape.BoundBox.DiagonalLength/math.sqrt(3)
-                            except Exception:
-                                pass
-                            if scale < DistConfusion * 100:
-                                scale = 1.0
-                            shape = markers.getNullShapeShape(scale)
-                    if shape is None:
-                        shape = object_to_take_in_doc2.Shape.copy()
-                    output_shapes.append(shape)
-                    
-                    #update progress
-                    if bGui:
-                        progress.setValue(progress.value()+1)
-                        if progress.wasCanceled():
-                            raise Executer.CancelError()
-                    
+                    shape = ResultCache.get(keys[i])
+                    if shape is not None:
+                        accept(i, shape)
+            todo = [i for i in range(n_seq) if results[i] is None]
+            
+            try:
+                if len(todo) > 0:
+                    def sink(k, shape):
+                        if shape is None:
+                            return
+                        if keys is not None:
+                            ResultCache.put(keys[todo[k]], shape)
+                        accept(todo[k], shape)
+                    self.computeIndices(selfobj, todo, progress if bGui else None, sink)
+                    if keys is not None:
+                        ResultCache.trim()
             finally:
-                #delete all references, before destroying the document. Probably not required, but to be sure...
-                if self.isVerbose():
-                    print ("Cleanup...")
-
-                del(object_to_take_in_doc2)
-                del(object_to_loop_in_doc2)
-                doc2_name = doc2.Name
-                del(doc2)
-                App.closeDocument(doc2_name)
                 if bGui:
                     progress.setValue(n_seq+1)
-
-                
-            selfobj.Shape = Part.makeCompound(output_shapes)
+            
+            for i in range(n_seq):
+                if results[i] is None:
+                    Executer.error(selfobj,"Recomputing shape for subsequence index "+repr(i)+" failed.")
+                    
+                    scale = 1.0
+                    try:
+                        if not screen(selfobj.ObjectToTake).Shape.isNull():
+                            scale = screen(selfobj.ObjectToTake).Shape.BoundBox.DiagonalLength/math.sqrt(3)
+                    except Exception:
+                        pass
+                    if scale < DistConfusion * 100:
+                        scale = 1.0
+                    accept(i, markers.getNullShapeShape(scale))
+            
+            if store is None:
+                selfobj.Shape = Part.makeCompound(results)
+            elif selfobj.OutputMode == 'Bounding boxes':
+                selfobj.Shape = store.makeBoundBoxes(n_seq)
+            else:
+                selfobj.Shape = store.makeCompound(n_seq)
+            if store is not None:
+                ShapeStore.trim(keep= store.path)
 
             output_is_lattice = lattice2BaseFeature.isObjectLattice(screen(selfobj.ObjectToTake))
             if 'Auto' in selfobj.isLattice:
@@ -240,6 +271,81 @@ class LatticeTopoSeries(lattice2BaseFeature.LatticeFeature):
                 selfobj.Recomputing = "Disabled"
         return "suppress" # "suppress" disables most convenience code of lattice2BaseFeature. We do it because we build a nested array, which are not yet supported by lattice WB.
 
+    def computeIndices(self, selfobj, indices, progress, sink):
+        '''computeIndices(selfobj, indices, progress, sink): computes a copy of the object with its 
+        dependencies (see lattice2ShadowDocument) for the given indices of the subsequence. Results 
+        are passed to sink(index_in_indices, shape) as soon as they are made; shape is a Part.Shape, 
+        or a BREP string, or None if the item failed.'''
+        global _workerSubsequence
+        if self.isVerbose():
+            print ("Syncing temporary document with object and its dependencies...")
+        # temporary doc to do the computations. It is kept for next recompute.
+        doc2 = ShadowDocument.acquire(selfobj, screen(selfobj.ObjectToTake))
+        
+        subs_linkdict = {}
+        try:
+            if self.isVerbose():
+                print ("Enabling nested para/toposeries, if any...")
+            #if there are nested para/toposeries in the dependencies, make sure to enable them
+            for objd2 in doc2.Objects:
+                if hasattr(objd2,"Recomputing"):
+                    try:
+                        objd2.Recomputing = "Enabled"
+                        objd2.purgeTouched()
+                    except exception:
+                        Executer.warning(selfobj,"Failed to enable recomputing of "+objd2.Name)
+            
+            object_to_take_in_doc2 = doc2.getObject(screen(selfobj.ObjectToTake).Name)
+            object_to_loop_in_doc2 = doc2.getObject(screen(selfobj.ObjectToLoopOver).Name)
+            if progress is not None:
+                progress.setValue(1)
+                
+            if self.isVerbose():
+                print ("Repeating subsequencing in temporary document...")
+            n_seq, subs_linkdict = self.makeSubsequence(selfobj, object_to_loop_in_doc2)
+            
+            if progress is not None:
+                def reportProgress(done, total):
+                    progress.setValue(done + 1)
+                    if progress.wasCanceled():
+                        raise Executer.CancelError()
+            else:
+                reportProgress = None
+            
+            # go parallel only if the work is really going to workers; otherwise, the temporary copy would be opened in this session
+            bParallel = (selfobj.Parallel and lattice2Parallel.chunkCount(len(indices), True, min_chunk= 1) > 1 
+                         and lattice2Parallel.getPool() is not None)
+            if bParallel:
+                # each worker opens its own copy of doc2, and computes a shard of the index range
+                if self.isVerbose():
+                    print ("Computing {n} items in worker processes...".format(n= len(indices)))
+                tmpfile = lattice2Parallel.saveTempDocument(doc2)
+                try:
+                    k = 0
+                    for breps in lattice2Parallel.imapChunks(_computeIndicesJob, indices, 
+                            shared= (tmpfile, object_to_take_in_doc2.Name, object_to_loop_in_doc2.Name, selfobj.CycleMode),
+                            progress= reportProgress, min_chunk= 1):
+                        for brep in breps:
+                            sink(k, brep)
+                            k += 1
+                finally:
+                    # in case the job ran in this process after all
+                    _workerSubsequence = None
+                    lattice2Parallel.closeSharedDocument()
+                    os.remove(tmpfile)
+            else:
+                # only what depends on the links needs recomputing
+                closure = ShadowDocument.dependentClosure(doc2, linkHolders(subs_linkdict), object_to_take_in_doc2)
+                for k, i in enumerate(indices):
+                    if self.isVerbose():
+                        print ("Computing {x}/{y}".format(x= i+1, y= n_seq))
+                    sink(k, computeIndex(doc2, subs_linkdict, i, object_to_take_in_doc2, closure))
+                    if reportProgress:
+                        reportProgress(k + 1, len(indices))
+        finally:
+            #links were rewritten in doc2; have them restored on next use
+            ShadowDocument.release(selfobj, linkHolders(subs_linkdict))
+
 class ViewProviderLatticeTopoSeries(lattice2BaseFeature.ViewProviderLatticeFeature):
 
     def getIcon(self):
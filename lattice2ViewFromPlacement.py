@@ -114,7 +114,7 @@ def getSelectedPlacement(obj, sub):
             if it_sh.isSame(subshape):
                 matches.append(index)
     assert(len(matches) < 2)
-    return matches[0]
+    return matches[0] * LBF.getMarkerStride(obj)
 
 # --------------------------------Gui commands----------------------------------
 
@@ -0,0 +1,47 @@
+'''
+Benchmark of compound leaf enumeration: CompoundExplorer vs. AllLeaves vs. AllLeafPlacements.
+
+Not a test; run from FreeCAD's Python console:
+    from test.benchmark import BenchCompoundExplorer
+    BenchCompoundExplorer.run()
+
+or from OS terminal: "/path/to/FreeCAD/binary -c 'from test.benchmark import BenchCompoundExplorer; BenchCompoundExplorer.run()'"
+'''
+
+import time
+
+import FreeCAD as App
+import Part
+
+import lattice2CompoundExplorer as LCE
+
+
+def makeCompound(leaf_count, branching = 100):
+    '''makeCompound(leaf_count, branching = 100): makes a nested compound of vertices, 
+    with no more than branching children per compound.'''
+    shapes = [Part.Vertex(App.Vector(i, 0, 0)) for i in range(leaf_count)]
+    while len(shapes) > branching:
+        shapes = [Part.makeCompound(shapes[i:i+branching]) for i in range(0, len(shapes), branching)]
+    return Part.makeCompound(shapes)
+
+def explorerLeaves(compound):
+    return [child for (child, msg, it) in LCE.CompoundExplorer(compound) if msg == it.MSG_LEAF]
+
+def timeit(func, arg):
+    t0 = time.perf_counter()
+    result = func(arg)
+    return time.perf_counter() - t0, result
+
+def run(sizes = (10**3, 10**4, 10**5, 10**6)):
+    print("{:>9} {:>14} {:>14} {:>14} {:>14}".format("leaves", "Explorer, s", "AllLeaves, s", "Placements, s", "Count, s"))
+    for n in sizes:
+        compound = makeCompound(n)
+        t_explorer, leaves_ref = timeit(explorerLeaves, compound)
+        t_leaves, leaves = timeit(LCE.AllLeaves, compound)
+        t_plms, plms = timeit(LCE.AllLeafPlacements, compound)
+        t_count, count = timeit(LCE.CalculateNumberOfLeaves, compound)
+        assert len(leaves) == len(leaves_ref) == len(plms) == count == n
+        print("{:>9} {:>14.4f} {:>14.4f} {:>14.4f} {:>14.4f}".format(n, t_explorer, t_leaves, t_plms, t_count))
+
+if __name__ == "__main__":
+    run()
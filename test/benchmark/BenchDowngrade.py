@@ -0,0 +1,65 @@
+'''
+Benchmark of seam edge extraction in Downgrade: pairwise isSame scan vs. hash-based counting.
+
+Not a test; run from FreeCAD's Python console:
+    from test.benchmark import BenchDowngrade
+    BenchDowngrade.run()
+
+or from OS terminal: "/path/to/FreeCAD/binary -c 'from test.benchmark import BenchDowngrade; BenchDowngrade.run()'"
+'''
+
+import itertools
+import time
+
+import FreeCAD as App
+import Part
+
+import lattice2Downgrade
+
+
+def makeShape(cylinder_count):
+    '''makeShape(cylinder_count): makes a compound of cylinders. Each has a seam edge, and 
+    wires of 4 edges, so the shape has about 3*cylinder_count edges.'''
+    return Part.makeCompound([Part.makeCylinder(1, 2, App.Vector(3*i, 0, 0)) for i in range(cylinder_count)])
+
+def seamsPairwise(shape):
+    # reference: the implementation getAllSeams had before
+    seams = []
+    for w in shape.Wires:
+        for (e1,e2) in itertools.combinations(w.childShapes(),2):
+            if e1.isSame(e2):
+                seams.append(e1)
+    return seams
+
+def nonSeamsPairwise(shape):
+    seams = seamsPairwise(shape)
+    return [e for e in shape.Edges if not any(e.isSame(s) for s in seams)]
+
+def timeit(func, arg):
+    t0 = time.perf_counter()
+    result = func(arg)
+    return time.perf_counter() - t0, result
+
+def run(sizes = (100, 1000, 5000, 20000), reference_limit = 5000):
+    '''run(sizes = (100, 1000, 5000, 20000), reference_limit = 5000): prints timings. The old 
+    pairwise implementation is only timed up to reference_limit cylinders, as it is too slow beyond.'''
+    print("{:>9} {:>14} {:>14} {:>14} {:>14}".format("edges", "Seams old, s", "Seams new, s", "Non-seam old, s", "Non-seam new, s"))
+    for n in sizes:
+        shape = makeShape(n)
+        t_seams, seams = timeit(lattice2Downgrade.getAllSeams, shape)
+        t_nonseams, nonseams = timeit(lattice2Downgrade.getNonSeams, shape)
+        assert len(seams) == n
+        assert len(nonseams) + len(seams) == len(shape.Edges)
+        if n <= reference_limit:
+            t_seams_ref, seams_ref = timeit(seamsPairwise, shape)
+            t_nonseams_ref, nonseams_ref = timeit(nonSeamsPairwise, shape)
+            assert all(a.isSame(b) for a, b in zip(seams, seams_ref)) and len(seams) == len(seams_ref)
+            assert all(a.isSame(b) for a, b in zip(nonseams, nonseams_ref)) and len(nonseams) == len(nonseams_ref)
+            t_seams_ref = "{:.4f}".format(t_seams_ref)
+            t_nonseams_ref = "{:.4f}".format(t_nonseams_ref)
+        else:
+            t_seams_ref = t_nonseams_ref = "-"
+        print("{:>9} {:>14} {:>14.4f} {:>14} {:>14.4f}".format(len(shape.Edges), t_seams_ref, t_seams, t_nonseams_ref, t_nonseams))
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,51 @@
+import FreeCAD as App
+
+import lattice2PDPattern
+from lattice2PDPattern import placementKey
+from test.gui.Lattice2GuiTestCase import Lattice2GuiTestCase
+
+
+class TestPDPattern(Lattice2GuiTestCase):
+    """ Tests of the incremental recompute bookkeeping of lattice2PDPattern. """
+
+    def setUp(self):
+        self.plms = [App.Placement(App.Vector(i * 10, 0, 0), App.Rotation(App.Vector(0, 0, 1), i * 30)) for i in range(5)]
+        self.signature = (['settings'], [None])
+        # the proxy alone; incrementalPlacements doesn't need the document object
+        self.pattern = lattice2PDPattern.LatticePDPattern.__new__(lattice2PDPattern.LatticePDPattern)
+
+    def _added(self, last_placements, placements, signature=None):
+        self.pattern._lastRun = (self.signature, last_placements, None)
+        added = self.pattern.incrementalPlacements(signature or self.signature, placements)
+        return None if added is None else [placementKey(plm) for plm in added]
+
+    def test_placement_key(self):
+        """ Test that placements equal up to rounding noise get the same key, and different ones don't. """
+        plm = self.plms[1]
+        noisy = App.Placement(plm.Base + App.Vector(1e-12, -1e-12, 0), plm.Rotation)
+        self.assertEqual(placementKey(plm), placementKey(noisy))
+        self.assertNotEqual(placementKey(plm), placementKey(self.plms[2]))
+
+    def test_superset(self):
+        """ Test that only the new placements are returned, when placements were added, in any order. """
+        p = self.plms
+        self.assertEqual([placementKey(p[3]), placementKey(p[4])],
+                         self._added([p[0], p[1], p[2]], [p[2], p[0], p[3], p[1], p[4]]))
+        self.assertEqual([], self._added([p[0], p[1]], [p[1], p[0]]))
+        # a repeated placement is an occurrence of its own
+        self.assertEqual([placementKey(p[0])], self._added([p[0]], [p[0], p[0]]))
+
+    def test_removed(self):
+        """ Test that the previous result is not reused, if any placement is gone. """
+        p = self.plms
+        self.assertIsNone(self._added([p[0], p[1], p[2]], [p[0], p[2]]))
+        self.assertIsNone(self._added([p[0], p[1], p[2]], [p[0], p[2], p[3]]))
+        self.assertIsNone(self._added([p[0], p[0]], [p[0]]))
+
+    def test_signature_changed(self):
+        """ Test that the previous result is not reused, if anything but placements changed. """
+        p = self.plms
+        self.assertIsNone(self._added([p[0]], [p[0], p[1]], signature=(['other settings'], [None])))
+        self.assertIsNone(self._added([p[0]], [p[0], p[1]], signature=(['settings'], [None, None])))
+        self.pattern._lastRun = None
+        self.assertIsNone(self.pattern.incrementalPlacements(self.signature, [p[0]]))
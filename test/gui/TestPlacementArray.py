@@ -0,0 +1,86 @@
+import math
+import random
+
+import FreeCAD as App
+
+import lattice2GeomUtils
+import lattice2PlacementArray as PlacementArray
+from test.gui.Lattice2GuiTestCase import Lattice2GuiTestCase
+
+
+class TestPlacementArray(Lattice2GuiTestCase):
+    """ Compares batch placement algebra of lattice2PlacementArray against App.Placement methods. """
+
+    def setUp(self):
+        rnd = random.Random(42)
+
+        def randomPlacement():
+            axis = App.Vector(rnd.uniform(-1, 1), rnd.uniform(-1, 1), rnd.uniform(-1, 1))
+            return App.Placement(App.Vector(rnd.uniform(-10, 10), rnd.uniform(-10, 10), rnd.uniform(-10, 10)),
+                                 App.Rotation(axis, rnd.uniform(-360, 360)))
+
+        self.plms1 = [randomPlacement() for i in range(20)]
+        self.plms2 = [randomPlacement() for i in range(20)]
+
+    def _checkArray(self, array, expectedPlacements, identifier):
+        actualPlacements = PlacementArray.toPlacements(array)
+        self.assertEqual(len(expectedPlacements), len(actualPlacements))
+        for i, placement in enumerate(actualPlacements):
+            self.assertTrue(placement.isSame(expectedPlacements[i], 1e-9),
+                            f"Placement mismatch at index {i} for {identifier}.\nExpected: {expectedPlacements[i]}\nActual: {placement}")
+
+    def test_conversion(self):
+        """ Test round trip between list of placements and placement array. """
+        self._checkArray(PlacementArray.fromPlacements(self.plms1), self.plms1, "conversion")
+
+    def test_compose_inverse(self):
+        """ Test batch multiply and inverse. """
+        arr1 = PlacementArray.fromPlacements(self.plms1)
+        arr2 = PlacementArray.fromPlacements(self.plms2)
+        self._checkArray(PlacementArray.compose(arr1, arr2),
+                         [p1.multiply(p2) for p1, p2 in zip(self.plms1, self.plms2)], "compose")
+        self._checkArray(PlacementArray.compose(arr1[0], arr2),
+                         [self.plms1[0].multiply(p2) for p2 in self.plms2], "compose one with many")
+        self._checkArray(PlacementArray.inverse(arr1),
+                         [p1.inverse() for p1 in self.plms1], "inverse")
+
+    def test_transform_points(self):
+        """ Test batch multVec. """
+        arr1 = PlacementArray.fromPlacements(self.plms1)
+        points = PlacementArray.vectors([p.Base for p in self.plms2])
+        result = PlacementArray.toVectors(PlacementArray.transformPoints(arr1, points))
+        for i, point in enumerate(result):
+            expected = self.plms1[i].multVec(self.plms2[i].Base)
+            self.assertTrue(point.isEqual(expected, 1e-9), f"Point mismatch at index {i}")
+
+    def test_sclerp(self):
+        """ Test batch ScLERP against Placement.sclerp. """
+        if not hasattr(App.Placement, 'sclerp'):
+            self.skipTest("Placement.sclerp not available in this version of FreeCAD")
+        values = [-0.5, 0.0, 0.3, 0.5, 1.0, 1.7]
+        for shorten in [True, False]:
+            for p1, p2 in zip(self.plms1, self.plms2):
+                arr = PlacementArray.sclerp(PlacementArray.fromPlacement(p1), PlacementArray.fromPlacement(p2), values, shorten)
+                self._checkArray(arr, [p1.sclerp(p2, v, shorten) for v in values], f"sclerp, shorten={shorten}")
+
+    def test_power_full_turn(self):
+        """ Test power of rotations by nearly 360 degrees, when not shortened. """
+        axis = App.Vector(1, 2, 3)
+        for angle in [360 - 1e-7, 360.0]:
+            plm = App.Placement(App.Vector(1, 2, 3), App.Rotation(axis, 0))
+            # App.Rotation normalizes 360 degrees to 0, so the quaternion is made by hand
+            arr = PlacementArray.fromPlacement(plm)
+            arr[3:7] = PlacementArray.quatFromAxisAngle(PlacementArray.vectors([axis])[0], math.radians(angle))
+            half = PlacementArray.toPlacements(PlacementArray.power(arr, [0.5], shorten=False))[0]
+            self.assertAlmostEqual(angle / 2, math.degrees(half.Rotation.Angle), places=4,
+                                   msg=f"Half power of rotation by {angle} degrees")
+            self.assertTrue(half.Base.isEqual(App.Vector(0.5, 1, 1.5), 1e-6), f"Half power of translation along with rotation by {angle} degrees")
+
+    def test_rotations_from_axes(self):
+        """ Test batch version of makeOrientationFromLocalAxes, including degenerate hints. """
+        zAxes = [p.Rotation.multVec(App.Vector(0, 0, 1)) for p in self.plms1] + [App.Vector(0, 0, 1), App.Vector(0, 0, -2)]
+        xAxes = [p.Base for p in self.plms2] + [App.Vector(0, 0, 1), App.Vector(0, 0, 1)]
+        quats = PlacementArray.rotationsFromAxes(PlacementArray.vectors(zAxes), PlacementArray.vectors(xAxes))
+        expected = [App.Placement(App.Vector(), lattice2GeomUtils.makeOrientationFromLocalAxes(App.Vector(z), App.Vector(x)))
+                    for z, x in zip(zAxes, xAxes)]
+        self._checkArray(PlacementArray.make(None, quats), expected, "rotationsFromAxes")
@@ -0,0 +1,78 @@
+import random
+
+import numpy
+
+import FreeCAD as App
+
+import lattice2ShapeIndex as ShapeIndex
+from test.gui.Lattice2GuiTestCase import Lattice2GuiTestCase
+
+
+class TestShapeIndex(Lattice2GuiTestCase):
+    """ Tests of box clustering and spatial ordering helpers of lattice2ShapeIndex. """
+
+    def test_cluster_disjoint(self):
+        """ Test that separated boxes go to separate clusters, and overlapping ones to the same. """
+        boxes = [App.BoundBox(0, 0, 0, 1, 1, 1),
+                 App.BoundBox(5, 0, 0, 6, 1, 1),
+                 App.BoundBox(0.5, 0.5, 0.5, 2, 2, 2),
+                 App.BoundBox(0, 5, 0, 1, 6, 1)]
+        self.assertEqual([[0, 2], [1], [3]], ShapeIndex.clusterBoxes(boxes))
+
+    def test_cluster_tolerance(self):
+        """ Test that boxes separated by a gap are clustered only if the gap is within tolerance. """
+        boxes = [App.BoundBox(0, 0, 0, 1, 1, 1),
+                 App.BoundBox(1.05, 0, 0, 2, 1, 1)]
+        self.assertEqual([[0], [1]], ShapeIndex.clusterBoxes(boxes, tolerance=0.01))
+        self.assertEqual([[0, 1]], ShapeIndex.clusterBoxes(boxes, tolerance=0.1))
+
+        # gap along Z only: overlapping X ranges mustn't be enough
+        boxes = [App.BoundBox(0, 0, 0, 1, 1, 1),
+                 App.BoundBox(0, 0, 1.05, 1, 1, 2)]
+        self.assertEqual([[0], [1]], ShapeIndex.clusterBoxes(boxes, tolerance=0.01))
+        self.assertEqual([[0, 1]], ShapeIndex.clusterBoxes(boxes, tolerance=0.1))
+
+    def test_cluster_transitive(self):
+        """ Test that a chain of boxes, each overlapping the next one only, makes one cluster. """
+        chain = [App.BoundBox(i * 0.9, 0, 0, i * 0.9 + 1, 1, 1) for i in range(10)]
+        lone = App.BoundBox(0, 3, 0, 1, 4, 1)
+        # shuffle, so that the chain doesn't come in sweep order
+        order = list(range(10))
+        random.Random(42).shuffle(order)
+        boxes = [chain[i] for i in order] + [lone]
+        self.assertEqual([list(range(10)), [10]], ShapeIndex.clusterBoxes(boxes))
+
+        # two chains growing from both ends, linked by the last box only
+        boxes = [App.BoundBox(0, 0, 0, 1, 1, 1),
+                 App.BoundBox(4, 0, 0, 5, 1, 1),
+                 App.BoundBox(0.5, 0, 0, 2, 1, 1),
+                 App.BoundBox(3, 0, 0, 4.5, 1, 1),
+                 App.BoundBox(1.5, 0, 0, 3.5, 1, 1)]
+        self.assertEqual([[0, 1, 2, 3, 4]], ShapeIndex.clusterBoxes(boxes))
+
+    def test_cluster_empty(self):
+        """ Test clustering of no boxes. """
+        self.assertEqual([], ShapeIndex.clusterBoxes([]))
+
+    def test_morton_order_locality(self):
+        """ Test that Morton order is a permutation that visits the points of a grid octant by octant. """
+        points = [(x, y, z) for x in range(8) for y in range(8) for z in range(8)]
+        random.Random(42).shuffle(points)
+        points = numpy.array(points, dtype=float)
+
+        order = ShapeIndex.mortonOrder(points)
+        self.assertEqual(list(range(len(points))), sorted(order.tolist()))
+
+        ordered = points[order]
+        for i in range(0, len(points), 8):
+            extent = ordered[i:i + 8].max(axis=0) - ordered[i:i + 8].min(axis=0)
+            self.assertTrue((extent <= 1.0).all(), f"Points {i}..{i + 7} in Morton order are not a 2x2x2 block: {ordered[i:i + 8]}")
+
+        def pathLength(pts):
+            return numpy.linalg.norm(numpy.diff(pts, axis=0), axis=1).sum()
+        self.assertLess(pathLength(ordered), pathLength(points) / 2)
+
+    def test_morton_order_degenerate(self):
+        """ Test Morton order of no points, and of coincident points. """
+        self.assertEqual([], ShapeIndex.mortonOrder(numpy.zeros((0, 3))).tolist())
+        self.assertEqual([0, 1, 2], ShapeIndex.mortonOrder([(1, 2, 3)] * 3).tolist())